@@ -6,7 +6,16 @@ from sqlalchemy import pool
 from alembic import context
 
 from src.models import Base
-from src.models.models import Dashboard, SavedChart, DataSourceConnection, Rule
+from src.models.models import (
+    Dashboard,
+    SavedChart,
+    DataSourceConnection,
+    Rule,
+    CachedLLMResponse,
+    Conversation,
+    ConversationTurn,
+    VerifiedExample,
+)
 
 config = context.config
 
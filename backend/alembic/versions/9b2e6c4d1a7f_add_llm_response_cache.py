@@ -0,0 +1,61 @@
+"""Add llm_response_cache table
+
+Revision ID: 9b2e6c4d1a7f
+Revises: 477c3f057c50
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9b2e6c4d1a7f"
+down_revision: Union[str, Sequence[str], None] = "477c3f057c50"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "llm_response_cache",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("fuzzy_key", sa.String(length=64), nullable=True),
+        sa.Column("model", sa.String(length=255), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("visualization", sa.JSON(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        op.f("ix_llm_response_cache_fuzzy_key"),
+        "llm_response_cache",
+        ["fuzzy_key"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_llm_response_cache_expires_at"),
+        "llm_response_cache",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_llm_response_cache_expires_at"), table_name="llm_response_cache"
+    )
+    op.drop_index(
+        op.f("ix_llm_response_cache_fuzzy_key"), table_name="llm_response_cache"
+    )
+    op.drop_table("llm_response_cache")
@@ -0,0 +1,61 @@
+"""Add verified_examples table
+
+Revision ID: a8d4e2f7c3b9
+Revises: f3c9a1e6b8d2
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a8d4e2f7c3b9"
+down_revision: Union[str, Sequence[str], None] = "f3c9a1e6b8d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "verified_examples",
+        sa.Column("id", sa.String(length=64), nullable=False),
+        sa.Column("data_source_id", sa.String(), nullable=True),
+        sa.Column("question", sa.Text(), nullable=False),
+        sa.Column("sql", sa.Text(), nullable=False),
+        sa.Column("source", sa.String(length=20), nullable=False),
+        sa.Column("use_count", sa.Integer(), server_default="1", nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "last_used_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(
+            ["data_source_id"], ["data_source_connections.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_verified_examples_data_source_id"),
+        "verified_examples",
+        ["data_source_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_verified_examples_data_source_id"), table_name="verified_examples"
+    )
+    op.drop_table("verified_examples")
@@ -0,0 +1,35 @@
+"""Add watermark column and late-arrival window to saved charts
+
+Revision ID: b5e1c7a9d4f2
+Revises: a8d4e2f7c3b9
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b5e1c7a9d4f2"
+down_revision: Union[str, Sequence[str], None] = "a8d4e2f7c3b9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "saved_charts",
+        sa.Column("watermark_column", sa.String(length=255), nullable=True),
+    )
+    op.add_column(
+        "saved_charts", sa.Column("late_arrival_window", sa.Integer(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("saved_charts", "late_arrival_window")
+    op.drop_column("saved_charts", "watermark_column")
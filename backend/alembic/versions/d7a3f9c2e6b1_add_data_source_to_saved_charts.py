@@ -0,0 +1,30 @@
+"""Add data source to saved charts
+
+Revision ID: d7a3f9c2e6b1
+Revises: b5e1c7a9d4f2
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d7a3f9c2e6b1"
+down_revision: Union[str, Sequence[str], None] = "b5e1c7a9d4f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "saved_charts", sa.Column("data_source_id", sa.String(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("saved_charts", "data_source_id")
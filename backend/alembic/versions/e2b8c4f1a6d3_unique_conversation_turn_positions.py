@@ -0,0 +1,65 @@
+"""Make conversation turn positions unique per conversation
+
+Revision ID: e2b8c4f1a6d3
+Revises: d7a3f9c2e6b1
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+from typing import Dict, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b8c4f1a6d3"
+down_revision: Union[str, Sequence[str], None] = "d7a3f9c2e6b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Renumber each conversation's turns 0..n-1 in their current order, so
+    # positions written concurrently before the constraint don't collide
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.text(
+            "SELECT id, conversation_id, position FROM conversation_turns "
+            "ORDER BY conversation_id, position, created_at, id"
+        )
+    ).all()
+    next_position: Dict[str, int] = {}
+    for turn_id, conversation_id, position in rows:
+        expected = next_position.get(conversation_id, 0)
+        next_position[conversation_id] = expected + 1
+        if position != expected:
+            connection.execute(
+                sa.text("UPDATE conversation_turns SET position = :p WHERE id = :id"),
+                {"p": expected, "id": turn_id},
+            )
+
+    op.drop_index(
+        "ix_conversation_turns_conversation_id_position",
+        table_name="conversation_turns",
+    )
+    op.create_index(
+        "ix_conversation_turns_conversation_id_position",
+        "conversation_turns",
+        ["conversation_id", "position"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_conversation_turns_conversation_id_position",
+        table_name="conversation_turns",
+    )
+    op.create_index(
+        "ix_conversation_turns_conversation_id_position",
+        "conversation_turns",
+        ["conversation_id", "position"],
+        unique=False,
+    )
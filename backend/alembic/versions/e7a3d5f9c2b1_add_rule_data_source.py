@@ -0,0 +1,37 @@
+"""Add data_source_id to rules
+
+Revision ID: e7a3d5f9c2b1
+Revises: c41f8e2b7d90
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a3d5f9c2b1"
+down_revision: Union[str, Sequence[str], None] = "c41f8e2b7d90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("rules", sa.Column("data_source_id", sa.String(), nullable=True))
+    op.create_foreign_key(
+        op.f("rules_data_source_id_fkey"),
+        "rules",
+        "data_source_connections",
+        ["data_source_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(op.f("rules_data_source_id_fkey"), "rules", type_="foreignkey")
+    op.drop_column("rules", "data_source_id")
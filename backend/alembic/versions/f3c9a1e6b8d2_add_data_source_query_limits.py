@@ -0,0 +1,36 @@
+"""Add statement timeout and read-only mode to data sources
+
+Revision ID: f3c9a1e6b8d2
+Revises: e7a3d5f9c2b1
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f3c9a1e6b8d2"
+down_revision: Union[str, Sequence[str], None] = "e7a3d5f9c2b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "data_source_connections",
+        sa.Column("statement_timeout_ms", sa.Integer(), nullable=True),
+    )
+    op.add_column(
+        "data_source_connections",
+        sa.Column("read_only", sa.Boolean(), server_default=sa.true(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("data_source_connections", "read_only")
+    op.drop_column("data_source_connections", "statement_timeout_ms")
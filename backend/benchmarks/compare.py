@@ -0,0 +1,66 @@
+"""Compare two benchmark reports produced by ``benchmarks.run``.
+
+Usage::
+
+    PYTHONPATH=. python -m benchmarks.compare baseline.json candidate.json
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+
+METRICS = ["throughput_rps", "p50", "p95", "p99"]
+
+
+def _load(path: str) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    with open(path) as f:
+        report = json.load(f)
+    return {
+        (result["scenario"], result["concurrency"]): result
+        for result in report["results"]
+    }
+
+
+def _value(result: Dict[str, Any], metric: str) -> Optional[float]:
+    if metric == "throughput_rps":
+        return result.get("throughput_rps")
+    return result.get("latency_ms", {}).get(metric)
+
+
+def _change(before: Optional[float], after: Optional[float]) -> str:
+    if before is None or after is None or before == 0:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(baseline_path: str, candidate_path: str) -> List[str]:
+    baseline = _load(baseline_path)
+    candidate = _load(candidate_path)
+    lines = [
+        f"{'scenario':<24} {'c':>4}  "
+        + "  ".join(f"{metric:>22}" for metric in METRICS)
+    ]
+    for key in sorted(set(baseline) | set(candidate)):
+        before, after = baseline.get(key), candidate.get(key)
+        if before is None or after is None:
+            lines.append(f"{key[0]:<24} {key[1]:>4}  only in one report")
+            continue
+
+        cells = []
+        for metric in METRICS:
+            old, new = _value(before, metric), _value(after, metric)
+            cells.append(f"{old} -> {new} ({_change(old, new)})".rjust(22))
+        lines.append(f"{key[0]:<24} {key[1]:>4}  " + "  ".join(cells))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+    print("\n".join(compare(args.baseline, args.candidate)))
+
+
+if __name__ == "__main__":
+    main()
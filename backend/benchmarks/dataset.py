@@ -0,0 +1,152 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import random
+import zlib
+
+from sqlalchemy import (
+    Column,
+    Date,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    create_engine,
+    func,
+    select,
+)
+
+# Same shape as the ``sales`` table created by the initial migration
+metadata = MetaData()
+sales = Table(
+    "sales",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("order_date", Date, nullable=False),
+    Column("product_name", String(100), nullable=False),
+    Column("category", String(50), nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("unit_price", Numeric(10, 2), nullable=False),
+    Column("total_amount", Numeric(10, 2), nullable=False),
+    Column("customer_name", String(100), nullable=False),
+    Column("region", String(50), nullable=False),
+)
+
+PRODUCTS = {
+    "Electronics": [
+        ("Laptop", "1199.00"),
+        ("Monitor", "329.00"),
+        ("Headphones", "149.00"),
+        ("Keyboard", "89.00"),
+    ],
+    "Furniture": [
+        ("Desk", "449.00"),
+        ("Office Chair", "279.00"),
+        ("Bookshelf", "159.00"),
+    ],
+    "Office Supplies": [
+        ("Notebook", "6.50"),
+        ("Pen Set", "12.00"),
+        ("Stapler", "18.00"),
+    ],
+}
+REGIONS = ["North", "South", "East", "West"]
+FIRST_DATE = date(2024, 1, 1)
+
+
+def generate_sales(rows: int, seed: int = 42):
+    """Yield ``rows`` deterministic sales records for ``seed``."""
+    rng = random.Random(seed)
+    categories = sorted(PRODUCTS)
+    customers = [f"Customer {i:04d}" for i in range(max(1, rows // 20))]
+    for _ in range(rows):
+        category = rng.choice(categories)
+        product_name, price = rng.choice(PRODUCTS[category])
+        unit_price = Decimal(price)
+        quantity = rng.randint(1, 10)
+        yield {
+            "order_date": FIRST_DATE + timedelta(days=rng.randrange(730)),
+            "product_name": product_name,
+            "category": category,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "total_amount": unit_price * quantity,
+            "customer_name": rng.choice(customers),
+            "region": rng.choice(REGIONS),
+        }
+
+
+def seed_sales(database_url: str, rows: int, seed: int = 42) -> int:
+    """Create and fill ``sales`` if it is missing or empty.
+
+    An existing, non-empty table is left alone so pointing the harness at a
+    real warehouse never rewrites its data. Returns the table's row count.
+    """
+    engine = create_engine(database_url)
+    try:
+        metadata.create_all(engine, tables=[sales])
+        with engine.begin() as connection:
+            existing = connection.execute(select(func.count()).select_from(sales))
+            count = existing.scalar_one()
+            if count:
+                return count
+
+            batch = []
+            for record in generate_sales(rows, seed):
+                batch.append(record)
+                if len(batch) == 1000:
+                    connection.execute(sales.insert(), batch)
+                    batch = []
+            if batch:
+                connection.execute(sales.insert(), batch)
+            return rows
+    finally:
+        engine.dispose()
+
+
+# Canned answers over the seeded ``sales`` table; portable between SQLite and
+# PostgreSQL so the same scenarios run against either warehouse
+CANNED_ANSWERS = [
+    (
+        "SELECT region, SUM(total_amount) AS revenue\n"
+        "FROM sales\nGROUP BY region\nORDER BY revenue DESC",
+        {"type": "bar", "xKey": "region", "yKeys": ["revenue"]},
+    ),
+    (
+        "SELECT category, SUM(quantity) AS units, SUM(total_amount) AS revenue\n"
+        "FROM sales\nGROUP BY category\nORDER BY revenue DESC",
+        {"type": "bar", "xKey": "category", "yKeys": ["units", "revenue"]},
+    ),
+    (
+        "SELECT order_date, SUM(total_amount) AS revenue\n"
+        "FROM sales\nGROUP BY order_date\nORDER BY order_date",
+        {"type": "line", "xKey": "order_date", "yKeys": ["revenue"]},
+    ),
+    (
+        "SELECT customer_name, COUNT(*) AS orders, SUM(total_amount) AS revenue\n"
+        "FROM sales\nGROUP BY customer_name\nORDER BY revenue DESC\nLIMIT 10",
+        {"type": "table"},
+    ),
+]
+
+QUESTIONS = [
+    "What is total revenue by region?",
+    "How many units and how much revenue per category?",
+    "Show daily revenue over time",
+    "Who are our top 10 customers by revenue?",
+]
+
+
+def canned_response(message: str) -> str:
+    # Keyed on the question so every run answers it the same way
+    if message in QUESTIONS:
+        index = QUESTIONS.index(message)
+    else:
+        index = zlib.crc32(message.encode()) % len(CANNED_ANSWERS)
+    sql, visualization = CANNED_ANSWERS[index]
+    return (
+        "Here is the query for that.\n\n"
+        f"```sql\n{sql}\n```\n\n"
+        f"```visualization\n{json.dumps(visualization)}\n```"
+    )
@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+
+from benchmarks.dataset import canned_response
+from src.services.llm import LLMService
+from src.services.llm_providers import Messages, ProviderRouter, StubProvider
+
+
+@dataclass
+class FakeLatency:
+    # Time to first token, and to the end of the completion, in milliseconds
+    first_token_ms: float = 300.0
+    total_ms: float = 1200.0
+    chunks: int = 20
+
+
+def _answer(messages: Messages) -> str:
+    user_messages = [m for m in messages if m.get("role") == "user"]
+    return canned_response(str(user_messages[-1]["content"]))
+
+
+class FakeLLMService(LLMService):
+    """``LLMService`` backed by a stub provider answering canned SQL.
+
+    Everything above the provider (prompt building, the response cache, the
+    provider router, SQL and visualization extraction) runs unchanged; only
+    the network call is replaced by canned answers after a configurable
+    delay. Hedging is off so the configured latency is what gets measured.
+    """
+
+    def __init__(self, latency: FakeLatency):
+        super().__init__(
+            ProviderRouter(
+                [
+                    StubProvider(
+                        respond=_answer,
+                        model="fake-llm",
+                        first_token_ms=latency.first_token_ms,
+                        total_ms=latency.total_ms,
+                        chunks=latency.chunks,
+                        cacheable=True,
+                    )
+                ],
+                hedge=False,
+            )
+        )
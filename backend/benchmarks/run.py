@@ -0,0 +1,352 @@
+"""Benchmark the API in-process against a seeded warehouse and a fake LLM.
+
+Usage (from ``backend/``)::
+
+    PYTHONPATH=. python -m benchmarks.run --output results.json
+    PYTHONPATH=. python -m benchmarks.compare baseline.json results.json
+
+Requests go through the full ASGI app via httpx's in-process transport, so
+no server, OpenAI key or Postgres is needed. Pass ``--warehouse-url`` to
+run the queries against a real database instead of the default SQLite file.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import CANNED_ANSWERS, QUESTIONS, seed_sales
+
+# (method, path, json body)
+RequestSpec = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+@dataclass
+class Fixtures:
+    warehouse_url: str
+    dashboard_id: str = ""
+    chart_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[int, Fixtures], RequestSpec]
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario(
+            "chat",
+            lambda i, f: (
+                "POST",
+                "/api/chat",
+                {"message": QUESTIONS[i % len(QUESTIONS)]},
+            ),
+        ),
+        Scenario(
+            "chat_stream",
+            lambda i, f: (
+                "POST",
+                "/api/chat/stream",
+                {"message": QUESTIONS[i % len(QUESTIONS)]},
+            ),
+        ),
+        Scenario(
+            "chart_execute",
+            lambda i, f: (
+                "POST",
+                f"/api/charts/{f.chart_ids[i % len(f.chart_ids)]}/execute",
+                None,
+            ),
+        ),
+        Scenario(
+            "chart_execute_uncached",
+            lambda i, f: (
+                "POST",
+                f"/api/charts/{f.chart_ids[i % len(f.chart_ids)]}/execute?refresh=true",
+                None,
+            ),
+        ),
+        Scenario("dashboard_list", lambda i, f: ("GET", "/api/dashboards", None)),
+        Scenario(
+            "schema",
+            lambda i, f: (
+                "POST",
+                "/api/data-sources/schema",
+                {"database_url": f.warehouse_url},
+            ),
+        ),
+    ]
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * q
+    low, high = math.floor(rank), math.ceil(rank)
+    value = sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (
+        rank - low
+    )
+    return round(value, 3)
+
+
+def summarize(
+    scenario: str,
+    concurrency: int,
+    latencies_ms: List[float],
+    errors: int,
+    duration: float,
+) -> Dict[str, Any]:
+    latencies_ms = sorted(latencies_ms)
+    completed = len(latencies_ms)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": completed + errors,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(completed / duration, 3) if duration else None,
+        "latency_ms": {
+            "mean": round(sum(latencies_ms) / completed, 3) if completed else None,
+            "p50": percentile(latencies_ms, 0.50),
+            "p95": percentile(latencies_ms, 0.95),
+            "p99": percentile(latencies_ms, 0.99),
+            "max": round(latencies_ms[-1], 3) if completed else None,
+        },
+    }
+
+
+async def run_level(
+    client: Any,
+    scenario: Scenario,
+    fixtures: Fixtures,
+    concurrency: int,
+    requests: int,
+    warmup: int,
+) -> Dict[str, Any]:
+    for i in range(warmup):
+        method, path, body = scenario.build(i, fixtures)
+        await client.request(method, path, json=body)
+
+    latencies_ms: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            method, path, body = scenario.build(index, fixtures)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            elapsed = (time.perf_counter() - started) * 1000
+            if failed:
+                errors += 1
+            else:
+                latencies_ms.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(
+        scenario.name,
+        concurrency,
+        latencies_ms,
+        errors,
+        time.perf_counter() - started,
+    )
+
+
+async def create_fixtures(client: Any, warehouse_url: str) -> Fixtures:
+    fixtures = Fixtures(warehouse_url=warehouse_url)
+    response = await client.post("/api/dashboards", json={"name": "Benchmark"})
+    response.raise_for_status()
+    fixtures.dashboard_id = response.json()["id"]
+
+    for i, (sql, visualization) in enumerate(CANNED_ANSWERS):
+        response = await client.post(
+            f"/api/dashboards/{fixtures.dashboard_id}/charts",
+            json={
+                "dashboard_id": fixtures.dashboard_id,
+                "title": f"Benchmark chart {i + 1}",
+                "sql": sql,
+                "visualization": visualization,
+            },
+        )
+        response.raise_for_status()
+        fixtures.chart_ids.append(response.json()["id"])
+    return fixtures
+
+
+def configure_environment(args: argparse.Namespace, workdir: str) -> str:
+    # Must happen before the app is imported: its services read the
+    # environment once, at import time
+    warehouse_url = args.warehouse_url or f"sqlite:///{workdir}/warehouse.db"
+    os.environ["DATABASE_URL"] = warehouse_url
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/metadata.db"
+    os.environ["CHART_REFRESH_ENABLED"] = "false"
+    # The app's own LLM service is swapped for the fake one; keep it from
+    # building clients for whatever keys are in the environment
+    os.environ["LLM_PROVIDERS"] = "stub"
+    if not args.llm_cache:
+        os.environ["LLM_CACHE_TTL"] = "0"
+    return warehouse_url
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    warehouse_url = configure_environment(args, workdir)
+    rows = seed_sales(warehouse_url, args.rows, args.seed)
+
+    import httpx
+    from sqlalchemy import create_engine
+
+    from src.api import chat
+    from src.main import app
+    from src.models import Base
+    from src.services.database import engine_registry, query_executor
+    import src.models.models  # noqa: F401
+
+    from benchmarks.fake_llm import FakeLatency, FakeLLMService
+
+    metadata_engine = create_engine(f"sqlite:///{workdir}/metadata.db")
+    Base.metadata.create_all(metadata_engine)
+    metadata_engine.dispose()
+
+    latency = FakeLatency(
+        first_token_ms=args.llm_first_token_ms, total_ms=args.llm_total_ms
+    )
+    chat.llm_service = FakeLLMService(latency)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+        fixtures = await create_fixtures(client, warehouse_url)
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                result = await run_level(
+                    client,
+                    SCENARIOS[name],
+                    fixtures,
+                    concurrency,
+                    args.requests,
+                    args.warmup,
+                )
+                results.append(result)
+                print(
+                    f"{name:<24} c={concurrency:<4} "
+                    f"{result['throughput_rps']} req/s  "
+                    f"p50={result['latency_ms']['p50']}ms "
+                    f"p95={result['latency_ms']['p95']}ms "
+                    f"p99={result['latency_ms']['p99']}ms "
+                    f"errors={result['errors']}",
+                    file=sys.stderr,
+                )
+
+    query_executor.shutdown()
+    engine_registry.dispose_all()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "warehouse": warehouse_url.split(":", 1)[0],
+            "sales_rows": rows,
+            "seed": args.seed,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "llm": {
+                "first_token_ms": args.llm_first_token_ms,
+                "total_ms": args.llm_total_ms,
+                "cache": args.llm_cache,
+            },
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: value.split(","),
+        default=list(SCENARIOS),
+        help=f"comma-separated subset of: {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(level) for level in value.split(",")],
+        default=[1, 8, 32],
+        help="comma-separated concurrency levels (default: 1,8,32)",
+    )
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-first-token-ms", type=float, default=100.0)
+    parser.add_argument("--llm-total-ms", type=float, default=400.0)
+    parser.add_argument(
+        "--llm-cache",
+        action="store_true",
+        help="keep the LLM response cache on (off by default so every chat "
+        "request pays the fake LLM latency)",
+    )
+    parser.add_argument(
+        "--warehouse-url",
+        help="run queries against this database; a non-empty sales table is "
+        "used as is (default: a fresh SQLite file)",
+    )
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="bagofwords-bench-") as workdir:
+        report = asyncio.run(run(args, workdir))
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,49 @@
-from fastapi import APIRouter, HTTPException
-from src.schemas.chat import ChatRequest, ChatResponse, QueryResult, VisualizationConfig
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from openai.types.chat import ChatCompletionMessageParam
+from src.api.content_negotiation import wants_columnar
+from src.api.disconnect import cancel_on_disconnect
+from src.schemas.chat import (
+    ChatRequest,
+    ChatResponse,
+    ColumnarQueryResult,
+    QueryResult,
+    VisualizationConfig,
+)
+from src.services.conversation_memory import (
+    ConversationState,
+    conversation_memory,
+    summarize_result,
+)
+from src.services import metrics
+from src.services.example_store import VerifiedExample, example_store
 from src.services.llm import LLMService
-from src.services.database import DatabaseService
+from src.services.llm_providers import LLMDeadlineExceeded
+from src.services.prompt_builder import BuiltPrompt
+from src.services.query_preflight import (
+    PreflightResult,
+    QueryRejected,
+    query_preflight,
+)
+from src.services.rule_cache import rule_cache
+from src.services.database import DatabaseService, build_connection_url
+from dataclasses import dataclass
 from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+    Union,
+)
+import asyncio
+import time
+import json
 import uuid
 import re
 import os
@@ -11,17 +52,24 @@ router = APIRouter(tags=["chat"])
 
 llm_service = LLMService()
 
+T = TypeVar("T")
+
+# Keeps fire-and-forget tasks referenced until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+
+_SQL_BLOCK = re.compile(r"```sql\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE)
+
 
 def extract_sql_from_response(text: str) -> str | None:
-    sql_pattern = r"```sql\s*(.*?)\s*```"
-    match = re.search(sql_pattern, text, re.DOTALL | re.IGNORECASE)
+    match = _SQL_BLOCK.search(text)
     if match:
         return match.group(1).strip()
     return None
 
 
 def infer_visualization(
-    query_result: QueryResult, sql_lower: str
+    query_result: Union[QueryResult, ColumnarQueryResult], sql_lower: str
 ) -> VisualizationConfig:
     columns = query_result.columns
 
@@ -56,91 +104,583 @@ def infer_visualization(
         return VisualizationConfig(type="table")
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+async def timed(timings: Dict[str, float], stage: str, awaitable: Awaitable[T]) -> T:
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = elapsed_ms(started)
+
+
+async def resolve_database(data_source_id: Optional[str]) -> Optional[DatabaseService]:
+    if data_source_id:
+        # Use specified data source
+        from src.models.models import DataSourceConnection
+        from src.models import SessionLocal
+
+        try:
+            async with SessionLocal() as db:
+                data_source = await db.get(DataSourceConnection, data_source_id)
+        except Exception as e:
+            print(f"Failed to connect to specified data source: {e}")
+            return None
+
+        if not data_source:
+            print(f"Data source not found: {data_source_id}")
+            return None
+        if str(data_source.status) != "connected":
+            print(f"Data source not connected: {data_source.name}")
+            return None
+
+        return DatabaseService(
+            database_url=build_connection_url(data_source),
+            data_source_id=data_source_id,
+            statement_timeout_ms=data_source.statement_timeout_ms,  # type: ignore[arg-type]
+            read_only=data_source.read_only,  # type: ignore[arg-type]
+        )
+
+    # Fall back to default DATABASE_URL from env
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        return DatabaseService(database_url=database_url)
+    return None
+
+
+async def load_schema(
+    db_service: Optional[DatabaseService],
+) -> tuple[Optional[Dict], Optional[Dict[str, int]]]:
+    if not db_service:
+        return None, None
+
+    try:
+        snapshot = await db_service.get_schema_snapshot_async()
+        return snapshot["tables"], snapshot["row_estimates"]
+    except Exception as e:
+        print(f"Failed to get schema: {e}")
+        return None, None
+
+
+async def resolve_rules(
+    request: ChatRequest,
+) -> tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    if request.rules is not None:
+        # Clients that still send their rules keep control over them
+        return request.rules, None
+
+    try:
+        return await rule_cache.resolve(request.data_source_id)
+    except Exception as e:
+        print(f"Failed to load rules: {e}")
+        return None, None
+
+
+async def find_examples(request: ChatRequest) -> List[VerifiedExample]:
     try:
-        conversation_id = request.conversation_id or str(uuid.uuid4())
-
-        schema_context = None
-        db_service = None
-
-        if request.data_source_id:
-            # Use specified data source
-            from src.models.models import DataSourceConnection
-            from src.models import get_db
-
-            db = next(get_db())
-            try:
-                data_source = (
-                    db.query(DataSourceConnection)
-                    .filter(DataSourceConnection.id == request.data_source_id)
-                    .first()
+        return await example_store.similar(request.message, request.data_source_id)
+    except Exception as e:
+        print(f"Failed to retrieve verified examples: {e}")
+        return []
+
+
+def remember_example(request: ChatRequest, sql: str, memory: ConversationState):
+    """Keep a question whose SQL ran as a few-shot example for later ones."""
+    if memory.turns:
+        # Follow-ups only make sense after their conversation
+        return
+    task = asyncio.create_task(
+        example_store.record(request.message, sql, request.data_source_id)
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@dataclass
+class ChatContext:
+    db_service: Optional[DatabaseService]
+    schema_context: Optional[Dict]
+    row_estimates: Optional[Dict[str, int]]
+    rules: Optional[List[Dict[str, Any]]]
+    rules_version: Optional[str]
+    memory: ConversationState
+    examples: List[VerifiedExample]
+    # Resolves to how long opening a warehouse connection took, in ms
+    warmup: Optional["asyncio.Task[float]"] = None
+
+
+async def warm_connection(db_service: DatabaseService) -> float:
+    started = time.perf_counter()
+    await db_service.test_connection_async()
+    return elapsed_ms(started)
+
+
+async def prepare_chat(
+    request: ChatRequest, conversation_id: str, timings: Dict[str, float]
+) -> ChatContext:
+    """Gather everything the prompt needs, running independent lookups at once.
+
+    The data source, rules, conversation history and verified examples are
+    resolved concurrently. As soon as the data source is known a connection
+    is opened in the background and handed back to the pool, so a cold pool
+    has done its connect handshake by the time the generated SQL runs; the
+    schema load overlaps with it. The connection isn't held in between.
+    """
+    db_service, (rules, rules_version), memory, examples = await asyncio.gather(
+        timed(timings, "data_source", resolve_database(request.data_source_id)),
+        timed(timings, "rules", resolve_rules(request)),
+        timed(timings, "memory", conversation_memory.get(conversation_id)),
+        timed(timings, "examples", find_examples(request)),
+    )
+
+    warmup = None
+    if db_service:
+        warmup = asyncio.create_task(warm_connection(db_service))
+        _background_tasks.add(warmup)
+        warmup.add_done_callback(_background_tasks.discard)
+
+    schema_context, row_estimates = await timed(
+        timings, "schema", load_schema(db_service)
+    )
+    return ChatContext(
+        db_service=db_service,
+        schema_context=schema_context,
+        row_estimates=row_estimates,
+        rules=rules,
+        rules_version=rules_version,
+        memory=memory,
+        examples=examples,
+        warmup=warmup,
+    )
+
+
+async def run_generated_sql(
+    db_service: DatabaseService,
+    sql: str,
+    timings: Dict[str, float],
+    columnar: bool = False,
+    timeout_ms: Optional[int] = None,
+) -> tuple[Dict[str, Any], PreflightResult]:
+    preflight = await timed(
+        timings, "preflight", query_preflight.check(db_service, sql)
+    )
+    result = await timed(
+        timings,
+        "query",
+        db_service.execute_query_async(
+            sql, max_rows=preflight.max_rows, columnar=columnar, timeout_ms=timeout_ms
+        ),
+    )
+    if preflight.status == "limited" and result.get("truncated"):
+        # Copied, since the result may be shared with the result cache
+        result = {**result, "note": preflight.note}
+    return result, preflight
+
+
+def llm_budget(request: ChatRequest, started: float) -> Optional[float]:
+    """Seconds left of the request's LLM deadline, if it set one."""
+    if request.llm_deadline_ms is None:
+        return None
+    return max(0.0, request.llm_deadline_ms / 1000 - (time.perf_counter() - started))
+
+
+def choose_visualization(
+    query_result: Union[QueryResult, ColumnarQueryResult],
+    visualization_config_dict: Optional[Dict],
+    sql_query: str,
+) -> VisualizationConfig:
+    if visualization_config_dict:
+        return VisualizationConfig(**visualization_config_dict)
+    elif query_result and len(query_result.columns) >= 2:
+        return infer_visualization(query_result, sql_query.lower())
+    else:
+        return VisualizationConfig(type="table")
+
+
+def build_chat_prompt(
+    request: ChatRequest, context: ChatContext, timings: Dict[str, float]
+) -> tuple[BuiltPrompt, List[ChatCompletionMessageParam]]:
+    prompt_started = time.perf_counter()
+    history = context.memory.history_messages()
+    prompt = llm_service.build_prompt(
+        request.message,
+        context.schema_context,
+        context.rules,
+        context.row_estimates,
+        history=history,
+        retrieval_text=context.memory.retrieval_text(),
+        rules_version=context.rules_version,
+        examples=context.examples,
+    )
+    timings["prompt"] = elapsed_ms(prompt_started)
+    return prompt, history
+
+
+@dataclass
+class QueryOutcome:
+    response_text: str
+    sql: Optional[str]
+    result: Optional[Dict[str, Any]] = None
+    preflight: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Why the preflight refused the first SQL, when it did
+    rejection: Optional[str] = None
+    repaired: bool = False
+
+
+async def run_answer_sql(
+    request: ChatRequest,
+    context: ChatContext,
+    prompt: BuiltPrompt,
+    response_text: str,
+    sql_query: Optional[str],
+    timings: Dict[str, float],
+    llm_info: Dict[str, Any],
+    llm_started: float,
+    columnar: bool = False,
+    query_task: Optional[Awaitable[tuple[Dict[str, Any], PreflightResult]]] = None,
+) -> QueryOutcome:
+    """Run an answer's SQL, with one repair attempt if the preflight refuses it.
+
+    ``query_task`` is a run of ``sql_query`` that was already started. Query
+    failures are reported on the outcome rather than raised.
+    """
+    outcome = QueryOutcome(response_text=response_text, sql=sql_query)
+    db_service = context.db_service
+    if not sql_query or db_service is None:
+        return outcome
+
+    try:
+        try:
+            result_dict, preflight = await (
+                query_task
+                or run_generated_sql(
+                    db_service, sql_query, timings, columnar, request.timeout_ms
                 )
+            )
+        except QueryRejected as e:
+            outcome.rejection = str(e)
+            if not query_preflight.repair:
+                raise
 
-                if not data_source:
-                    print(f"Data source not found: {request.data_source_id}")
-                else:
-                    status_is_connected = str(data_source.status) == "connected"
-                    if status_is_connected:  # type: ignore[truthy-bool]
-                        connection_string = f"postgresql://{data_source.username}:{data_source.password}@{data_source.host}:{data_source.port}/{data_source.database}"
-                        db_service = DatabaseService(database_url=connection_string)
-                        schema_context = db_service.get_schema()
-                    else:
-                        print(f"Data source not connected: {data_source.name}")
-            except Exception as e:
-                print(f"Failed to connect to specified data source: {e}")
-            finally:
-                db.close()
-        else:
-            # Fall back to default DATABASE_URL from env
-            database_url = os.getenv("DATABASE_URL")
-            if database_url:
-                try:
-                    db_service = DatabaseService(database_url=database_url)
-                    schema_context = db_service.get_schema()
-                except Exception as e:
-                    print(f"Failed to get schema: {e}")
-
-        response_text, visualization_config_dict = await llm_service.generate_response(
-            message=request.message,
-            conversation_id=conversation_id,
-            schema_context=schema_context,
-            rules=request.rules,
+            # One repair attempt with the rejection as feedback
+            repaired_text = await timed(
+                timings,
+                "repair",
+                llm_service.repair_response(
+                    prompt,
+                    response_text,
+                    str(e),
+                    deadline=llm_budget(request, llm_started),
+                    info=llm_info,
+                ),
+            )
+            repaired_sql = extract_sql_from_response(repaired_text)
+            if not repaired_sql:
+                raise
+            outcome.response_text, outcome.sql = repaired_text, repaired_sql
+            outcome.repaired = True
+            result_dict, preflight = await run_generated_sql(
+                db_service, repaired_sql, timings, columnar, request.timeout_ms
+            )
+
+        outcome.result = result_dict
+        outcome.preflight = {**preflight.as_dict(), "repaired": outcome.repaired}
+        remember_example(request, outcome.sql, context.memory)
+    except Exception as e:
+        print(f"Failed to execute query: {e}")
+        metrics.errors.inc(stage="query")
+        outcome.error = str(e)
+        if isinstance(e, QueryRejected):
+            outcome.preflight = {"status": "rejected", "reason": str(e)}
+    return outcome
+
+
+async def finish_chat(
+    request: ChatRequest,
+    context: ChatContext,
+    prompt: BuiltPrompt,
+    history: List[ChatCompletionMessageParam],
+    llm_info: Dict[str, Any],
+    outcome: QueryOutcome,
+    timings: Dict[str, float],
+    started: float,
+) -> Dict[str, Any]:
+    """Cache the answer and record the turn; returns the response metadata."""
+    if outcome.sql is None or outcome.result is not None:
+        # Only answers whose SQL ran are worth serving again
+        await llm_service.cache_answer(
+            request.message,
+            context.schema_context,
+            context.rules,
+            history,
+            context.examples,
+            llm_info,
+            outcome.response_text,
+            llm_service.extract_visualization_config(outcome.response_text),
         )
 
-        sql_query = extract_sql_from_response(response_text)
-        query_result = None
-        visualization_config = None
-
-        if sql_query and db_service:
-            try:
-                result_dict = db_service.execute_query(sql_query)
-                query_result = QueryResult(**result_dict)
-
-                if visualization_config_dict:
-                    visualization_config = VisualizationConfig(
-                        **visualization_config_dict
-                    )
-                elif query_result and len(query_result.columns) >= 2:
-                    visualization_config = infer_visualization(
-                        query_result, sql_query.lower()
-                    )
-                else:
-                    visualization_config = VisualizationConfig(type="table")
-            except Exception as e:
-                print(f"Failed to execute query: {e}")
-
-        return ChatResponse(
-            response=response_text,
-            conversation_id=conversation_id,
-            sql=sql_query,
-            query_result=query_result,
-            visualization=visualization_config,
-            metadata={
-                "timestamp": datetime.utcnow().isoformat(),
-                "model": "gpt-4",
-                "has_schema": schema_context is not None,
-            },
+    await timed(
+        timings,
+        "memory_write",
+        conversation_memory.append(
+            context.memory,
+            request.message,
+            outcome.response_text,
+            outcome.sql,
+            summarize_result(outcome.result),
+            request.data_source_id,
+        ),
+    )
+    warmup = context.warmup
+    if warmup is not None and warmup.done() and not warmup.cancelled():
+        timings["connection_warmup"] = warmup.result()
+    timings["total"] = elapsed_ms(started)
+    metrics.observe_stages(timings)
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "model": llm_info.get("model", llm_service.model),
+        "has_schema": context.schema_context is not None,
+        "prompt_tokens": prompt.section_tokens,
+        "verified_examples": len(context.examples),
+        "timings_ms": dict(timings),
+        "preflight": outcome.preflight,
+        "query_error": outcome.error,
+    }
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    http_request: Request,
+    accept: Optional[str] = Header(default=None),
+):
+    try:
+        # A client that gives up cancels the LLM call and any running query
+        return await cancel_on_disconnect(
+            http_request, answer_chat(request, wants_columnar(accept))
         )
+    except HTTPException:
+        raise
+    except LLMDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def answer_chat(request: ChatRequest, columnar: bool) -> ChatResponse:
+    # Failures are counted here, where the data source label bound once it
+    # resolves is still visible
+    metrics.bind_data_source(request.data_source_id, resolved=False)
+    try:
+        return await build_chat_response(request, columnar)
+    except HTTPException:
+        raise
+    except LLMDeadlineExceeded:
+        metrics.errors.inc(stage="llm")
+        raise
+    except Exception:
+        metrics.errors.inc(stage="chat")
+        raise
+
+
+async def build_chat_response(request: ChatRequest, columnar: bool) -> ChatResponse:
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    context = await prepare_chat(request, conversation_id, timings)
+    if context.db_service is not None:
+        metrics.bind_data_source(request.data_source_id)
+    prompt, history = build_chat_prompt(request, context, timings)
+
+    llm_started = time.perf_counter()
+    llm_info: Dict[str, Any] = {}
+    response_text, visualization_config_dict = await timed(
+        timings,
+        "llm",
+        llm_service.generate_response(
+            message=request.message,
+            conversation_id=conversation_id,
+            schema_context=context.schema_context,
+            rules=context.rules,
+            row_estimates=context.row_estimates,
+            prompt=prompt,
+            history=history,
+            deadline=llm_budget(request, llm_started),
+            examples=context.examples,
+            info=llm_info,
+        ),
+    )
+
+    outcome = await run_answer_sql(
+        request,
+        context,
+        prompt,
+        response_text,
+        extract_sql_from_response(response_text),
+        timings,
+        llm_info,
+        llm_started,
+        columnar=columnar,
+    )
+    query_result: Optional[Union[QueryResult, ColumnarQueryResult]] = None
+    visualization_config = None
+    if outcome.result is not None and outcome.sql:
+        if outcome.repaired:
+            visualization_config_dict = llm_service.extract_visualization_config(
+                outcome.response_text
+            )
+        serialize_started = time.perf_counter()
+        query_result = (
+            ColumnarQueryResult(**outcome.result)
+            if columnar
+            else QueryResult(**outcome.result)
+        )
+        visualization_config = choose_visualization(
+            query_result, visualization_config_dict, outcome.sql
+        )
+        timings["serialize"] = elapsed_ms(serialize_started)
+
+    metadata = await finish_chat(
+        request, context, prompt, history, llm_info, outcome, timings, started
+    )
+    return ChatResponse(
+        response=outcome.response_text,
+        conversation_id=conversation_id,
+        sql=outcome.sql,
+        query_result=query_result,
+        visualization=visualization_config,
+        metadata=metadata,
+    )
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream a chat answer as Server-Sent Events.
+
+    Emits ``token`` events while the model is writing, ``sql`` as soon as the
+    SQL block closes (preflight and execution start right then, in parallel
+    with the rest of the answer), then ``query_result``/``visualization`` and
+    a final ``done`` event carrying the full response text. A query refused
+    by the preflight emits ``preflight`` and, after one repair attempt, a new
+    ``sql`` event; a query that fails emits ``query_error``. Closing the
+    stream cancels a query that is still running.
+    """
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+
+    async def event_stream() -> AsyncIterator[str]:
+        query_task: Optional[asyncio.Task] = None
+        try:
+            metrics.bind_data_source(request.data_source_id, resolved=False)
+            yield sse_event("start", {"conversation_id": conversation_id})
+
+            timings: Dict[str, float] = {}
+            started = time.perf_counter()
+            context = await prepare_chat(request, conversation_id, timings)
+            if context.db_service is not None:
+                metrics.bind_data_source(request.data_source_id)
+            db_service = context.db_service
+            prompt, history = build_chat_prompt(request, context, timings)
+
+            response_text = ""
+            sql_query = None
+            llm_started = time.perf_counter()
+            llm_info: Dict[str, Any] = {}
+            async for delta in llm_service.stream_response(
+                message=request.message,
+                conversation_id=conversation_id,
+                schema_context=context.schema_context,
+                rules=context.rules,
+                row_estimates=context.row_estimates,
+                prompt=prompt,
+                history=history,
+                deadline=llm_budget(request, llm_started),
+                examples=context.examples,
+                info=llm_info,
+            ):
+                if not response_text:
+                    timings["first_token"] = elapsed_ms(llm_started)
+                response_text += delta
+                yield sse_event("token", {"content": delta})
+
+                # Only a backtick can complete the closing fence of the block
+                if sql_query is None and "`" in delta:
+                    sql_query = extract_sql_from_response(response_text)
+                    if sql_query:
+                        yield sse_event("sql", {"sql": sql_query})
+                        if db_service:
+                            query_task = asyncio.create_task(
+                                run_generated_sql(
+                                    db_service,
+                                    sql_query,
+                                    timings,
+                                    timeout_ms=request.timeout_ms,
+                                )
+                            )
+            timings["llm"] = elapsed_ms(llm_started)
+
+            outcome = await run_answer_sql(
+                request,
+                context,
+                prompt,
+                response_text,
+                sql_query,
+                timings,
+                llm_info,
+                llm_started,
+                query_task=query_task,
+            )
+            if outcome.rejection is not None:
+                yield sse_event(
+                    "preflight", {"status": "rejected", "reason": outcome.rejection}
+                )
+            if outcome.repaired:
+                yield sse_event("sql", {"sql": outcome.sql})
+            if outcome.result is not None and outcome.sql:
+                serialize_started = time.perf_counter()
+                query_result = QueryResult(**outcome.result)
+                result_event = sse_event("query_result", query_result.model_dump())
+                timings["serialize"] = elapsed_ms(serialize_started)
+                yield result_event
+
+                visualization_config = choose_visualization(
+                    query_result,
+                    llm_service.extract_visualization_config(outcome.response_text),
+                    outcome.sql,
+                )
+                yield sse_event("visualization", visualization_config.model_dump())
+            elif outcome.error is not None:
+                yield sse_event("query_error", {"detail": outcome.error})
+
+            metadata = await finish_chat(
+                request, context, prompt, history, llm_info, outcome, timings, started
+            )
+            yield sse_event(
+                "done",
+                {
+                    "conversation_id": conversation_id,
+                    "response": outcome.response_text,
+                    "sql": outcome.sql,
+                    "metadata": metadata,
+                },
+            )
+        except Exception as e:
+            metrics.errors.inc(stage="chat")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            if query_task and not query_task.done():
+                query_task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
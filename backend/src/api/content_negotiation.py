@@ -0,0 +1,10 @@
+from typing import Optional
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.bagofwords.columnar+json"
+
+
+def wants_columnar(accept: Optional[str]) -> bool:
+    if not accept:
+        return False
+    media_types = [part.split(";", 1)[0].strip() for part in accept.split(",")]
+    return COLUMNAR_MEDIA_TYPE in media_types
@@ -1,40 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import json
 import uuid
 import os
 
+from src.api.content_negotiation import wants_columnar
+from src.api.disconnect import cancel_on_disconnect
 from src.models import get_db
 from src.models.models import Dashboard, SavedChart, DataSourceConnection
 from src.schemas.dashboard import (
     DashboardCreate,
     DashboardUpdate,
     DashboardResponse,
+    DashboardSummaryResponse,
     SavedChartCreate,
     SavedChartResponse,
 )
-from src.services.database import DatabaseService
+from src.services import metrics
+from src.services.database import (
+    DatabaseService,
+    QueryTimeout,
+    build_connection_url,
+)
+from src.services.example_store import example_store
+from src.services.result_cache import result_cache
 
 router = APIRouter(tags=["dashboards"])
 
+DASHBOARD_EXECUTE_CONCURRENCY = int(os.getenv("DASHBOARD_EXECUTE_CONCURRENCY", "4"))
+
+
+async def _load_dashboard(dashboard_id: str, db: AsyncSession) -> Optional[Dashboard]:
+    # Charts are loaded eagerly; lazy loads are not available on async sessions
+    result = await db.execute(
+        select(Dashboard)
+        .options(selectinload(Dashboard.charts))
+        .where(Dashboard.id == dashboard_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
 
 @router.post("/dashboards", response_model=DashboardResponse)
-async def create_dashboard(dashboard: DashboardCreate, db: Session = Depends(get_db)):
+async def create_dashboard(
+    dashboard: DashboardCreate, db: AsyncSession = Depends(get_db)
+):
     db_dashboard = Dashboard(id=str(uuid.uuid4()), **dashboard.model_dump())
     db.add(db_dashboard)
-    db.commit()
-    db.refresh(db_dashboard)
-    return db_dashboard
+    await db.commit()
+    return await _load_dashboard(db_dashboard.id, db)
 
 
-@router.get("/dashboards", response_model=List[DashboardResponse])
-async def list_dashboards(db: Session = Depends(get_db)):
-    return db.query(Dashboard).all()
+@router.get("/dashboards", response_model=List[DashboardSummaryResponse])
+async def list_dashboards(
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    chart_count = func.count(SavedChart.id).label("chart_count")
+    result = await db.execute(
+        select(
+            Dashboard.id,
+            Dashboard.name,
+            Dashboard.description,
+            Dashboard.created_at,
+            Dashboard.updated_at,
+            chart_count,
+        )
+        .outerjoin(SavedChart, SavedChart.dashboard_id == Dashboard.id)
+        .group_by(Dashboard.id)
+        .order_by(Dashboard.created_at, Dashboard.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return [DashboardSummaryResponse.model_validate(row) for row in result.all()]
 
 
 @router.get("/dashboards/{dashboard_id}", response_model=DashboardResponse)
-async def get_dashboard(dashboard_id: str, db: Session = Depends(get_db)):
-    dashboard = db.query(Dashboard).filter(Dashboard.id == dashboard_id).first()
+async def get_dashboard(dashboard_id: str, db: AsyncSession = Depends(get_db)):
+    dashboard = await _load_dashboard(dashboard_id, db)
     if not dashboard:
         raise HTTPException(status_code=404, detail="Dashboard not found")
     return dashboard
@@ -42,9 +101,9 @@ async def get_dashboard(dashboard_id: str, db: Session = Depends(get_db)):
 
 @router.put("/dashboards/{dashboard_id}", response_model=DashboardResponse)
 async def update_dashboard(
-    dashboard_id: str, dashboard: DashboardUpdate, db: Session = Depends(get_db)
+    dashboard_id: str, dashboard: DashboardUpdate, db: AsyncSession = Depends(get_db)
 ):
-    db_dashboard = db.query(Dashboard).filter(Dashboard.id == dashboard_id).first()
+    db_dashboard = await db.get(Dashboard, dashboard_id)
     if not db_dashboard:
         raise HTTPException(status_code=404, detail="Dashboard not found")
 
@@ -52,65 +111,68 @@ async def update_dashboard(
     for key, value in update_data.items():
         setattr(db_dashboard, key, value)
 
-    db.commit()
-    db.refresh(db_dashboard)
-    return db_dashboard
+    await db.commit()
+    return await _load_dashboard(dashboard_id, db)
 
 
 @router.delete("/dashboards/{dashboard_id}", status_code=204)
-async def delete_dashboard(dashboard_id: str, db: Session = Depends(get_db)):
-    db_dashboard = db.query(Dashboard).filter(Dashboard.id == dashboard_id).first()
+async def delete_dashboard(dashboard_id: str, db: AsyncSession = Depends(get_db)):
+    # The delete cascades to the charts, so they must be loaded up front
+    db_dashboard = await _load_dashboard(dashboard_id, db)
     if not db_dashboard:
         raise HTTPException(status_code=404, detail="Dashboard not found")
 
-    db.delete(db_dashboard)
-    db.commit()
+    await db.delete(db_dashboard)
+    await db.commit()
 
 
 @router.post("/dashboards/{dashboard_id}/charts", response_model=SavedChartResponse)
 async def create_chart(
-    dashboard_id: str, chart: SavedChartCreate, db: Session = Depends(get_db)
+    dashboard_id: str,
+    chart: SavedChartCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
 ):
-    dashboard = db.query(Dashboard).filter(Dashboard.id == dashboard_id).first()
+    dashboard = await db.get(Dashboard, dashboard_id)
     if not dashboard:
         raise HTTPException(status_code=404, detail="Dashboard not found")
 
-    db_chart = SavedChart(id=str(uuid.uuid4()), **chart.model_dump())
+    db_chart = SavedChart(
+        id=str(uuid.uuid4()),
+        **chart.model_dump(exclude={"question"}),
+    )
     db.add(db_chart)
-    db.commit()
-    db.refresh(db_chart)
+    await db.commit()
+    await db.refresh(db_chart)
+
+    # Recorded after the response is sent; persisting it is not the
+    # client's concern
+    background_tasks.add_task(
+        example_store.record,
+        chart.question or chart.title,
+        chart.sql,
+        chart.data_source_id,
+        source="chart",
+    )
     return db_chart
 
 
 @router.delete("/charts/{chart_id}", status_code=204)
-async def delete_chart(chart_id: str, db: Session = Depends(get_db)):
-    db_chart = db.query(SavedChart).filter(SavedChart.id == chart_id).first()
+async def delete_chart(chart_id: str, db: AsyncSession = Depends(get_db)):
+    db_chart = await db.get(SavedChart, chart_id)
     if not db_chart:
         raise HTTPException(status_code=404, detail="Chart not found")
 
-    db.delete(db_chart)
-    db.commit()
+    await db.delete(db_chart)
+    await db.commit()
 
 
-@router.post("/charts/{chart_id}/execute")
-async def execute_chart(
-    chart_id: str, data_source_id: Optional[str] = None, db: Session = Depends(get_db)
-):
-    """Execute a saved chart's query and return the results"""
-    db_chart = db.query(SavedChart).filter(SavedChart.id == chart_id).first()
-    if not db_chart:
-        raise HTTPException(status_code=404, detail="Chart not found")
-
-    # Get database connection
-    db_service = None
-
+async def _resolve_database(
+    data_source_id: Optional[str], db: AsyncSession
+) -> DatabaseService:
     if data_source_id:
         # Use specified data source
-        data_source = (
-            db.query(DataSourceConnection)
-            .filter(DataSourceConnection.id == data_source_id)
-            .first()
-        )
+        data_source = await db.get(DataSourceConnection, data_source_id)
 
         if not data_source:
             raise HTTPException(status_code=404, detail="Data source not found")
@@ -118,18 +180,166 @@ async def execute_chart(
         if str(data_source.status) != "connected":
             raise HTTPException(status_code=400, detail="Data source not connected")
 
-        connection_string = f"postgresql://{data_source.username}:{data_source.password}@{data_source.host}:{data_source.port}/{data_source.database}"
-        db_service = DatabaseService(database_url=connection_string)
-    else:
-        # Use default database
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            raise HTTPException(status_code=500, detail="No database configured")
-        db_service = DatabaseService(database_url=database_url)
+        return DatabaseService(
+            database_url=build_connection_url(data_source),
+            data_source_id=data_source_id,
+            statement_timeout_ms=data_source.statement_timeout_ms,  # type: ignore[arg-type]
+            read_only=data_source.read_only,  # type: ignore[arg-type]
+        )
+
+    # Use default database
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise HTTPException(status_code=500, detail="No database configured")
+    return DatabaseService(database_url=database_url)
+
 
-    # Execute the query
+@router.post("/charts/{chart_id}/execute")
+async def execute_chart(
+    chart_id: str,
+    request: Request,
+    response: Response,
+    data_source_id: Optional[str] = None,
+    max_rows: Optional[int] = None,
+    page_token: Optional[str] = None,
+    refresh: bool = False,
+    timeout_ms: Optional[int] = None,
+    accept: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Execute a saved chart's query and return the results"""
+    metrics.bind_data_source(data_source_id, resolved=False)
+    db_chart = await db.get(SavedChart, chart_id)
+    if not db_chart:
+        raise HTTPException(status_code=404, detail="Chart not found")
+
+    # Charts run against the source they were saved from unless told otherwise,
+    # which is also what the scheduler warms the cache for
+    data_source_id = data_source_id or db_chart.data_source_id  # type: ignore[assignment]
+    db_service = await _resolve_database(data_source_id, db)
+    metrics.bind_data_source(data_source_id)
+
+    # Execute the query, serving from the result cache while it is fresh. If
+    # the client goes away first the query is cancelled in the warehouse.
     try:
-        result = db_service.execute_query(str(db_chart.sql))
+        result, cache_status, age = await cancel_on_disconnect(
+            request,
+            result_cache.execute_query(
+                db_service,
+                str(db_chart.sql),
+                db_chart.refresh_interval,  # type: ignore[arg-type]
+                max_rows=max_rows,
+                page_token=page_token,
+                columnar=wants_columnar(accept),
+                refresh=refresh,
+                timeout_ms=timeout_ms,
+                watermark_column=db_chart.watermark_column,  # type: ignore[arg-type]
+                late_arrival_window=db_chart.late_arrival_window,  # type: ignore[arg-type]
+            ),
+        )
+        response.headers["X-Cache"] = cache_status
+        response.headers["Age"] = str(int(age))
         return {"chart_id": chart_id, "query_result": result}
+    except HTTPException:
+        raise
+    except QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query execution failed: {str(e)}")
+
+
+@router.post("/dashboards/{dashboard_id}/execute")
+async def execute_dashboard(
+    dashboard_id: str,
+    data_source_id: Optional[str] = None,
+    refresh: bool = False,
+    accept: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Execute every chart of a dashboard concurrently.
+
+    Results are streamed back as NDJSON, one line per chart in completion
+    order, so the page can render each chart as soon as its query returns.
+    """
+    metrics.bind_data_source(data_source_id, resolved=False)
+    result = await db.execute(
+        select(SavedChart).where(SavedChart.dashboard_id == dashboard_id)
+    )
+    db_charts = result.scalars().all()
+    if not db_charts and not await db.get(Dashboard, dashboard_id):
+        raise HTTPException(status_code=404, detail="Dashboard not found")
+
+    # Each chart runs against the source it was saved from unless one is given,
+    # like execute_chart. Sources are resolved up front, while the session is
+    # open; one that has gone away fails only the charts saved from it.
+    databases: Dict[Optional[str], Any] = {}
+    if data_source_id:
+        databases[data_source_id] = await _resolve_database(data_source_id, db)
+        metrics.bind_data_source(data_source_id)
+    for chart in db_charts:
+        chart_source = data_source_id or chart.data_source_id
+        if chart_source not in databases:
+            try:
+                databases[chart_source] = await _resolve_database(chart_source, db)
+            except HTTPException as e:
+                databases[chart_source] = e
+    columnar = wants_columnar(accept)
+    # Copy what we need; the session is closed before the stream is consumed
+    charts = [
+        (
+            str(chart.id),
+            data_source_id or chart.data_source_id,
+            str(chart.sql),
+            chart.refresh_interval,
+            chart.watermark_column,
+            chart.late_arrival_window,
+        )
+        for chart in db_charts
+    ]
+    semaphore = asyncio.Semaphore(DASHBOARD_EXECUTE_CONCURRENCY)
+
+    async def run_chart(
+        chart_id: str,
+        chart_source: Optional[str],
+        sql: str,
+        refresh_interval: Optional[int],
+        watermark_column: Optional[str],
+        late_arrival_window: Optional[int],
+    ) -> Dict[str, Any]:
+        db_service = databases[chart_source]
+        if isinstance(db_service, HTTPException):
+            return {"chart_id": chart_id, "error": db_service.detail}
+        # Runs in its own task, so the label stays with this chart
+        metrics.bind_data_source(chart_source)
+        async with semaphore:
+            try:
+                result, cache_status, age = await result_cache.execute_query(
+                    db_service,
+                    sql,
+                    refresh_interval,
+                    columnar=columnar,
+                    refresh=refresh,
+                    watermark_column=watermark_column,
+                    late_arrival_window=late_arrival_window,
+                )
+                return {
+                    "chart_id": chart_id,
+                    "query_result": result,
+                    "cache": cache_status,
+                    "age": int(age),
+                }
+            except Exception as e:
+                return {"chart_id": chart_id, "error": f"Query execution failed: {e}"}
+
+    async def stream_results() -> AsyncIterator[str]:
+        tasks = [asyncio.create_task(run_chart(*chart)) for chart in charts]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(jsonable_encoder(await next_result)) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
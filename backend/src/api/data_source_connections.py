@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import uuid
 
@@ -12,38 +13,42 @@ from src.schemas.data_source import (
     TestConnectionResponse,
     DatabaseSchemaResponse,
 )
-from src.services.database import DatabaseService
+from src.services.database import (
+    DatabaseService,
+    build_connection_url,
+    engine_registry,
+)
+from src.services.result_cache import result_cache
+from src.services.rule_cache import rule_cache
+from src.services.schema_cache import schema_cache
 
 router = APIRouter(tags=["data-sources"])
 
 
 @router.post("/data-sources", response_model=DataSourceConnectionResponse)
 async def create_data_source(
-    data_source: DataSourceConnectionCreate, db: Session = Depends(get_db)
+    data_source: DataSourceConnectionCreate, db: AsyncSession = Depends(get_db)
 ):
     db_data_source = DataSourceConnection(
         id=str(uuid.uuid4()), status="disconnected", **data_source.model_dump()
     )
     db.add(db_data_source)
-    db.commit()
-    db.refresh(db_data_source)
+    await db.commit()
+    await db.refresh(db_data_source)
     return db_data_source
 
 
 @router.get("/data-sources", response_model=List[DataSourceConnectionResponse])
-async def list_data_sources(db: Session = Depends(get_db)):
-    return db.query(DataSourceConnection).all()
+async def list_data_sources(db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(DataSourceConnection))
+    return result.scalars().all()
 
 
 @router.get(
     "/data-sources/{data_source_id}", response_model=DataSourceConnectionResponse
 )
-async def get_data_source(data_source_id: str, db: Session = Depends(get_db)):
-    data_source = (
-        db.query(DataSourceConnection)
-        .filter(DataSourceConnection.id == data_source_id)
-        .first()
-    )
+async def get_data_source(data_source_id: str, db: AsyncSession = Depends(get_db)):
+    data_source = await db.get(DataSourceConnection, data_source_id)
     if not data_source:
         raise HTTPException(status_code=404, detail="Data source not found")
     return data_source
@@ -55,13 +60,9 @@ async def get_data_source(data_source_id: str, db: Session = Depends(get_db)):
 async def update_data_source(
     data_source_id: str,
     data_source: DataSourceConnectionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    db_data_source = (
-        db.query(DataSourceConnection)
-        .filter(DataSourceConnection.id == data_source_id)
-        .first()
-    )
+    db_data_source = await db.get(DataSourceConnection, data_source_id)
     if not db_data_source:
         raise HTTPException(status_code=404, detail="Data source not found")
 
@@ -69,47 +70,48 @@ async def update_data_source(
     for key, value in update_data.items():
         setattr(db_data_source, key, value)
 
-    db.commit()
-    db.refresh(db_data_source)
+    await db.commit()
+    await db.refresh(db_data_source)
+    engine_registry.dispose(data_source_id)
+    schema_cache.invalidate(data_source_id)
+    result_cache.invalidate_source(data_source_id)
     return db_data_source
 
 
 @router.delete("/data-sources/{data_source_id}", status_code=204)
-async def delete_data_source(data_source_id: str, db: Session = Depends(get_db)):
-    db_data_source = (
-        db.query(DataSourceConnection)
-        .filter(DataSourceConnection.id == data_source_id)
-        .first()
-    )
+async def delete_data_source(data_source_id: str, db: AsyncSession = Depends(get_db)):
+    db_data_source = await db.get(DataSourceConnection, data_source_id)
     if not db_data_source:
         raise HTTPException(status_code=404, detail="Data source not found")
 
-    db.delete(db_data_source)
-    db.commit()
+    await db.delete(db_data_source)
+    await db.commit()
+    engine_registry.dispose(data_source_id)
+    schema_cache.invalidate(data_source_id)
+    result_cache.invalidate_source(data_source_id)
+    # Rules scoped to this data source are deleted with it
+    rule_cache.invalidate()
 
 
 @router.post(
     "/data-sources/{data_source_id}/test", response_model=TestConnectionResponse
 )
 async def test_data_source_connection(
-    data_source_id: str, db: Session = Depends(get_db)
+    data_source_id: str, db: AsyncSession = Depends(get_db)
 ):
-    data_source = (
-        db.query(DataSourceConnection)
-        .filter(DataSourceConnection.id == data_source_id)
-        .first()
-    )
+    data_source = await db.get(DataSourceConnection, data_source_id)
     if not data_source:
         raise HTTPException(status_code=404, detail="Data source not found")
 
-    database_url = f"{data_source.type}://{data_source.username}:{data_source.password}@{data_source.host}:{data_source.port}/{data_source.database}"
-
     try:
-        db_service = DatabaseService(database_url=database_url)
-        is_connected = db_service.test_connection()
+        db_service = DatabaseService(
+            database_url=build_connection_url(data_source),
+            data_source_id=data_source_id,
+        )
+        is_connected = await db_service.test_connection_async()
 
         data_source.status = "connected" if is_connected else "disconnected"
-        db.commit()
+        await db.commit()
 
         return TestConnectionResponse(
             success=is_connected,
@@ -117,27 +119,48 @@ async def test_data_source_connection(
         )
     except Exception as e:
         data_source.status = "disconnected"
-        db.commit()
+        await db.commit()
         return TestConnectionResponse(success=False, message=str(e))
 
 
 @router.get(
     "/data-sources/{data_source_id}/schema", response_model=DatabaseSchemaResponse
 )
-async def get_data_source_schema(data_source_id: str, db: Session = Depends(get_db)):
-    data_source = (
-        db.query(DataSourceConnection)
-        .filter(DataSourceConnection.id == data_source_id)
-        .first()
-    )
+async def get_data_source_schema(
+    data_source_id: str, db: AsyncSession = Depends(get_db)
+):
+    data_source = await db.get(DataSourceConnection, data_source_id)
     if not data_source:
         raise HTTPException(status_code=404, detail="Data source not found")
 
-    database_url = f"{data_source.type}://{data_source.username}:{data_source.password}@{data_source.host}:{data_source.port}/{data_source.database}"
+    try:
+        db_service = DatabaseService(
+            database_url=build_connection_url(data_source),
+            data_source_id=data_source_id,
+        )
+        schema = await db_service.get_schema_async()
+        return DatabaseSchemaResponse(tables=schema)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/data-sources/{data_source_id}/schema/refresh",
+    response_model=DatabaseSchemaResponse,
+)
+async def refresh_data_source_schema(
+    data_source_id: str, db: AsyncSession = Depends(get_db)
+):
+    data_source = await db.get(DataSourceConnection, data_source_id)
+    if not data_source:
+        raise HTTPException(status_code=404, detail="Data source not found")
 
     try:
-        db_service = DatabaseService(database_url=database_url)
-        schema = db_service.get_schema()
+        db_service = DatabaseService(
+            database_url=build_connection_url(data_source),
+            data_source_id=data_source_id,
+        )
+        schema = await db_service.get_schema_async(refresh=True)
         return DatabaseSchemaResponse(tables=schema)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
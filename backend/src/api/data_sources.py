@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException
-from src.services.database import DatabaseService
+from fastapi import APIRouter, Header, HTTPException
+from src.api.content_negotiation import wants_columnar
+from src.services.database import DatabaseService, QueryTimeout
 from pydantic import BaseModel
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 router = APIRouter(tags=["data-sources"])
 
@@ -13,13 +14,15 @@ class TestConnectionRequest(BaseModel):
 class ExecuteQueryRequest(BaseModel):
     sql: str
     database_url: str
+    max_rows: Optional[int] = None
+    page_token: Optional[str] = None
 
 
 @router.post("/data-sources/test")
 async def test_connection(request: TestConnectionRequest):
     try:
         db_service = DatabaseService(database_url=request.database_url)
-        is_connected = db_service.test_connection()
+        is_connected = await db_service.test_connection_async()
 
         return {
             "success": is_connected,
@@ -33,7 +36,7 @@ async def test_connection(request: TestConnectionRequest):
 async def get_schema(request: TestConnectionRequest):
     try:
         db_service = DatabaseService(database_url=request.database_url)
-        schema = db_service.get_schema()
+        schema = await db_service.get_schema_async()
 
         return {"schema": schema}
     except Exception as e:
@@ -41,11 +44,22 @@ async def get_schema(request: TestConnectionRequest):
 
 
 @router.post("/data-sources/execute")
-async def execute_query(request: ExecuteQueryRequest):
+async def execute_query(
+    request: ExecuteQueryRequest, accept: Optional[str] = Header(default=None)
+):
     try:
         db_service = DatabaseService(database_url=request.database_url)
-        result = db_service.execute_query(request.sql)
+        result = await db_service.execute_query_async(
+            request.sql,
+            max_rows=request.max_rows,
+            page_token=request.page_token,
+            columnar=wants_columnar(accept),
+        )
 
         return result
+    except QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,32 @@
+from fastapi import HTTPException, Request
+from typing import Awaitable, TypeVar
+import asyncio
+import os
+
+T = TypeVar("T")
+
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+# nginx's "client closed request"; nobody is left to read it
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable``, cancelling it if the client disconnects first.
+
+    Plain (non-streaming) handlers otherwise keep running after the client
+    has gone, along with whatever warehouse query they are waiting on.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise HTTPException(
+                    status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request"
+                )
+    finally:
+        if not task.done():
+            task.cancel()
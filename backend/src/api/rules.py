@@ -1,40 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import uuid
 
 from src.models import get_db
 from src.models.models import Rule
 from src.schemas.rule import RuleCreate, RuleUpdate, RuleResponse
+from src.services.rule_cache import rule_cache
 
 router = APIRouter(tags=["rules"])
 
 
 @router.post("/rules", response_model=RuleResponse)
-async def create_rule(rule: RuleCreate, db: Session = Depends(get_db)):
+async def create_rule(rule: RuleCreate, db: AsyncSession = Depends(get_db)):
     db_rule = Rule(id=str(uuid.uuid4()), **rule.model_dump())
     db.add(db_rule)
-    db.commit()
-    db.refresh(db_rule)
+    await db.commit()
+    await db.refresh(db_rule)
+    rule_cache.invalidate()
     return db_rule
 
 
 @router.get("/rules", response_model=List[RuleResponse])
-async def list_rules(db: Session = Depends(get_db)):
-    return db.query(Rule).all()
+async def list_rules(db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(Rule))
+    return result.scalars().all()
 
 
 @router.get("/rules/{rule_id}", response_model=RuleResponse)
-async def get_rule(rule_id: str, db: Session = Depends(get_db)):
-    rule = db.query(Rule).filter(Rule.id == rule_id).first()
+async def get_rule(rule_id: str, db: AsyncSession = Depends(get_db)):
+    rule = await db.get(Rule, rule_id)
     if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
     return rule
 
 
 @router.patch("/rules/{rule_id}", response_model=RuleResponse)
-async def update_rule(rule_id: str, rule: RuleUpdate, db: Session = Depends(get_db)):
-    db_rule = db.query(Rule).filter(Rule.id == rule_id).first()
+async def update_rule(
+    rule_id: str, rule: RuleUpdate, db: AsyncSession = Depends(get_db)
+):
+    db_rule = await db.get(Rule, rule_id)
     if not db_rule:
         raise HTTPException(status_code=404, detail="Rule not found")
 
@@ -42,16 +48,18 @@ async def update_rule(rule_id: str, rule: RuleUpdate, db: Session = Depends(get_
     for key, value in update_data.items():
         setattr(db_rule, key, value)
 
-    db.commit()
-    db.refresh(db_rule)
+    await db.commit()
+    await db.refresh(db_rule)
+    rule_cache.invalidate()
     return db_rule
 
 
 @router.delete("/rules/{rule_id}", status_code=204)
-async def delete_rule(rule_id: str, db: Session = Depends(get_db)):
-    db_rule = db.query(Rule).filter(Rule.id == rule_id).first()
+async def delete_rule(rule_id: str, db: AsyncSession = Depends(get_db)):
+    db_rule = await db.get(Rule, rule_id)
     if not db_rule:
         raise HTTPException(status_code=404, detail="Rule not found")
 
-    db.delete(db_rule)
-    db.commit()
+    await db.delete(db_rule)
+    await db.commit()
+    rule_cache.invalidate()
@@ -1,7 +1,9 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from pathlib import Path
+import os
 
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -9,14 +11,35 @@ load_dotenv(dotenv_path=env_path)
 from src.api import (
     chat,
     health,
+    metrics,
     data_sources,
     dashboards,
     data_source_connections,
     rules,
 )
+from src.services.database import engine_registry, query_executor
+from src.services.llm_cache import llm_response_cache
+from src.services.result_cache import result_cache
+from src.services.scheduler import chart_refresh_scheduler
 
-app = FastAPI(title="Bag of Words API", version="0.1.0")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("CHART_REFRESH_ENABLED", "true").lower() == "true":
+        chart_refresh_scheduler.start()
+    llm_response_cache.start()
+    yield
+    await chart_refresh_scheduler.stop()
+    await llm_response_cache.stop()
+    # Queries nobody waits for anymore still hold executor threads
+    await result_cache.close()
+    query_executor.shutdown()
+    engine_registry.dispose_all()
+
+
+app = FastAPI(title="Bag of Words API", version="0.1.0", lifespan=lifespan)
+
+app.add_middleware(metrics.MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
@@ -26,6 +49,7 @@ app.add_middleware(
 )
 
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(chat.router, prefix="/api")
 app.include_router(data_sources.router, prefix="/api")
 app.include_router(dashboards.router, prefix="/api")
@@ -7,9 +7,10 @@ from sqlalchemy import (
     Integer,
     JSON,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, true
 from src.models import Base
 
 
@@ -41,6 +42,14 @@ class SavedChart(Base):
     sql = Column(Text, nullable=False)
     visualization = Column(JSON, nullable=False)
     refresh_interval = Column(Integer)
+    # Result column that only grows (e.g. a date); refreshes then read just
+    # the rows past the cached maximum, minus the late-arrival window
+    watermark_column = Column(String(255))
+    late_arrival_window = Column(Integer)
+    # Data source the chart was saved from, refreshed against in the
+    # background; no foreign key, so a deleted source leaves the chart
+    # unscheduled instead of re-pointed at the default database
+    data_source_id = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     dashboard = relationship("Dashboard", back_populates="charts")
@@ -58,6 +67,8 @@ class DataSourceConnection(Base):
     username = Column(String(255), nullable=False)
     password = Column(Text, nullable=False)
     status = Column(String(20), default="disconnected")
+    statement_timeout_ms = Column(Integer)
+    read_only = Column(Boolean, default=True, server_default=true(), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -73,7 +84,86 @@ class Rule(Base):
     scope = Column(String(50), nullable=False)
     prompt = Column(Text, nullable=False)
     active = Column(Boolean, default=True)
+    data_source_id = Column(
+        String,
+        ForeignKey("data_source_connections.id", ondelete="CASCADE"),
+        nullable=True,
+    )
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+
+
+class CachedLLMResponse(Base):
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String(64), primary_key=True)
+    fuzzy_key = Column(String(64), index=True)
+    model = Column(String(255), nullable=False)
+    response = Column(Text, nullable=False)
+    visualization = Column(JSON)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+
+    id = Column(String, primary_key=True)
+    data_source_id = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    turns = relationship(
+        "ConversationTurn",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        order_by="ConversationTurn.position",
+    )
+
+
+class ConversationTurn(Base):
+    __tablename__ = "conversation_turns"
+    __table_args__ = (
+        Index(
+            "ix_conversation_turns_conversation_id_position",
+            "conversation_id",
+            "position",
+            unique=True,
+        ),
+    )
+
+    id = Column(String, primary_key=True)
+    conversation_id = Column(
+        String, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False
+    )
+    position = Column(Integer, nullable=False)
+    message = Column(Text, nullable=False)
+    response = Column(Text, nullable=False)
+    sql = Column(Text)
+    result_summary = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    conversation = relationship("Conversation", back_populates="turns")
+
+
+class VerifiedExample(Base):
+    __tablename__ = "verified_examples"
+
+    # Digest of the data source, normalized question and normalized SQL
+    id = Column(String(64), primary_key=True)
+    data_source_id = Column(
+        String,
+        ForeignKey("data_source_connections.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+    )
+    question = Column(Text, nullable=False)
+    sql = Column(Text, nullable=False)
+    source = Column(String(20), nullable=False)
+    use_count = Column(Integer, nullable=False, default=1, server_default="1")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal, Union
 
 
 class ChatRequest(BaseModel):
@@ -7,12 +7,31 @@ class ChatRequest(BaseModel):
     conversation_id: Optional[str] = None
     rules: Optional[List[Dict[str, Any]]] = None
     data_source_id: Optional[str] = None
+    # Shortens the data source's statement timeout for this request's query
+    timeout_ms: Optional[int] = None
+    # Total time the LLM gets to answer, repair attempt included
+    llm_deadline_ms: Optional[int] = None
 
 
 class QueryResult(BaseModel):
     columns: List[str]
     rows: List[Dict[str, Any]]
     row_count: int
+    truncated: bool = False
+    next_page_token: Optional[str] = None
+    # Set when the rows stop short for a reason other than the page size
+    note: Optional[str] = None
+
+
+class ColumnarQueryResult(BaseModel):
+    format: Literal["columnar"] = "columnar"
+    columns: List[str]
+    data: List[List[Any]]
+    row_count: int
+    truncated: bool = False
+    next_page_token: Optional[str] = None
+    # Set when the rows stop short for a reason other than the page size
+    note: Optional[str] = None
 
 
 class VisualizationConfig(BaseModel):
@@ -28,7 +47,7 @@ class ChatResponse(BaseModel):
     response: str
     conversation_id: str
     sql: Optional[str] = None
-    query_result: Optional[QueryResult] = None
+    query_result: Optional[Union[QueryResult, ColumnarQueryResult]] = None
     visualization: Optional[VisualizationConfig] = None
     metadata: Optional[Dict[str, Any]] = None
 
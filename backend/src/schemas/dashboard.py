@@ -8,15 +8,25 @@ class SavedChartBase(BaseModel):
     sql: str
     visualization: dict
     refresh_interval: Optional[int] = None
+    watermark_column: Optional[str] = None
+    # Seconds for date/time watermarks, column units for numeric ones
+    late_arrival_window: Optional[int] = None
 
 
 class SavedChartCreate(SavedChartBase):
     dashboard_id: str
+    # The chat question and data source the chart was saved from; kept as a
+    # verified example for future prompts. Only sent for a conversation's
+    # opening question, since follow-ups don't stand on their own; the
+    # title stands in otherwise.
+    question: Optional[str] = None
+    data_source_id: Optional[str] = None
 
 
 class SavedChartResponse(SavedChartBase):
     id: str
     dashboard_id: str
+    data_source_id: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -47,3 +57,15 @@ class DashboardResponse(DashboardBase):
 
     class Config:
         from_attributes = True
+
+
+class DashboardSummaryResponse(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    chart_count: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional
 from datetime import datetime
 
@@ -11,6 +11,9 @@ class DataSourceConnectionBase(BaseModel):
     database: str
     username: str
     password: str
+    # Per-query limit in milliseconds; falls back to QUERY_STATEMENT_TIMEOUT_MS
+    statement_timeout_ms: Optional[int] = None
+    read_only: bool = True
 
 
 class DataSourceConnectionCreate(DataSourceConnectionBase):
@@ -25,6 +28,16 @@ class DataSourceConnectionUpdate(BaseModel):
     database: Optional[str] = None
     username: Optional[str] = None
     password: Optional[str] = None
+    statement_timeout_ms: Optional[int] = None
+    read_only: Optional[bool] = None
+
+    @field_validator("read_only")
+    @classmethod
+    def read_only_not_null(cls, value: Optional[bool]) -> bool:
+        # Omit the field to leave it unchanged; null would clear the flag
+        if value is None:
+            raise ValueError("read_only must be true or false")
+        return value
 
 
 class DataSourceConnectionResponse(BaseModel):
@@ -36,6 +49,8 @@ class DataSourceConnectionResponse(BaseModel):
     database: str
     username: str
     status: str
+    statement_timeout_ms: Optional[int] = None
+    read_only: bool = True
     created_at: datetime
     updated_at: datetime
 
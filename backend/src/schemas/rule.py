@@ -9,6 +9,7 @@ class RuleBase(BaseModel):
     scope: str
     prompt: str
     active: bool = True
+    data_source_id: Optional[str] = None
 
 
 class RuleCreate(RuleBase):
@@ -21,6 +22,7 @@ class RuleUpdate(BaseModel):
     scope: Optional[str] = None
     prompt: Optional[str] = None
     active: Optional[bool] = None
+    data_source_id: Optional[str] = None
 
 
 class RuleResponse(RuleBase):
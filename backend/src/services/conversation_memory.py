@@ -0,0 +1,276 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Any
+import os
+import re
+import threading
+import uuid
+
+from openai.types.chat import ChatCompletionMessageParam
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from src.services.normalization import collapse_whitespace
+from src.services.prompt_builder import estimate_tokens
+
+_VISUALIZATION_BLOCK = re.compile(r"\s*```visualization.*?```", re.DOTALL)
+
+
+def summarize_result(result: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not result:
+        return None
+    columns = result.get("columns") or []
+    summary = f"{result.get('row_count', 0)} rows; columns: {', '.join(columns)}"
+    if result.get("truncated"):
+        summary += " (truncated)"
+    return summary
+
+
+@dataclass
+class Turn:
+    message: str
+    response: str
+    sql: Optional[str] = None
+    result_summary: Optional[str] = None
+
+    def assistant_content(self) -> str:
+        # The visualization JSON is noise for follow-ups; the SQL block stays
+        content = _VISUALIZATION_BLOCK.sub("", self.response).strip()
+        if self.result_summary:
+            content += f"\n\nResult: {self.result_summary}"
+        return content
+
+    def summary_line(self) -> str:
+        line = f"- Asked: {self.message.strip()}"
+        if self.sql:
+            line += f" | SQL: {collapse_whitespace(self.sql)}"
+        if self.result_summary:
+            line += f" | Result: {self.result_summary}"
+        return line
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.message) + estimate_tokens(self.assistant_content())
+
+
+@dataclass
+class ConversationState:
+    id: str
+    data_source_id: Optional[str] = None
+    turns: List[Turn] = field(default_factory=list)
+    summary_lines: List[str] = field(default_factory=list)
+    next_position: int = 0
+
+    def history_messages(self) -> List[ChatCompletionMessageParam]:
+        messages: List[ChatCompletionMessageParam] = []
+        if self.summary_lines:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": "Summary of earlier turns in this conversation:\n"
+                    + "\n".join(self.summary_lines),
+                }
+            )
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn.message})
+            messages.append({"role": "assistant", "content": turn.assistant_content()})
+        return messages
+
+    def retrieval_text(self) -> str:
+        # Follow-ups like "now split by region" name no tables themselves
+        if not self.turns:
+            return ""
+        last = self.turns[-1]
+        return f"{last.message} {last.sql or ''}"
+
+
+class ConversationMemory:
+    """Prior turns of active conversations, bounded by a token budget.
+
+    The most recent turns are replayed verbatim while they fit in
+    ``history_token_budget``; older ones are folded into one-line summaries
+    (question, SQL, result shape) that are themselves capped at
+    ``summary_token_budget``. Active conversations stay in an in-memory LRU
+    and every turn is written to the app database, so a conversation that
+    fell out of memory or survived a restart is rebuilt from its last
+    ``load_turns`` turns.
+    """
+
+    def __init__(
+        self,
+        max_conversations: Optional[int] = None,
+        history_token_budget: Optional[int] = None,
+        summary_token_budget: Optional[int] = None,
+        load_turns: Optional[int] = None,
+    ):
+        self.max_conversations = (
+            max_conversations
+            if max_conversations is not None
+            else int(os.getenv("CONVERSATION_CACHE_SIZE", "256"))
+        )
+        self.history_token_budget = (
+            history_token_budget
+            if history_token_budget is not None
+            else int(os.getenv("CONVERSATION_HISTORY_TOKEN_BUDGET", "1500"))
+        )
+        self.summary_token_budget = (
+            summary_token_budget
+            if summary_token_budget is not None
+            else int(os.getenv("CONVERSATION_SUMMARY_TOKEN_BUDGET", "300"))
+        )
+        self.load_turns = (
+            load_turns
+            if load_turns is not None
+            else int(os.getenv("CONVERSATION_LOAD_TURNS", "50"))
+        )
+        self._conversations: "OrderedDict[str, ConversationState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, conversation_id: str) -> ConversationState:
+        with self._lock:
+            state = self._conversations.get(conversation_id)
+            if state is not None:
+                self._conversations.move_to_end(conversation_id)
+                return state
+
+        try:
+            state = await self._load(conversation_id)
+        except Exception as e:
+            print(f"Failed to load conversation {conversation_id}: {e}")
+            state = None
+        if state is None:
+            state = ConversationState(id=conversation_id)
+        self._remember(state)
+        return state
+
+    async def append(
+        self,
+        state: ConversationState,
+        message: str,
+        response: str,
+        sql: Optional[str] = None,
+        result_summary: Optional[str] = None,
+        data_source_id: Optional[str] = None,
+    ) -> None:
+        turn = Turn(
+            message=message, response=response, sql=sql, result_summary=result_summary
+        )
+        position = state.next_position
+        state.next_position += 1
+        if data_source_id:
+            state.data_source_id = data_source_id
+        self._add_turn(state, turn)
+        self._remember(state)
+
+        try:
+            await self._store(state, turn, position)
+        except Exception as e:
+            print(f"Failed to persist conversation {state.id}: {e}")
+
+    def _add_turn(self, state: ConversationState, turn: Turn) -> None:
+        state.turns.append(turn)
+
+        used = sum(t.tokens for t in state.turns)
+        while len(state.turns) > 1 and used > self.history_token_budget:
+            oldest = state.turns.pop(0)
+            used -= oldest.tokens
+            state.summary_lines.append(oldest.summary_line())
+
+        while (
+            len(state.summary_lines) > 1
+            and estimate_tokens("\n".join(state.summary_lines))
+            > self.summary_token_budget
+        ):
+            state.summary_lines.pop(0)
+
+    def _remember(self, state: ConversationState) -> None:
+        with self._lock:
+            self._conversations[state.id] = state
+            self._conversations.move_to_end(state.id)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+
+    async def _load(self, conversation_id: str) -> Optional[ConversationState]:
+        from src.models import SessionLocal
+        from src.models.models import Conversation, ConversationTurn
+
+        async with SessionLocal() as db:
+            conversation = await db.get(Conversation, conversation_id)
+            if conversation is None:
+                return None
+
+            result = await db.execute(
+                select(ConversationTurn)
+                .where(ConversationTurn.conversation_id == conversation_id)
+                .order_by(ConversationTurn.position.desc())
+                .limit(self.load_turns)
+            )
+            rows = list(reversed(result.scalars().all()))
+
+        state = ConversationState(
+            id=conversation_id,
+            data_source_id=conversation.data_source_id,  # type: ignore[arg-type]
+            next_position=int(rows[-1].position) + 1 if rows else 0,
+        )
+        for row in rows:
+            self._add_turn(
+                state,
+                Turn(
+                    message=str(row.message),
+                    response=str(row.response),
+                    sql=row.sql,  # type: ignore[arg-type]
+                    result_summary=row.result_summary,  # type: ignore[arg-type]
+                ),
+            )
+        return state
+
+    async def _store(self, state: ConversationState, turn: Turn, position: int):
+        # Another worker may have written this position first (its copy of
+        # the conversation was ahead of ours); take the next free one
+        for attempt in range(3):
+            try:
+                await self._insert(state, turn, position)
+                return
+            except IntegrityError:
+                if attempt == 2:
+                    raise
+                position = await self._next_position(state.id)
+                state.next_position = max(state.next_position, position + 1)
+
+    async def _next_position(self, conversation_id: str) -> int:
+        from src.models import SessionLocal
+        from src.models.models import ConversationTurn
+
+        async with SessionLocal() as db:
+            last = await db.scalar(
+                select(func.max(ConversationTurn.position)).where(
+                    ConversationTurn.conversation_id == conversation_id
+                )
+            )
+        return int(last) + 1 if last is not None else 0
+
+    async def _insert(self, state: ConversationState, turn: Turn, position: int):
+        from src.models import SessionLocal
+        from src.models.models import Conversation, ConversationTurn
+
+        async with SessionLocal() as db:
+            conversation = await db.get(Conversation, state.id)
+            if conversation is None:
+                db.add(Conversation(id=state.id, data_source_id=state.data_source_id))
+            else:
+                conversation.data_source_id = state.data_source_id
+            db.add(
+                ConversationTurn(
+                    id=str(uuid.uuid4()),
+                    conversation_id=state.id,
+                    position=position,
+                    message=turn.message,
+                    response=turn.response,
+                    sql=turn.sql,
+                    result_summary=turn.result_summary,
+                )
+            )
+            await db.commit()
+
+
+conversation_memory = ConversationMemory()
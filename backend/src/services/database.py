@@ -1,63 +1,749 @@
 from sqlalchemy import create_engine, inspect, text
-from sqlalchemy.engine import Engine
-from typing import Optional, List, Dict, Any
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import (
+    Optional,
+    List,
+    Dict,
+    Any,
+    Callable,
+    Iterator,
+    Set,
+    Tuple,
+    TypeVar,
+)
+import asyncio
+import base64
+import hashlib
+import json
 import os
+import re
+import threading
+import time
+
+from src.services import metrics
+from src.services.schema_cache import schema_cache
+
+T = TypeVar("T")
+
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "10000"))
+QUERY_FETCH_BATCH_SIZE = int(os.getenv("QUERY_FETCH_BATCH_SIZE", "1000"))
+QUERY_STATEMENT_TIMEOUT_MS = int(os.getenv("QUERY_STATEMENT_TIMEOUT_MS", "60000"))
+QUERY_READ_ONLY = os.getenv("QUERY_READ_ONLY", "true").lower() == "true"
+
+# SQLSTATE for a statement stopped by statement_timeout or a cancel request
+_PG_QUERY_CANCELED = "57014"
+
+_ROW_QUERY_KEYWORDS = ("select", "with", "values", "table")
+# String literals and quoted identifiers, blanked before looking for keywords
+_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_PARENTHESIZED = re.compile(r"\([^()]*\)")
+# A CTE body that writes makes the whole WITH statement a write
+_DATA_MODIFYING = re.compile(r"\b(insert|update|delete|merge)\b", re.IGNORECASE)
+_ORDER_BY = re.compile(r"\border\s+by\b", re.IGNORECASE)
+
+
+def build_connection_url(data_source: Any) -> str:
+    if data_source.type == "sqlite":
+        # A file path, with no server or credentials
+        return f"sqlite:///{data_source.database}"
+    return f"{data_source.type}://{data_source.username}:{data_source.password}@{data_source.host}:{data_source.port}/{data_source.database}"
+
+
+def normalize_url(database_url: str) -> str:
+    return make_url(database_url).render_as_string(hide_password=False)
+
+
+def _sql_digest(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()[:16]
+
+
+def encode_page_token(sql: str, offset: int) -> str:
+    payload = json.dumps({"q": _sql_digest(sql), "o": offset})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_page_token(sql: str, page_token: str) -> int:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(page_token.encode()))
+    except ValueError:
+        raise ValueError("Invalid page token")
+
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid page token")
+    if payload.get("q") != _sql_digest(sql):
+        raise ValueError("Page token does not belong to this query")
+    offset = payload.get("o", 0)
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise ValueError("Invalid page token")
+    return offset
+
+
+def _top_level(sql: str) -> str:
+    """``sql`` without literals and parenthesized parts (subqueries, CTEs)."""
+    sql = _QUOTED.sub("''", sql)
+    while True:
+        stripped = _PARENTHESIZED.sub(" ", sql)
+        if stripped == sql:
+            return sql
+        sql = stripped
+
+
+def is_row_query(sql: str) -> bool:
+    words = sql.lstrip("( \n\t").split(None, 1)
+    if not words or words[0].lower() not in _ROW_QUERY_KEYWORDS:
+        return False
+    if words[0].lower() == "with":
+        return _DATA_MODIFYING.search(_QUOTED.sub("''", sql)) is None
+    return True
+
+
+def has_stable_order(sql: str) -> bool:
+    # Without a top-level ORDER BY the warehouse may return rows in a
+    # different order on every run, so OFFSET pages would overlap or skip
+    return _ORDER_BY.search(_top_level(sql)) is not None
+
+
+def paged_statement(sql: str, limit: int, offset: int) -> Tuple[str, Dict[str, Any]]:
+    statement = sql.strip().rstrip(";").strip()
+    if is_row_query(statement):
+        # Let the warehouse stop after one row past the page instead of
+        # producing the full result; the extra row tells us it's truncated.
+        statement = f"SELECT * FROM (\n{statement}\n) AS paged_query LIMIT :_row_limit OFFSET :_row_offset"
+        return statement, {"_row_limit": limit + 1, "_row_offset": offset}
+    if offset:
+        raise ValueError("Pagination is only supported for SELECT queries")
+    return statement, {}
+
+
+def watermark_statement(sql: str, quoted_column: str) -> str:
+    """Restrict ``sql`` to result rows at or past the ``:_watermark`` param.
+
+    The filter is on the query's output, so the warehouse can push it down
+    into the scan when the column is a plain or grouping column.
+    """
+    statement = sql.strip().rstrip(";").strip()
+    if not is_row_query(statement):
+        raise ValueError("Incremental refresh is only supported for SELECT queries")
+    return (
+        f"SELECT * FROM (\n{statement}\n) AS incremental_query "
+        f"WHERE {quoted_column} >= :_watermark"
+    )
+
+
+class QueryTimeout(Exception):
+    """Raised when a query runs past its statement timeout."""
+
+
+class QueryCancelled(Exception):
+    """Raised when a running query was cancelled on purpose."""
+
+
+class QueryCancelHandle:
+    """Lets another thread stop the query a worker thread is running.
+
+    The worker attaches its DBAPI connection for the duration of the query;
+    ``cancel`` then asks the driver to abort it (a cancel request on the
+    wire for psycopg, ``interrupt()`` for sqlite3), which frees the worker
+    thread and returns the connection to the pool. Cancelling before the
+    query starts stops it from starting at all.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self.timed_out = False
+        self._dbapi_connection: Any = None
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            self._interrupt(self._dbapi_connection)
+
+    def cancel_in_background(self) -> None:
+        # Sending a cancel request is blocking network I/O; keep it off the
+        # event loop and out of the (possibly saturated) query executor
+        threading.Thread(target=self.cancel, daemon=True).start()
+
+    @contextmanager
+    def running(
+        self, connection: Connection, timeout_ms: Optional[int] = None
+    ) -> Iterator[None]:
+        """Attach ``connection`` while the body runs and translate aborts.
+
+        With ``timeout_ms`` a watchdog cancels the query once it passes; this
+        is for dialects without a server-side statement timeout.
+        """
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("Query cancelled")
+            self._dbapi_connection = connection.connection.dbapi_connection
+
+        watchdog = None
+        if timeout_ms:
+            watchdog = threading.Timer(timeout_ms / 1000, self._expire)
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            yield
+        except DBAPIError as e:
+            if self.cancelled:
+                raise QueryCancelled("Query cancelled") from e
+            if self.timed_out or getattr(e.orig, "pgcode", None) == _PG_QUERY_CANCELED:
+                raise QueryTimeout("Query exceeded its statement timeout") from e
+            raise
+        finally:
+            if watchdog:
+                watchdog.cancel()
+            with self._lock:
+                self._dbapi_connection = None
+
+    def _expire(self) -> None:
+        with self._lock:
+            self.timed_out = True
+            self._interrupt(self._dbapi_connection)
+
+    @staticmethod
+    def _interrupt(dbapi_connection: Any) -> None:
+        # Called with the lock held: the worker can't detach the connection
+        # and hand it back to the pool (to be reused by another query) until
+        # the interrupt has gone out
+        if dbapi_connection is None:
+            return
+        interrupt = getattr(dbapi_connection, "cancel", None) or getattr(
+            dbapi_connection, "interrupt", None
+        )
+        if interrupt is None:
+            return
+        try:
+            interrupt()
+        except Exception as e:
+            print(f"Failed to cancel query: {e}")
+
+
+@dataclass
+class _EngineEntry:
+    engine: Engine
+    url: str
+    last_used: float
+    # Data source id, or "default" for the DATABASE_URL engine; never the URL
+    label: str = "default"
+
+
+class EngineRegistry:
+    """Process-wide pool of SQLAlchemy engines keyed by data source id or URL.
+
+    Engines are created lazily, shared between requests and disposed when
+    their data source changes or when they sit idle past ``idle_timeout``.
+    Listeners added with ``add_dispose_listener`` are told the key of every
+    engine that is dropped, to release per-source state along with it.
+    """
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        max_overflow: Optional[int] = None,
+        pool_recycle: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+    ):
+        self.pool_size = (
+            pool_size if pool_size is not None else int(os.getenv("DB_POOL_SIZE", "5"))
+        )
+        self.max_overflow = (
+            max_overflow
+            if max_overflow is not None
+            else int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        )
+        self.pool_recycle = (
+            pool_recycle
+            if pool_recycle is not None
+            else int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        )
+        self.idle_timeout = (
+            idle_timeout
+            if idle_timeout is not None
+            else float(os.getenv("DB_ENGINE_IDLE_TIMEOUT", "600"))
+        )
+        self._engines: Dict[str, _EngineEntry] = {}
+        self._dispose_listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    def add_dispose_listener(self, listener: Callable[[str], None]) -> None:
+        self._dispose_listeners.append(listener)
+
+    def get_engine(self, database_url: str, key: Optional[str] = None) -> Engine:
+        url = normalize_url(database_url)
+        label = key or "default"
+        key = key or url
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._engines.get(key)
+            if entry and entry.url != url:
+                # Connection settings changed underneath the same key
+                entry.engine.dispose()
+                entry = None
+
+            if entry is None:
+                engine = create_engine(url, **self._engine_options(url))
+                entry = _EngineEntry(engine=engine, url=url, last_used=now, label=label)
+                self._engines[key] = entry
+
+            entry.last_used = now
+            return entry.engine
+
+    def dispose(self, key: str) -> None:
+        with self._lock:
+            entry = self._engines.pop(key, None)
+        if entry:
+            entry.engine.dispose()
+            self._disposed(key)
+
+    def dispose_all(self) -> None:
+        with self._lock:
+            entries = list(self._engines.items())
+            self._engines.clear()
+        for key, entry in entries:
+            entry.engine.dispose()
+            self._disposed(key)
+
+    def collect_metrics(self) -> None:
+        with self._lock:
+            entries = list(self._engines.values())
+
+        # Disposed engines should disappear from the scrape, not stay frozen
+        for gauge in (
+            metrics.pool_size,
+            metrics.pool_checked_out,
+            metrics.pool_overflow,
+        ):
+            gauge.clear()
+        for entry in entries:
+            pool = entry.engine.pool
+            if hasattr(pool, "checkedout"):
+                metrics.pool_size.set(pool.size(), data_source=entry.label)
+                metrics.pool_checked_out.set(pool.checkedout(), data_source=entry.label)
+                # QueuePool counts overflow from -pool_size upwards
+                metrics.pool_overflow.set(
+                    max(0, pool.overflow()), data_source=entry.label
+                )
+
+    def _engine_options(self, url: str) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"pool_pre_ping": True}
+        if make_url(url).get_backend_name() != "sqlite":
+            options.update(
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_recycle=self.pool_recycle,
+            )
+        return options
+
+    def _evict_idle(self, now: float) -> None:
+        if self.idle_timeout <= 0:
+            return
+
+        for key, entry in list(self._engines.items()):
+            if now - entry.last_used > self.idle_timeout:
+                del self._engines[key]
+                entry.engine.dispose()
+                self._disposed(key)
+
+    def _disposed(self, key: str) -> None:
+        for listener in self._dispose_listeners:
+            listener(key)
+
+
+engine_registry = EngineRegistry()
+metrics.registry.add_collector(engine_registry.collect_metrics)
+
+
+class QueryExecutor:
+    """Runs blocking warehouse calls on a bounded thread pool.
+
+    Each data source gets its own semaphore so one slow tenant can only hold
+    ``per_source_limit`` of the ``max_workers`` threads at a time. Keys are
+    the engine registry's, and a semaphore is dropped (once idle) when the
+    registry disposes its engine, so ad-hoc URLs don't accumulate.
+    """
+
+    def __init__(
+        self, max_workers: Optional[int] = None, per_source_limit: Optional[int] = None
+    ):
+        self.max_workers = (
+            max_workers
+            if max_workers is not None
+            else int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+        )
+        self.per_source_limit = (
+            per_source_limit
+            if per_source_limit is not None
+            else int(os.getenv("DB_MAX_CONCURRENT_QUERIES_PER_SOURCE", "4"))
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="db-query"
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._users: Dict[str, int] = {}
+        self._forgotten: Set[str] = set()
+        # Engines are evicted from worker threads too
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: str) -> asyncio.Semaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(key)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.per_source_limit)
+                self._semaphores[key] = semaphore
+            self._users[key] = self._users.get(key, 0) + 1
+            self._forgotten.discard(key)
+            return semaphore
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            users = self._users.get(key, 1) - 1
+            if users > 0:
+                self._users[key] = users
+                return
+            self._users.pop(key, None)
+            if key in self._forgotten:
+                self._forgotten.discard(key)
+                self._semaphores.pop(key, None)
+
+    def forget(self, key: str) -> None:
+        """Drop the semaphore for ``key``, as soon as nothing is using it."""
+        with self._lock:
+            if self._users.get(key):
+                self._forgotten.add(key)
+            else:
+                self._semaphores.pop(key, None)
+
+    async def run(self, key: str, fn: Callable[..., T], *args: Any) -> T:
+        semaphore = self._acquire(key)
+        try:
+            async with semaphore:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, partial(fn, *args))
+        finally:
+            self._release(key)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+query_executor = QueryExecutor()
+engine_registry.add_dispose_listener(query_executor.forget)
+
+
+POSTGRESQL_SCHEMA_QUERY = """
+SELECT
+    c.relname AS table_name,
+    a.attname AS column_name,
+    pg_catalog.format_type(a.atttypid, a.atttypmod) AS data_type,
+    NOT a.attnotnull AS nullable,
+    pg_catalog.pg_get_expr(d.adbin, d.adrelid) AS column_default,
+    COALESCE(a.attnum = ANY (pk.conkey), false) AS primary_key,
+    fk.foreign_table,
+    fk.foreign_column,
+    c.reltuples::bigint AS row_estimate
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_catalog.pg_attribute a
+    ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+LEFT JOIN pg_catalog.pg_constraint pk ON pk.conrelid = c.oid AND pk.contype = 'p'
+LEFT JOIN LATERAL (
+    SELECT ft.relname AS foreign_table, fa.attname AS foreign_column
+    FROM pg_catalog.pg_constraint con
+    CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum)
+    JOIN pg_catalog.pg_class ft ON ft.oid = con.confrelid
+    JOIN pg_catalog.pg_attribute fa
+        ON fa.attrelid = con.confrelid AND fa.attnum = k.fattnum
+    WHERE con.conrelid = c.oid AND con.contype = 'f' AND k.attnum = a.attnum
+    LIMIT 1
+) fk ON true
+WHERE c.relkind IN ('r', 'p')
+    AND n.nspname = current_schema()
+    AND NOT c.relispartition
+ORDER BY c.relname, a.attnum
+"""
 
 
 class DatabaseService:
-    def __init__(self, database_url: Optional[str] = None):
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        data_source_id: Optional[str] = None,
+        statement_timeout_ms: Optional[int] = None,
+        read_only: Optional[bool] = None,
+    ):
         self.database_url = database_url or os.getenv("DATABASE_URL")
-        self.engine: Optional[Engine] = None
+        self.data_source_id = data_source_id
+        self.statement_timeout_ms = (
+            statement_timeout_ms
+            if statement_timeout_ms is not None
+            else QUERY_STATEMENT_TIMEOUT_MS
+        )
+        self.read_only = read_only if read_only is not None else QUERY_READ_ONLY
+        # Same key the engine registry uses, so equivalent URLs share one
+        # executor semaphore and cache namespace
+        self.pool_key = data_source_id or self.database_url or ""
+        self._connectable = False
 
         if self.database_url:
             try:
-                self.engine = create_engine(self.database_url)
+                engine_registry.get_engine(self.database_url, key=data_source_id)
+                self.pool_key = data_source_id or normalize_url(self.database_url)
+                self._connectable = True
             except Exception as e:
                 print(f"Failed to connect to database: {e}")
 
-    def get_schema(self) -> Dict[str, List[Dict[str, Any]]]:
+    @property
+    def engine(self) -> Optional[Engine]:
+        # Looked up on every use rather than held: an engine the registry
+        # evicted for idling is then recreated there, instead of its pool
+        # being revived outside the registry where nothing disposes it
+        if not self._connectable:
+            return None
+        return engine_registry.get_engine(
+            self.database_url, key=self.data_source_id  # type: ignore[arg-type]
+        )
+
+    def get_schema(self, refresh: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        return self.get_schema_snapshot(refresh)["tables"]
+
+    def get_row_estimates(self) -> Dict[str, int]:
+        return self.get_schema_snapshot()["row_estimates"]
+
+    def get_schema_snapshot(self, refresh: bool = False) -> Dict[str, Any]:
         if not self.engine:
-            return {}
+            return {"tables": {}, "row_estimates": {}}
+
+        if not refresh:
+            cached = schema_cache.get(self.pool_key)
+            if cached is not None:
+                return cached
+
+        if self.engine.dialect.name == "postgresql":
+            snapshot = self._reflect_postgresql_schema()
+        else:
+            snapshot = self._reflect_schema()
+        schema_cache.set(self.pool_key, snapshot)
+        return snapshot
+
+    def _reflect_postgresql_schema(self) -> Dict[str, Any]:
+        # One catalog round trip for columns, keys and planner row estimates
+        tables: Dict[str, List[Dict[str, Any]]] = {}
+        row_estimates: Dict[str, int] = {}
+
+        with self.engine.connect() as connection:
+            for row in connection.execute(text(POSTGRESQL_SCHEMA_QUERY)):
+                foreign_key = (
+                    f"{row.foreign_table}.{row.foreign_column}"
+                    if row.foreign_table
+                    else None
+                )
+                tables.setdefault(row.table_name, []).append(
+                    {
+                        "name": row.column_name,
+                        "type": row.data_type,
+                        "nullable": row.nullable,
+                        "default": row.column_default,
+                        "primary_key": row.primary_key,
+                        "foreign_key": foreign_key,
+                    }
+                )
+                if row.row_estimate is not None and row.row_estimate >= 0:
+                    row_estimates[row.table_name] = int(row.row_estimate)
 
+        return {"tables": tables, "row_estimates": row_estimates}
+
+    def _reflect_schema(self) -> Dict[str, Any]:
         inspector = inspect(self.engine)
-        schema = {}
+        columns_by_table = inspector.get_multi_columns()
+        primary_keys = inspector.get_multi_pk_constraint()
+        foreign_keys = inspector.get_multi_foreign_keys()
+        tables: Dict[str, List[Dict[str, Any]]] = {}
+
+        for key, table_columns in columns_by_table.items():
+            pk_columns = set(primary_keys.get(key, {}).get("constrained_columns", []))
+            fk_targets = {}
+            for fk in foreign_keys.get(key, []):
+                for column, referred in zip(
+                    fk["constrained_columns"], fk["referred_columns"]
+                ):
+                    fk_targets[column] = f"{fk['referred_table']}.{referred}"
 
-        for table_name in inspector.get_table_names():
             columns = []
-            for column in inspector.get_columns(table_name):
+            for column in table_columns:
                 columns.append(
                     {
                         "name": column["name"],
                         "type": str(column["type"]),
                         "nullable": column.get("nullable", True),
                         "default": column.get("default"),
+                        "primary_key": column["name"] in pk_columns,
+                        "foreign_key": fk_targets.get(column["name"]),
                     }
                 )
-            schema[table_name] = columns
+            tables[key[1]] = columns
 
-        return schema
+        return {"tables": tables, "row_estimates": {}}
 
-    def execute_query(self, sql: str) -> Dict[str, Any]:
+    def statement_timeout_for(self, timeout_ms: Optional[int] = None) -> Optional[int]:
+        # A request may shorten the data source's timeout but not extend it
+        limits = [
+            limit
+            for limit in (self.statement_timeout_ms, timeout_ms)
+            if limit and limit > 0
+        ]
+        return min(limits) if limits else None
+
+    def execute_query(
+        self,
+        sql: str,
+        max_rows: Optional[int] = None,
+        page_token: Optional[str] = None,
+        columnar: bool = False,
+        timeout_ms: Optional[int] = None,
+        cancel_handle: Optional[QueryCancelHandle] = None,
+        timings: Optional[Dict[str, float]] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         if not self.engine:
             raise Exception("Database not connected")
 
-        with self.engine.connect() as connection:
-            result = connection.execute(text(sql))
+        limit = min(max_rows or QUERY_MAX_ROWS, QUERY_MAX_ROWS)
+        offset = decode_page_token(sql, page_token) if page_token else 0
+        if offset and not has_stable_order(sql):
+            raise ValueError("Pagination requires a query with an ORDER BY")
+        statement, paging_params = paged_statement(sql, limit, offset)
+        params = {**(params or {}), **paging_params}
+        timeout_ms = self.statement_timeout_for(timeout_ms)
+        handle = cancel_handle or QueryCancelHandle()
+        server_timeout = self.engine.dialect.name == "postgresql"
+
+        with self._connect() as connection:
+            if server_timeout and timeout_ms:
+                # Scoped to this transaction, so pooled connections stay clean
+                connection.exec_driver_sql(
+                    f"SET LOCAL statement_timeout = {int(timeout_ms)}"
+                )
+            with handle.running(connection, None if server_timeout else timeout_ms):
+                return self._fetch(
+                    connection,
+                    sql,
+                    statement,
+                    params,
+                    limit,
+                    offset,
+                    columnar,
+                    timings if timings is not None else {},
+                )
+
+    def _connect(self) -> Connection:
+        engine = self.engine
+        if engine is None:
+            raise Exception("Database not connected")
+        connection = engine.connect()
+        if self.read_only and engine.dialect.name == "postgresql":
+            # Runs the transaction as READ ONLY; reset when returned to the pool
+            connection.execution_options(postgresql_readonly=True)
+        return connection
+
+    def _fetch(
+        self,
+        connection: Connection,
+        sql: str,
+        statement: str,
+        params: Dict[str, Any],
+        limit: int,
+        offset: int,
+        columnar: bool,
+        timings: Dict[str, float],
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        if is_row_query(statement):
+            # Streamed through a server-side cursor where the driver has one,
+            # which can't be declared for INSERT/UPDATE and other statements
+            connection = connection.execution_options(yield_per=QUERY_FETCH_BATCH_SIZE)
+        result = connection.execute(text(statement), params)
 
-            if result.returns_rows:
-                rows = result.fetchall()
-                columns = list(result.keys())
-                return {
+        if result.returns_rows:
+            columns = list(result.keys())
+            rows = result.fetchmany(limit + 1)
+            fetched = time.perf_counter()
+            timings["sql_execute"] = (fetched - started) * 1000
+            truncated = len(rows) > limit
+            rows = rows[:limit]
+            next_page_token = (
+                encode_page_token(sql, offset + limit)
+                if truncated and has_stable_order(sql)
+                else None
+            )
+
+            if columnar:
+                # Transpose the fetched tuples into one array per column
+                data = [list(values) for values in zip(*rows)] or [[] for _ in columns]
+                payload: Dict[str, Any] = {
+                    "format": "columnar",
                     "columns": columns,
-                    "rows": [dict(zip(columns, row)) for row in rows],
+                    "data": data,
                     "row_count": len(rows),
+                    "truncated": truncated,
+                    "next_page_token": next_page_token,
                 }
             else:
-                return {
-                    "columns": [],
-                    "rows": [],
-                    "row_count": result.rowcount,
+                payload = {
+                    "columns": columns,
+                    "rows": [dict(zip(columns, row)) for row in rows],
+                    "row_count": len(rows),
+                    "truncated": truncated,
+                    "next_page_token": next_page_token,
                 }
+            timings["sql_serialize"] = (time.perf_counter() - fetched) * 1000
+            return payload
+
+        timings["sql_execute"] = (time.perf_counter() - started) * 1000
+        if columnar:
+            return {
+                "format": "columnar",
+                "columns": [],
+                "data": [],
+                "row_count": result.rowcount,
+            }
+        else:
+            return {
+                "columns": [],
+                "rows": [],
+                "row_count": result.rowcount,
+            }
+
+    def explain(
+        self, sql: str, max_rows: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the planner's top plan node for ``sql`` as it would be run.
+
+        Only PostgreSQL is supported; other dialects return ``None``.
+        """
+        if not self.engine or self.engine.dialect.name != "postgresql":
+            return None
+
+        limit = min(max_rows or QUERY_MAX_ROWS, QUERY_MAX_ROWS)
+        statement, params = paged_statement(sql, limit, 0)
+        with self.engine.connect() as connection:
+            plan = connection.execute(
+                text(f"EXPLAIN (FORMAT JSON) {statement}"), params
+            ).scalar()
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]  # type: ignore[index]
 
     def test_connection(self) -> bool:
         if not self.engine:
@@ -69,3 +755,72 @@ class DatabaseService:
             return True
         except Exception:
             return False
+
+    async def get_schema_async(
+        self, refresh: bool = False
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        return (await self.get_schema_snapshot_async(refresh))["tables"]
+
+    async def get_schema_snapshot_async(self, refresh: bool = False) -> Dict[str, Any]:
+        if self.engine and not refresh:
+            cached = schema_cache.get(self.pool_key)
+            metrics.cache_requests.inc(
+                cache="schema", result="hit" if cached is not None else "miss"
+            )
+            if cached is not None:
+                return cached
+
+        return await query_executor.run(
+            self.pool_key, self.get_schema_snapshot, refresh
+        )
+
+    async def execute_query_async(
+        self,
+        sql: str,
+        max_rows: Optional[int] = None,
+        page_token: Optional[str] = None,
+        columnar: bool = False,
+        timeout_ms: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Run ``execute_query`` on the executor.
+
+        Cancelling the awaiting task also cancels the query in the warehouse,
+        so an abandoned request stops holding its thread and connection.
+        """
+        handle = QueryCancelHandle()
+        timings: Dict[str, float] = {}
+        data_source = self.data_source_id or "default"
+        metrics.queries_in_flight.inc(data_source=data_source)
+        try:
+            result = await query_executor.run(
+                self.pool_key,
+                self.execute_query,
+                sql,
+                max_rows,
+                page_token,
+                columnar,
+                timeout_ms,
+                handle,
+                timings,
+                params,
+            )
+        except asyncio.CancelledError:
+            handle.cancel_in_background()
+            raise
+        except Exception:
+            metrics.errors.inc(stage="sql_execute", data_source=data_source)
+            raise
+        finally:
+            metrics.queries_in_flight.dec(data_source=data_source)
+
+        metrics.observe_stages(timings, data_source=data_source)
+        return result
+
+    async def explain_async(
+        self, sql: str, max_rows: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        return await query_executor.run(self.pool_key, self.explain, sql, max_rows)
+
+    async def test_connection_async(self) -> bool:
+        return await query_executor.run(self.pool_key, self.test_connection)
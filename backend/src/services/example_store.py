@@ -0,0 +1,331 @@
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Tuple
+import asyncio
+import hashlib
+import math
+import os
+import threading
+
+from sqlalchemy import select
+
+from src.services.llm_cache import normalize_message
+from src.services.normalization import normalize_sql
+from src.services.prompt_builder import estimate_tokens
+from src.services.schema_retrieval import tokenize
+
+# Character n-grams catch what word terms miss: typos, inflections the
+# stemmer doesn't fold, and compounds ("signups" vs "sign ups")
+NGRAM_SIZE = 3
+NGRAM_WEIGHT = 0.5
+
+
+def example_id(data_source_id: Optional[str], question: str, sql: str) -> str:
+    payload = "\x00".join(
+        (data_source_id or "", normalize_message(question), normalize_sql(sql))
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def question_features(question: str) -> Dict[str, float]:
+    features: Dict[str, float] = dict(Counter(tokenize(question)))
+    text = f" {' '.join(normalize_message(question).split())} "
+    for start in range(len(text) - NGRAM_SIZE + 1):
+        gram = "#" + text[start : start + NGRAM_SIZE]
+        features[gram] = features.get(gram, 0.0) + NGRAM_WEIGHT
+    return features
+
+
+@dataclass
+class VerifiedExample:
+    id: str
+    question: str
+    sql: str
+    source: str = "query"
+    use_count: int = 1
+
+
+class ExampleIndex:
+    """TF-IDF index over the questions of one data source's examples.
+
+    Examples are added one at a time as queries succeed, so only raw term
+    weights are kept per example; document frequencies are updated in
+    place and the idf-weighted norms are recomputed lazily, once per batch
+    of additions, on the next search.
+    """
+
+    def __init__(self, max_examples: int):
+        self.max_examples = max_examples
+        self.examples: Dict[str, VerifiedExample] = {}
+        self._features: Dict[str, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._norms: Dict[str, float] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    def add(self, example: VerifiedExample) -> None:
+        with self._lock:
+            existing = self.examples.get(example.id)
+            if existing is not None:
+                existing.use_count = max(existing.use_count, example.use_count)
+                return
+
+            if len(self.examples) >= self.max_examples:
+                # Drop the least used example to stay bounded
+                evicted = min(self.examples.values(), key=lambda e: e.use_count)
+                self._remove(evicted.id)
+
+            features = question_features(example.question)
+            self.examples[example.id] = example
+            self._features[example.id] = features
+            for term, weight in features.items():
+                self._postings.setdefault(term, {})[example.id] = weight
+            self._dirty = True
+
+    def search(
+        self, question: str, top_k: int, min_similarity: float
+    ) -> List[Tuple[VerifiedExample, float]]:
+        with self._lock:
+            if not self.examples:
+                return []
+            if self._dirty:
+                self._recompute_norms()
+
+            query = question_features(question)
+            scores: Dict[str, float] = {}
+            query_norm = 0.0
+            for term, weight in query.items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = self._idf(len(postings))
+                query_norm += (weight * idf) ** 2
+                for example_id_, doc_weight in postings.items():
+                    scores[example_id_] = (
+                        scores.get(example_id_, 0.0) + weight * doc_weight * idf * idf
+                    )
+            if not scores:
+                return []
+
+            query_norm = math.sqrt(query_norm)
+            ranked = sorted(
+                (
+                    (self.examples[key], score / (query_norm * self._norms[key]))
+                    for key, score in scores.items()
+                    if self._norms.get(key)
+                ),
+                key=lambda item: (item[1], item[0].use_count),
+                reverse=True,
+            )
+
+        results: List[Tuple[VerifiedExample, float]] = []
+        seen_sql = set()
+        for example, similarity in ranked:
+            if similarity < min_similarity or len(results) >= top_k:
+                break
+            # Rephrasings of one question would repeat the same SQL
+            sql = normalize_sql(example.sql)
+            if sql in seen_sql:
+                continue
+            seen_sql.add(sql)
+            results.append((example, similarity))
+        return results
+
+    def _idf(self, document_frequency: int) -> float:
+        return math.log((1 + len(self.examples)) / (1 + document_frequency)) + 1
+
+    def _recompute_norms(self) -> None:
+        self._norms = {
+            key: math.sqrt(
+                sum(
+                    (weight * self._idf(len(self._postings[term]))) ** 2
+                    for term, weight in features.items()
+                )
+            )
+            for key, features in self._features.items()
+        }
+        self._dirty = False
+
+    def _remove(self, key: str) -> None:
+        for term in self._features.pop(key, {}):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+        self.examples.pop(key, None)
+        self._norms.pop(key, None)
+        self._dirty = True
+
+
+class ExampleStore:
+    """Verified question→SQL pairs, retrieved as few-shot examples.
+
+    A pair is recorded when generated SQL runs successfully or a chart is
+    saved, and persisted to the app database. Each data source gets an
+    in-process TF-IDF index, loaded from the database on first use, from
+    which the ``top_k`` most similar examples within ``token_budget`` are
+    added to the prompt.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        top_k: Optional[int] = None,
+        min_similarity: Optional[float] = None,
+        token_budget: Optional[int] = None,
+        max_examples: Optional[int] = None,
+    ):
+        self.enabled = (
+            enabled
+            if enabled is not None
+            else os.getenv("FEW_SHOT_ENABLED", "true").lower() == "true"
+        )
+        self.top_k = (
+            top_k if top_k is not None else int(os.getenv("FEW_SHOT_TOP_K", "3"))
+        )
+        self.min_similarity = (
+            min_similarity
+            if min_similarity is not None
+            else float(os.getenv("FEW_SHOT_MIN_SIMILARITY", "0.3"))
+        )
+        self.token_budget = (
+            token_budget
+            if token_budget is not None
+            else int(os.getenv("FEW_SHOT_TOKEN_BUDGET", "600"))
+        )
+        self.max_examples = (
+            max_examples
+            if max_examples is not None
+            else int(os.getenv("FEW_SHOT_MAX_EXAMPLES", "2000"))
+        )
+        self._indexes: Dict[str, ExampleIndex] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    async def similar(
+        self, question: str, data_source_id: Optional[str] = None
+    ) -> List[VerifiedExample]:
+        if not self.enabled or self.top_k <= 0:
+            return []
+
+        index = await self._index_for(data_source_id)
+        selected: List[VerifiedExample] = []
+        used = 0
+        for example, _ in index.search(question, self.top_k, self.min_similarity):
+            cost = estimate_tokens(example.question) + estimate_tokens(example.sql)
+            if used + cost > self.token_budget:
+                continue
+            selected.append(example)
+            used += cost
+        return selected
+
+    async def record(
+        self,
+        question: str,
+        sql: str,
+        data_source_id: Optional[str] = None,
+        source: str = "query",
+    ) -> None:
+        if not self.enabled or not question.strip() or not sql.strip():
+            return
+
+        example = VerifiedExample(
+            id=example_id(data_source_id, question, sql),
+            question=question.strip(),
+            sql=sql.strip(),
+            source=source,
+        )
+        try:
+            example.use_count = await self._store(example, data_source_id)
+        except Exception as e:
+            print(f"Failed to persist verified example: {e}")
+
+        index = self._indexes.get(data_source_id or "")
+        if index is not None:
+            index.add(example)
+
+    def clear(self) -> None:
+        self._indexes.clear()
+
+    async def _index_for(self, data_source_id: Optional[str]) -> ExampleIndex:
+        key = data_source_id or ""
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        # Concurrent first requests for a data source share one load
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(data_source_id))
+            self._loading[key] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, data_source_id: Optional[str]) -> ExampleIndex:
+        from src.models import SessionLocal
+        from src.models.models import VerifiedExample as VerifiedExampleRow
+
+        index = ExampleIndex(self.max_examples)
+        try:
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    select(VerifiedExampleRow)
+                    .where(
+                        VerifiedExampleRow.data_source_id == data_source_id
+                        if data_source_id
+                        else VerifiedExampleRow.data_source_id.is_(None)
+                    )
+                    .order_by(VerifiedExampleRow.last_used_at.desc())
+                    .limit(self.max_examples)
+                )
+                for row in result.scalars():
+                    index.add(
+                        VerifiedExample(
+                            id=str(row.id),
+                            question=str(row.question),
+                            sql=str(row.sql),
+                            source=str(row.source),
+                            use_count=int(row.use_count or 1),
+                        )
+                    )
+        except Exception as e:
+            # Serve without examples now and retry the load next time
+            print(f"Failed to load verified examples: {e}")
+            return index
+
+        self._indexes[data_source_id or ""] = index
+        return index
+
+    async def _store(
+        self, example: VerifiedExample, data_source_id: Optional[str]
+    ) -> int:
+        from src.models import SessionLocal
+        from src.models.models import VerifiedExample as VerifiedExampleRow
+
+        async with SessionLocal() as db:
+            row = await db.get(VerifiedExampleRow, example.id)
+            if row is None:
+                row = VerifiedExampleRow(
+                    id=example.id,
+                    data_source_id=data_source_id,
+                    question=example.question,
+                    sql=example.sql,
+                    source=example.source,
+                    use_count=1,
+                )
+                db.add(row)
+            else:
+                row.use_count = (row.use_count or 0) + 1  # type: ignore[assignment]
+                row.last_used_at = datetime.now(timezone.utc)  # type: ignore[assignment]
+                if example.source == "chart":
+                    # A saved chart is the stronger signal; keep it
+                    row.source = "chart"  # type: ignore[assignment]
+            await db.commit()
+            return int(row.use_count)  # type: ignore[arg-type]
+
+
+example_store = ExampleStore()
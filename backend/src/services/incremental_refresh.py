@@ -0,0 +1,202 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional, Dict, List, Any, Tuple, TYPE_CHECKING
+import os
+import re
+
+from src.services import metrics
+from src.services.database import QUERY_MAX_ROWS, watermark_statement
+
+if TYPE_CHECKING:
+    from src.services.database import DatabaseService
+
+# How far behind the newest cached watermark rows are re-read, for data that
+# lands late. Seconds for date/time columns, column units for numeric ones.
+CHART_LATE_ARRIVAL_WINDOW = float(os.getenv("CHART_LATE_ARRIVAL_WINDOW", "86400"))
+# Merged results are replaced by a full run after this many merges in a row,
+# so whatever the late-arrival window missed can't pile up indefinitely
+CHART_FULL_REFRESH_EVERY = int(os.getenv("CHART_FULL_REFRESH_EVERY", "24"))
+
+# Row caps make a query's output depend on what is past the cutoff (a top-N
+# gains rows a full run would drop), and relative time filters move their
+# lower bound, expiring rows a merge would keep. Either means a full run.
+_NOT_INCREMENTAL = re.compile(
+    r"\b(limit|offset|fetch\s+(first|next)|top\s*\(?\s*\d+"
+    r"|now|current_date|current_time|current_timestamp|localtime|localtimestamp"
+    r"|getdate|sysdate|systimestamp|today)\b"
+    r"|'now'",
+    re.IGNORECASE,
+)
+
+
+def supports_incremental(sql: str) -> bool:
+    return _NOT_INCREMENTAL.search(sql) is None
+
+
+def watermark_cutoff(value: Any, window: float) -> Any:
+    """``value`` moved back by ``window``, or ``None`` for unsupported types."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value - timedelta(seconds=window)
+    if isinstance(value, (int, float)):
+        return value - window
+    if isinstance(value, Decimal):
+        return value - Decimal(str(window))
+    if isinstance(value, str):
+        # SQLite hands dates and timestamps back as ISO strings; they
+        # compare correctly as text as long as the shape is kept
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        cutoff = parsed - timedelta(seconds=window)
+        if len(value) == 10:
+            return cutoff.date().isoformat()
+        return str(cutoff)
+    return None
+
+
+def _order(values: List[Any]) -> Optional[str]:
+    try:
+        if all(a <= b for a, b in zip(values, values[1:])):
+            return "asc"
+        if all(a >= b for a, b in zip(values, values[1:])):
+            return "desc"
+    except TypeError:
+        pass
+    return None
+
+
+def _rows(result: Dict[str, Any]) -> List[Tuple[Any, ...]]:
+    if result.get("format") == "columnar":
+        return list(zip(*result["data"]))
+    columns = result["columns"]
+    return [tuple(row[column] for column in columns) for row in result["rows"]]
+
+
+def _result(
+    columns: List[str], rows: List[Tuple[Any, ...]], columnar: bool
+) -> Dict[str, Any]:
+    if columnar:
+        return {
+            "format": "columnar",
+            "columns": columns,
+            "data": [list(values) for values in zip(*rows)] or [[] for _ in columns],
+            "row_count": len(rows),
+            "truncated": False,
+            "next_page_token": None,
+        }
+    return {
+        "columns": columns,
+        "rows": [dict(zip(columns, row)) for row in rows],
+        "row_count": len(rows),
+        "truncated": False,
+        "next_page_token": None,
+    }
+
+
+def merge_results(
+    previous: Dict[str, Any],
+    delta: Dict[str, Any],
+    column: str,
+    cutoff: Any,
+    limit: int,
+    columnar: bool,
+) -> Optional[Dict[str, Any]]:
+    """Replace the rows of ``previous`` at or past ``cutoff`` with ``delta``.
+
+    Returns ``None`` when the merge can't be trusted to match a full run:
+    the columns changed, either side was truncated, or the result isn't
+    ordered by the watermark (so there is no place to splice new rows in).
+    """
+    columns = list(previous.get("columns") or [])
+    if list(delta.get("columns") or []) != columns or column not in columns:
+        return None
+    if delta.get("truncated"):
+        return None
+
+    position = columns.index(column)
+    old_rows = _rows(previous)
+    values = [row[position] for row in old_rows]
+    if any(value is None for value in values):
+        return None
+    order = _order(values)
+    if order is None:
+        return None
+
+    kept = [row for row in old_rows if row[position] < cutoff]
+    new_rows = sorted(
+        _rows(delta), key=lambda row: row[position], reverse=order == "desc"
+    )
+    merged = kept + new_rows if order == "asc" else new_rows + kept
+    if len(merged) > limit:
+        return None
+    return _result(columns, merged, columnar)
+
+
+async def refresh_result(
+    db_service: "DatabaseService",
+    sql: str,
+    previous: Dict[str, Any],
+    watermark_column: str,
+    late_arrival_window: Optional[float] = None,
+    max_rows: Optional[int] = None,
+    columnar: bool = False,
+    timeout_ms: Optional[int] = None,
+    merges: int = 0,
+) -> Tuple[Dict[str, Any], bool]:
+    """Bring a cached chart result up to date by reading only new rows.
+
+    Rows from the newest cached watermark minus the late-arrival window
+    onwards are queried and merged into ``previous``, which has already
+    been merged ``merges`` times. The full query is run instead when the
+    SQL caps or time-bounds its rows, when a merge can't reproduce the full
+    result, and every ``CHART_FULL_REFRESH_EVERY`` merges. Returns the
+    result and whether it was merged.
+    """
+    window = (
+        late_arrival_window
+        if late_arrival_window is not None
+        else CHART_LATE_ARRIVAL_WINDOW
+    )
+    limit = min(max_rows or QUERY_MAX_ROWS, QUERY_MAX_ROWS)
+    columns = list(previous.get("columns") or [])
+
+    cutoff = None
+    if (
+        merges < CHART_FULL_REFRESH_EVERY
+        and supports_incremental(sql)
+        and watermark_column in columns
+        and previous.get("row_count")
+        and not previous.get("truncated")
+    ):
+        position = columns.index(watermark_column)
+        values = [row[position] for row in _rows(previous) if row[position] is not None]
+        if values:
+            try:
+                cutoff = watermark_cutoff(max(values), window)
+            except TypeError:
+                cutoff = None
+
+    if cutoff is not None and db_service.engine is not None:
+        quoted = db_service.engine.dialect.identifier_preparer.quote(watermark_column)
+        delta = await db_service.execute_query_async(
+            watermark_statement(sql, quoted),
+            max_rows=max_rows,
+            columnar=True,
+            timeout_ms=timeout_ms,
+            params={"_watermark": cutoff},
+        )
+        merged = merge_results(
+            previous, delta, watermark_column, cutoff, limit, columnar
+        )
+        if merged is not None:
+            metrics.cache_requests.inc(cache="incremental", result="merged")
+            return merged, True
+
+    metrics.cache_requests.inc(cache="incremental", result="full")
+    result = await db_service.execute_query_async(
+        sql, max_rows=max_rows, columnar=columnar, timeout_ms=timeout_ms
+    )
+    return result, False
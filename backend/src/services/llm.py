@@ -1,14 +1,125 @@
-from openai import AsyncOpenAI
 from openai.types.chat import ChatCompletionMessageParam
-import os
-from typing import Optional, Dict, List, Any
+import json
+import re
+from typing import Optional, Dict, List, Any, AsyncIterator
+
+from src.services import metrics
+from src.services.llm_cache import llm_response_cache
+from src.services.llm_providers import LLMProvider, LLMProviderError, ProviderRouter
+from src.services.prompt_builder import BuiltPrompt, prompt_builder
+
+_VISUALIZATION_BLOCK = re.compile(
+    r"```visualization\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE
+)
 
 
 class LLMService:
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.client = AsyncOpenAI(api_key=api_key) if api_key else None
-        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    def __init__(self, router: Optional[ProviderRouter] = None):
+        self.router = router or ProviderRouter.from_env()
+        metrics.registry.add_collector(self.router.collect_metrics)
+
+    @property
+    def model(self) -> str:
+        return self.router.primary.model
+
+    @property
+    def cache_enabled(self) -> bool:
+        # Demo answers aren't worth caching
+        return llm_response_cache.enabled and bool(self._cached_models())
+
+    def _cached_models(self) -> List[str]:
+        # Answers are cached under the model that wrote them, so a question
+        # first answered by a fallback provider can be served from either
+        models: List[str] = []
+        for provider in self.router.providers:
+            if provider.cacheable and provider.model not in models:
+                models.append(provider.model)
+        return models
+
+    async def _cache_lookup(
+        self,
+        message: str,
+        schema_context: Optional[Dict],
+        rules: Optional[List[Dict[str, Any]]],
+        history: Optional[List[ChatCompletionMessageParam]],
+        examples: Optional[List[Any]],
+        info: Optional[Dict[str, Any]],
+    ) -> Optional[tuple[str, Optional[Dict]]]:
+        if not self.cache_enabled:
+            return None
+        for model in self._cached_models():
+            cached = await llm_response_cache.get(
+                *llm_response_cache.make_keys(
+                    message, schema_context, rules, model, history, examples
+                )
+            )
+            if cached is not None:
+                if info is not None:
+                    info["model"] = model
+                    info["cached"] = True
+                return cached
+        return None
+
+    async def cache_answer(
+        self,
+        message: str,
+        schema_context: Optional[Dict],
+        rules: Optional[List[Dict[str, Any]]],
+        history: Optional[List[ChatCompletionMessageParam]],
+        examples: Optional[List[Any]],
+        info: Dict[str, Any],
+        response_text: str,
+        visualization_config: Optional[Dict],
+    ) -> None:
+        """Cache an answer once its SQL has run, with ``info`` from generating it.
+
+        Answers are not cached as they are generated, so SQL the warehouse
+        refuses is never served again from the cache.
+        """
+        provider = info.get("provider")
+        if provider is None or info.get("cached"):
+            return
+        args = (message, schema_context, rules, history, examples)
+        await self._cache_store(provider, *args, response_text, visualization_config)
+        refused_model = info.get("refused_model")
+        if refused_model and refused_model != provider.model:
+            # Don't keep serving a refused query from the slot of the model
+            # that wrote it
+            await self._cache_store(
+                provider,
+                *args,
+                response_text,
+                visualization_config,
+                key_model=refused_model,
+            )
+
+    async def _cache_store(
+        self,
+        provider: LLMProvider,
+        message: str,
+        schema_context: Optional[Dict],
+        rules: Optional[List[Dict[str, Any]]],
+        history: Optional[List[ChatCompletionMessageParam]],
+        examples: Optional[List[Any]],
+        response_text: str,
+        visualization_config: Optional[Dict],
+        key_model: Optional[str] = None,
+    ) -> None:
+        if not (self.cache_enabled and provider.cacheable):
+            return
+        await llm_response_cache.set(
+            *llm_response_cache.make_keys(
+                message,
+                schema_context,
+                rules,
+                key_model or provider.model,
+                history,
+                examples,
+            ),
+            provider.model,
+            response_text,
+            visualization_config,
+        )
 
     async def generate_response(
         self,
@@ -16,173 +127,164 @@ class LLMService:
         conversation_id: str,
         schema_context: Optional[Dict] = None,
         rules: Optional[List[Dict[str, Any]]] = None,
+        row_estimates: Optional[Dict[str, int]] = None,
+        prompt: Optional[BuiltPrompt] = None,
+        history: Optional[List[ChatCompletionMessageParam]] = None,
+        deadline: Optional[float] = None,
+        examples: Optional[List[Any]] = None,
+        info: Optional[Dict[str, Any]] = None,
     ) -> tuple[str, Optional[Dict]]:
-        if not self.client:
-            return (
-                f"[DEMO MODE] You asked: {message}\n\nThis is a demo response. Please set OPENAI_API_KEY in your .env file to enable real AI responses.",
-                None,
-            )
+        """Answer ``message``; ``info`` records who did, for ``cache_answer``."""
+        cached = await self._cache_lookup(
+            message, schema_context, rules, history, examples, info
+        )
+        if cached is not None:
+            return cached
 
         try:
-            system_prompt = """You are an AI data analyst assistant. 
-You help users analyze their data by:
-1. Understanding natural language questions about data
-2. Generating SQL queries when needed
-3. Explaining results clearly
-4. Suggesting visualizations
-
-When generating SQL, wrap it in ```sql``` code blocks.
-
-IMPORTANT: After providing the SQL query, you MUST suggest a visualization by adding a JSON block.
-
-Visualization guidelines - Choose the best chart type for the data:
-
-**Table**: detailed data inspection, mixed data types, small datasets
-**Bar Chart**: category comparisons, rankings, distribution across categories
-**Horizontal Bar**: same as bar but better when category names are long
-**Stacked Bar**: showing composition of categories, part-to-whole relationships
-**Line Chart**: time series data, trends over time, continuous data
-**Area Chart**: similar to line but emphasizes volume/magnitude over time
-**Pie Chart**: proportions and percentages, market share (max 7-8 categories)
-**Donut Chart**: modern alternative to pie chart with better aesthetics
-**Scatter Plot**: correlation between two numeric variables, distribution patterns
-**Combo Chart**: comparing different scales (e.g., revenue bars + growth rate line)
-
-REQUIRED FORMAT - Always include this block after your explanation:
-```visualization
-{
-  "type": "bar",
-  "xKey": "category",
-  "yKeys": ["total_sales"],
-  "title": "Sales by Category"
-}
-```
-
-Valid chart types: "table", "bar", "horizontalBar", "stackedBar", "line", "area", "pie", "donut", "scatter", "combo"
-
-Examples:
-
-Time series:
-```visualization
-{
-  "type": "line",
-  "xKey": "date",
-  "yKeys": ["revenue", "cost"],
-  "title": "Revenue vs Cost Over Time"
-}
-```
-
-Proportions:
-```visualization
-{
-  "type": "pie",
-  "xKey": "category",
-  "yKeys": ["market_share"],
-  "title": "Market Share by Category"
-}
-```
-
-Correlation:
-```visualization
-{
-  "type": "scatter",
-  "xKey": "price",
-  "yKeys": ["sales_volume"],
-  "title": "Price vs Sales Volume"
-}
-```
-
-Stacked comparison:
-```visualization
-{
-  "type": "stackedBar",
-  "xKey": "quarter",
-  "yKeys": ["product_a", "product_b", "product_c"],
-  "title": "Quarterly Sales by Product"
-}
-```
-
-Combo chart:
-```visualization
-{
-  "type": "combo",
-  "xKey": "month",
-  "yKeys": ["revenue", "profit"],
-  "barKeys": ["revenue"],
-  "lineKeys": ["profit"],
-  "title": "Revenue (Bar) vs Profit Margin (Line)"
-}
-```
-
-Be concise but thorough. Always ask for clarification if the question is ambiguous."""
-
-            if schema_context:
-                schema_info = "\n\nAvailable database schema:\n"
-                for table, columns in schema_context.items():
-                    schema_info += f"\nTable: {table}\n"
-                    for col in columns:
-                        schema_info += f"  - {col['name']} ({col['type']}){' NOT NULL' if not col['nullable'] else ''}\n"
-                system_prompt += schema_info
-
-            if rules:
-                rules_text = "\n\nUSER-DEFINED RULES:\n"
-                for rule in rules:
-                    rules_text += (
-                        f"\n{rule['name']} ({rule['scope']}):\n{rule['prompt']}\n"
-                    )
-                system_prompt += rules_text
-
-            messages: list[ChatCompletionMessageParam] = [
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": "Show me top products by revenue",
-                },
-                {
-                    "role": "assistant",
-                    "content": """I'll help you find the top products by revenue.
-
-```sql
-SELECT product_name, SUM(total_amount) AS revenue
-FROM sales
-GROUP BY product_name
-ORDER BY revenue DESC
-LIMIT 10;
-```
-
-```visualization
-{
-  "type": "bar",
-  "xKey": "product_name",
-  "yKeys": ["revenue"],
-  "title": "Top Products by Revenue"
-}
-```""",
-                },
-                {"role": "user", "content": message},
-            ]
-
-            response = await self.client.chat.completions.create(
-                model=self.model, messages=messages, max_completion_tokens=1000
-            )
+            if prompt is None:
+                prompt = self.build_prompt(
+                    message,
+                    schema_context,
+                    rules,
+                    row_estimates,
+                    history,
+                    examples=examples,
+                )
 
-            response_text = (
-                response.choices[0].message.content or "I couldn't generate a response."
+            content, provider = await self.router.complete(
+                prompt.messages, deadline=deadline
             )
+            if info is not None:
+                info["model"] = provider.model
+                if content:
+                    info["provider"] = provider
+            response_text = content or "I couldn't generate a response."
 
-            visualization_config = self._extract_visualization_config(response_text)
+            visualization_config = self.extract_visualization_config(response_text)
 
             return (response_text, visualization_config)
 
+        except LLMProviderError:
+            raise
         except Exception as e:
             raise Exception(f"LLM generation failed: {str(e)}")
 
-    def _extract_visualization_config(self, text: str) -> Optional[Dict]:
-        import re
-        import json
+    async def stream_response(
+        self,
+        message: str,
+        conversation_id: str,
+        schema_context: Optional[Dict] = None,
+        rules: Optional[List[Dict[str, Any]]] = None,
+        row_estimates: Optional[Dict[str, int]] = None,
+        prompt: Optional[BuiltPrompt] = None,
+        history: Optional[List[ChatCompletionMessageParam]] = None,
+        deadline: Optional[float] = None,
+        examples: Optional[List[Any]] = None,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        cached = await self._cache_lookup(
+            message, schema_context, rules, history, examples, info
+        )
+        if cached is not None:
+            yield cached[0]
+            return
+
+        try:
+            if prompt is None:
+                prompt = self.build_prompt(
+                    message,
+                    schema_context,
+                    rules,
+                    row_estimates,
+                    history,
+                    examples=examples,
+                )
+
+            response_text = ""
+            routed = self.router.stream(prompt.messages, deadline=deadline)
+            async for delta in routed:
+                if info is not None and routed.provider is not None:
+                    info["model"] = routed.provider.model
+                    info["provider"] = routed.provider
+                response_text += delta
+                yield delta
+
+        except LLMProviderError:
+            raise
+        except Exception as e:
+            raise Exception(f"LLM generation failed: {str(e)}")
+
+    async def repair_response(
+        self,
+        prompt: BuiltPrompt,
+        response_text: str,
+        feedback: str,
+        deadline: Optional[float] = None,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Ask the model once more after its SQL was refused.
+
+        ``info`` should be the one ``response_text`` was generated with; it
+        is updated so ``cache_answer`` stores the repair in its place.
+        """
+
+        messages: List[ChatCompletionMessageParam] = [
+            *prompt.messages,
+            {"role": "assistant", "content": response_text},
+            {
+                "role": "user",
+                "content": f"The SQL above was not run. {feedback}\n\n"
+                "Rewrite the query so it answers the same question more cheaply "
+                "(add the missing join conditions, selective filters or "
+                "aggregation) and reply in the same format.",
+            },
+        ]
+
+        try:
+            repaired_text, provider = await self.router.complete(
+                messages, deadline=deadline
+            )
+        except LLMProviderError:
+            raise
+        except Exception as e:
+            raise Exception(f"LLM generation failed: {str(e)}")
+
+        if not repaired_text:
+            return response_text
+
+        if info is not None:
+            # A refused answer served from the cache is replaced there too
+            info["refused_model"] = info.get("model")
+            info["model"] = provider.model
+            info["provider"] = provider
+            info.pop("cached", None)
+        return repaired_text
+
+    def build_prompt(
+        self,
+        message: str,
+        schema_context: Optional[Dict] = None,
+        rules: Optional[List[Dict[str, Any]]] = None,
+        row_estimates: Optional[Dict[str, int]] = None,
+        history: Optional[List[ChatCompletionMessageParam]] = None,
+        retrieval_text: Optional[str] = None,
+        rules_version: Optional[str] = None,
+        examples: Optional[List[Any]] = None,
+    ) -> BuiltPrompt:
+        return prompt_builder.build(
+            message,
+            schema_context,
+            rules,
+            row_estimates,
+            rules_version=rules_version,
+            history=history,
+            retrieval_text=retrieval_text,
+            examples=examples,
+        )
 
-        viz_pattern = r"```visualization\s*(.*?)\s*```"
-        match = re.search(viz_pattern, text, re.DOTALL | re.IGNORECASE)
+    def extract_visualization_config(self, text: str) -> Optional[Dict]:
+        match = _VISUALIZATION_BLOCK.search(text)
 
         if match:
             try:
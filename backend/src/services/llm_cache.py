@@ -0,0 +1,351 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Any, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from sqlalchemy import delete, func, select
+
+from src.services import metrics
+from src.services.normalization import collapse_whitespace
+from src.services.schema_cache import fingerprint
+from src.services.schema_retrieval import tokenize
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+# Words that don't change what a question asks for
+_FUZZY_STOPWORDS = {
+    "a",
+    "an",
+    "the",
+    "me",
+    "show",
+    "give",
+    "list",
+    "what",
+    "is",
+    "are",
+    "of",
+    "for",
+    "please",
+    "can",
+    "you",
+    "i",
+    "want",
+    "to",
+    "see",
+    "get",
+}
+
+
+def normalize_message(message: str) -> str:
+    return _TRAILING_PUNCTUATION.sub("", collapse_whitespace(message).lower())
+
+
+def fuzzy_message_key(message: str) -> str:
+    # Order- and filler-insensitive form: "Show me revenue by month?" and
+    # "revenue by months" collapse to the same key
+    terms = {term for term in tokenize(message) if term not in _FUZZY_STOPWORDS}
+    return " ".join(sorted(terms))
+
+
+def _digest(*parts: Any) -> str:
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    response: str
+    visualization: Optional[Dict]
+    expires_at: float
+
+
+class LLMResponseCache:
+    """Cache of LLM answers keyed on what determines the prompt.
+
+    The key covers the normalized message, a fingerprint of the schema the
+    prompt was built from, the rules in effect, the retrieved few-shot
+    examples (other than one for the question itself) and the model that
+    answered, so any change to those misses naturally instead of needing
+    explicit invalidation. Hot entries live in a bounded in-memory LRU; with
+    ``persist`` enabled they are also written to the app database so they
+    survive restarts. That table is swept every ``sweep_seconds`` in the
+    background, dropping expired rows and then the oldest beyond ``max_rows``.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        fuzzy: Optional[bool] = None,
+        persist: Optional[bool] = None,
+        max_rows: Optional[int] = None,
+        sweep_seconds: Optional[float] = None,
+    ):
+        self.ttl = (
+            ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", "86400"))
+        )
+        self.max_entries = (
+            max_entries
+            if max_entries is not None
+            else int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+        )
+        self.fuzzy = (
+            fuzzy
+            if fuzzy is not None
+            else os.getenv("LLM_CACHE_FUZZY", "false").lower() == "true"
+        )
+        self.persist = (
+            persist
+            if persist is not None
+            else os.getenv("LLM_CACHE_PERSIST", "true").lower() == "true"
+        )
+        self.max_rows = (
+            max_rows
+            if max_rows is not None
+            else int(os.getenv("LLM_CACHE_MAX_ROWS", "10000"))
+        )
+        self.sweep_seconds = (
+            sweep_seconds
+            if sweep_seconds is not None
+            else float(os.getenv("LLM_CACHE_SWEEP_SECONDS", "600"))
+        )
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._fuzzy_index: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def make_keys(
+        self,
+        message: str,
+        schema_context: Optional[Dict],
+        rules: Optional[List[Dict[str, Any]]],
+        model: str,
+        history: Optional[List[Any]] = None,
+        examples: Optional[List[Any]] = None,
+    ) -> Tuple[str, str]:
+        parts: List[Any] = [
+            fingerprint(schema_context),
+            [
+                (rule.get("name"), rule.get("scope"), rule.get("prompt"))
+                for rule in rules or []
+            ],
+            model,
+        ]
+        if history:
+            # Follow-ups only mean the same thing after the same conversation
+            parts.append(history)
+        normalized = normalize_message(message)
+        # Retrieved few-shots are part of the prompt, so a newly verified
+        # example should be able to change the answer. The one recorded from
+        # this very question is left out: it is recorded along with the
+        # question's cached answer, so keying on it would miss every repeat.
+        example_ids = [
+            example.id
+            for example in examples or []
+            if normalize_message(example.question) != normalized
+        ]
+        if example_ids:
+            parts.append(["examples", example_ids])
+        exact_key = _digest(normalized, *parts)
+        fuzzy_key = _digest("fuzzy", fuzzy_message_key(message), *parts)
+        return exact_key, fuzzy_key
+
+    async def get(
+        self, exact_key: str, fuzzy_key: str
+    ) -> Optional[Tuple[str, Optional[Dict]]]:
+        entry = self._get_memory(exact_key)
+        if entry is None and self.fuzzy:
+            key = self._fuzzy_index.get(fuzzy_key)
+            entry = self._get_memory(key) if key else None
+
+        if entry is None and self.persist:
+            try:
+                entry = await self._load(exact_key, fuzzy_key)
+            except Exception as e:
+                print(f"Failed to read LLM response cache: {e}")
+
+        if entry is None:
+            self.misses += 1
+            metrics.cache_requests.inc(cache="llm", result="miss")
+            return None
+
+        self.hits += 1
+        metrics.cache_requests.inc(cache="llm", result="hit")
+        return entry.response, entry.visualization
+
+    async def set(
+        self,
+        exact_key: str,
+        fuzzy_key: str,
+        model: str,
+        response: str,
+        visualization: Optional[Dict],
+    ) -> None:
+        entry = CachedResponse(
+            response=response,
+            visualization=visualization,
+            expires_at=time.time() + self.ttl,
+        )
+        self._set_memory(exact_key, fuzzy_key, entry)
+
+        if self.persist:
+            try:
+                await self._store(exact_key, fuzzy_key, model, entry)
+            except Exception as e:
+                print(f"Failed to persist LLM response cache entry: {e}")
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fuzzy_index.clear()
+
+        if self.persist:
+            from src.models import SessionLocal
+            from src.models.models import CachedLLMResponse
+
+            async with SessionLocal() as db:
+                await db.execute(delete(CachedLLMResponse))
+                await db.commit()
+
+    def start(self) -> None:
+        if not (self.enabled and self.persist) or self.sweep_seconds <= 0:
+            return
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._run_sweeps())
+
+    async def stop(self) -> None:
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            await asyncio.gather(self._sweep_task, return_exceptions=True)
+            self._sweep_task = None
+
+    async def sweep(self) -> None:
+        from src.models import SessionLocal
+        from src.models.models import CachedLLMResponse
+
+        async with SessionLocal() as db:
+            await db.execute(
+                delete(CachedLLMResponse).where(
+                    CachedLLMResponse.expires_at <= datetime.now(timezone.utc)
+                )
+            )
+            count = await db.scalar(select(func.count()).select_from(CachedLLMResponse))
+            if count and count > self.max_rows:
+                oldest = (
+                    select(CachedLLMResponse.key)
+                    .order_by(CachedLLMResponse.created_at, CachedLLMResponse.key)
+                    .limit(count - self.max_rows)
+                )
+                await db.execute(
+                    delete(CachedLLMResponse).where(
+                        CachedLLMResponse.key.in_(oldest.scalar_subquery())
+                    )
+                )
+            await db.commit()
+
+    async def _run_sweeps(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Failed to sweep LLM response cache: {e}")
+            await asyncio.sleep(self.sweep_seconds)
+
+    def _get_memory(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry.expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _set_memory(self, exact_key: str, fuzzy_key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[exact_key] = entry
+            self._entries.move_to_end(exact_key)
+            self._fuzzy_index[fuzzy_key] = exact_key
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if len(self._fuzzy_index) > self.max_entries * 2:
+                self._fuzzy_index = {
+                    fuzzy: exact
+                    for fuzzy, exact in self._fuzzy_index.items()
+                    if exact in self._entries
+                }
+
+    async def _load(self, exact_key: str, fuzzy_key: str) -> Optional[CachedResponse]:
+        from src.models import SessionLocal
+        from src.models.models import CachedLLMResponse
+
+        now = datetime.now(timezone.utc)
+        async with SessionLocal() as db:
+            row = await db.get(CachedLLMResponse, exact_key)
+            if row is None and self.fuzzy:
+                result = await db.execute(
+                    select(CachedLLMResponse)
+                    .where(
+                        CachedLLMResponse.fuzzy_key == fuzzy_key,
+                        CachedLLMResponse.expires_at > now,
+                    )
+                    .order_by(CachedLLMResponse.created_at.desc())
+                    .limit(1)
+                )
+                row = result.scalar_one_or_none()
+            if row is None:
+                return None
+
+            expires_at = row.expires_at
+            if expires_at.tzinfo is None:
+                # SQLite hands timestamps back naive
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at <= now:
+                await db.delete(row)
+                await db.commit()
+                return None
+
+            entry = CachedResponse(
+                response=str(row.response),
+                visualization=row.visualization,  # type: ignore[arg-type]
+                expires_at=expires_at.timestamp(),
+            )
+            self._set_memory(str(row.key), str(row.fuzzy_key), entry)
+            return entry
+
+    async def _store(
+        self, exact_key: str, fuzzy_key: str, model: str, entry: CachedResponse
+    ) -> None:
+        from src.models import SessionLocal
+        from src.models.models import CachedLLMResponse
+
+        async with SessionLocal() as db:
+            await db.merge(
+                CachedLLMResponse(
+                    key=exact_key,
+                    fuzzy_key=fuzzy_key,
+                    model=model,
+                    response=entry.response,
+                    visualization=entry.visualization,
+                    expires_at=datetime.fromtimestamp(entry.expires_at, timezone.utc),
+                )
+            )
+            await db.commit()
+
+
+llm_response_cache = LLMResponseCache()
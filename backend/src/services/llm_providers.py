@@ -0,0 +1,591 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+import asyncio
+import os
+import time
+
+from src.services import metrics
+
+MAX_COMPLETION_TOKENS = 1000
+
+Messages = Sequence[Dict[str, Any]]
+
+
+class LLMProviderError(Exception):
+    """Raised when no provider could produce a completion."""
+
+
+class LLMDeadlineExceeded(LLMProviderError):
+    """Raised when a completion doesn't finish within its deadline."""
+
+
+class LLMProvider(ABC):
+    """A model behind some API, exposed as a stream of text deltas.
+
+    Providers only stream; complete answers are the joined stream, which
+    lets hedging key off the first token for both kinds of request.
+    """
+
+    name = ""
+    # Whether answers are worth keeping in the LLM response cache
+    cacheable = True
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    def stream(self, messages: Messages, max_tokens: int) -> AsyncIterator[str]: ...
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, model: str, api_key: str):
+        from openai import AsyncOpenAI
+
+        super().__init__(model)
+        # Retries and timeouts are handled by the router, within the deadline
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
+
+    async def stream(self, messages: Messages, max_tokens: int) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=list(messages),  # type: ignore[arg-type]
+            max_completion_tokens=max_tokens,
+            stream=True,
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+
+class AnthropicProvider(LLMProvider):
+    name = "anthropic"
+
+    def __init__(self, model: str, api_key: str):
+        from anthropic import AsyncAnthropic
+
+        super().__init__(model)
+        self.client = AsyncAnthropic(api_key=api_key, max_retries=0)
+
+    async def stream(self, messages: Messages, max_tokens: int) -> AsyncIterator[str]:
+        system, turns = to_anthropic_messages(messages)
+        async with self.client.messages.stream(
+            model=self.model,
+            max_tokens=max_tokens,
+            system=system,
+            messages=turns,  # type: ignore[arg-type]
+        ) as stream:
+            async for text in stream.text_stream:
+                if text:
+                    yield text
+
+
+def to_anthropic_messages(messages: Messages) -> tuple[str, List[Dict[str, Any]]]:
+    # The Messages API takes one top-level system prompt and strictly
+    # alternating turns, so system messages are joined in order and
+    # consecutive turns from the same role are merged
+    system: List[str] = []
+    turns: List[Dict[str, Any]] = []
+    for message in messages:
+        content = str(message.get("content") or "")
+        if message["role"] == "system":
+            system.append(content)
+        elif turns and turns[-1]["role"] == message["role"]:
+            turns[-1]["content"] += "\n\n" + content
+        else:
+            turns.append({"role": message["role"], "content": content})
+    return "\n\n".join(system), turns
+
+
+def demo_response(messages: Messages) -> str:
+    user_messages = [m for m in messages if m.get("role") == "user"]
+    message = user_messages[-1]["content"] if user_messages else ""
+    return (
+        f"[DEMO MODE] You asked: {message}\n\nThis is a demo response. Please set "
+        "OPENAI_API_KEY or ANTHROPIC_API_KEY in your .env file to enable real AI "
+        "responses."
+    )
+
+
+class StubProvider(LLMProvider):
+    """Local provider answering from ``respond`` after a simulated latency.
+
+    Used as the demo answer when no API key is configured, and by the
+    benchmarks with canned SQL.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        respond: Callable[[Messages], str] = demo_response,
+        model: str = "stub",
+        first_token_ms: float = 0.0,
+        total_ms: float = 0.0,
+        chunks: int = 1,
+        cacheable: bool = False,
+    ):
+        super().__init__(model)
+        self.respond = respond
+        self.first_token_ms = first_token_ms
+        self.total_ms = total_ms
+        self.chunks = max(1, chunks)
+        self.cacheable = cacheable
+
+    async def stream(self, messages: Messages, max_tokens: int) -> AsyncIterator[str]:
+        text = self.respond(messages)
+        size = max(1, -(-len(text) // self.chunks))
+        gap = max(0.0, self.total_ms - self.first_token_ms) / self.chunks
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for start in range(0, len(text), size):
+            yield text[start : start + size]
+            await asyncio.sleep(gap / 1000)
+
+
+class CircuitBreaker:
+    """Stops sending requests to a provider whose recent calls mostly fail.
+
+    Opens once ``failure_rate`` of the last ``window`` outcomes (with at
+    least ``min_requests``) are failures; after ``cooldown`` seconds a single
+    probe is let through, and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        failure_rate: float = 0.5,
+        min_requests: int = 5,
+        cooldown: float = 30.0,
+    ):
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if not self._probing and time.monotonic() - self._opened_at >= self.cooldown:
+            self._probing = True
+            return True
+        return False
+
+    def record(self, success: bool) -> None:
+        if self._opened_at is not None:
+            self._probing = False
+            if success:
+                self._opened_at = None
+                self._outcomes.clear()
+            else:
+                self._opened_at = time.monotonic()
+            return
+
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if (
+            len(self._outcomes) >= self.min_requests
+            and failures / len(self._outcomes) >= self.failure_rate
+        ):
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        # The call ended without a verdict (e.g. it lost a hedge race)
+        self._probing = False
+
+
+class _LatencyTracker:
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Attempt:
+    def __init__(self, provider: LLMProvider, messages: Messages, max_tokens: int):
+        self.provider = provider
+        self.started = time.monotonic()
+        self.iterator = provider.stream(messages, max_tokens).__aiter__()
+        self.first: asyncio.Future = asyncio.ensure_future(self.iterator.__anext__())
+
+    async def close(self) -> None:
+        if not self.first.done():
+            self.first.cancel()
+            await asyncio.gather(self.first, return_exceptions=True)
+        try:
+            await self.iterator.aclose()  # type: ignore[attr-defined]
+        except Exception:
+            pass
+
+
+class RoutedStream:
+    """Text deltas of one routed completion.
+
+    ``provider`` is the provider the deltas come from, set once it wins the
+    first-token race (and ``None`` until then), so callers can attribute
+    and cache the answer under the model that actually wrote it.
+    """
+
+    def __init__(
+        self,
+        router: "ProviderRouter",
+        messages: Messages,
+        max_tokens: int,
+        deadline: Optional[float],
+    ):
+        self.provider: Optional[LLMProvider] = None
+        self._deltas = router._stream(messages, max_tokens, deadline, self)
+
+    def __aiter__(self) -> "RoutedStream":
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._deltas.__anext__()
+
+    async def aclose(self) -> None:
+        await self._deltas.aclose()
+
+
+class ProviderRouter:
+    """Streams completions from an ordered list of providers.
+
+    Every request runs under a deadline. If the first token hasn't arrived
+    within the provider's observed ``hedge_quantile`` time-to-first-token
+    (``hedge_delay`` until enough samples exist), a hedge request goes to the
+    next provider; the first to produce a token wins and the other is
+    cancelled. A provider that fails before its first token is replaced by
+    the next one while attempts and time remain. Each provider has a circuit
+    breaker, and providers with an open circuit are skipped.
+    """
+
+    def __init__(
+        self,
+        providers: Sequence[LLMProvider],
+        deadline: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        hedge_delay: Optional[float] = None,
+        hedge_quantile: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        breaker_factory: Optional[Callable[[], CircuitBreaker]] = None,
+    ):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        self.providers = list(providers)
+        self.deadline = (
+            deadline
+            if deadline is not None
+            else float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+        )
+        self.hedge = (
+            hedge
+            if hedge is not None
+            else os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+        )
+        self.hedge_delay = (
+            hedge_delay
+            if hedge_delay is not None
+            else float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "3"))
+        )
+        self.hedge_quantile = (
+            hedge_quantile
+            if hedge_quantile is not None
+            else float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+        )
+        self.hedge_min_samples = (
+            hedge_min_samples
+            if hedge_min_samples is not None
+            else int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        )
+        self.max_attempts = (
+            max_attempts
+            if max_attempts is not None
+            else int(os.getenv("LLM_MAX_ATTEMPTS", "2"))
+        )
+        breaker_factory = breaker_factory or (
+            lambda: CircuitBreaker(
+                window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+                failure_rate=float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")),
+                min_requests=int(os.getenv("LLM_BREAKER_MIN_REQUESTS", "5")),
+                cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
+            )
+        )
+        self.breakers = {provider.key: breaker_factory() for provider in providers}
+        self._first_token = {provider.key: _LatencyTracker() for provider in providers}
+
+    @property
+    def primary(self) -> LLMProvider:
+        return self.providers[0]
+
+    def hedge_delay_for(self, provider: LLMProvider) -> float:
+        observed = self._first_token[provider.key].quantile(
+            self.hedge_quantile, self.hedge_min_samples
+        )
+        return observed if observed is not None else self.hedge_delay
+
+    async def complete(
+        self,
+        messages: Messages,
+        max_tokens: int = MAX_COMPLETION_TOKENS,
+        deadline: Optional[float] = None,
+    ) -> Tuple[str, LLMProvider]:
+        """Return the completion and the provider that wrote it."""
+        routed = self.stream(messages, max_tokens, deadline)
+        text = "".join([delta async for delta in routed])
+        assert routed.provider is not None
+        return text, routed.provider
+
+    def stream(
+        self,
+        messages: Messages,
+        max_tokens: int = MAX_COMPLETION_TOKENS,
+        deadline: Optional[float] = None,
+    ) -> RoutedStream:
+        return RoutedStream(self, messages, max_tokens, deadline)
+
+    async def _stream(
+        self,
+        messages: Messages,
+        max_tokens: int,
+        deadline: Optional[float],
+        routed: RoutedStream,
+    ) -> AsyncIterator[str]:
+        budget = min(deadline, self.deadline) if deadline is not None else self.deadline
+        deadline_at = time.monotonic() + budget
+        # Running out of a budget the caller shortened isn't the provider's
+        # fault, so only the router's own deadline counts against its breaker
+        penalize_timeout = budget >= self.deadline
+        winner = await self._first_token_race(
+            messages, max_tokens, deadline_at, penalize_timeout
+        )
+        attempt, first = winner
+        routed.provider = attempt.provider
+        breaker = self.breakers[attempt.provider.key]
+        try:
+            if first is not None:
+                yield first
+                while True:
+                    remaining = deadline_at - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMDeadlineExceeded(
+                            f"LLM response exceeded its {budget:g}s deadline"
+                        )
+                    try:
+                        delta = await asyncio.wait_for(
+                            attempt.iterator.__anext__(), remaining
+                        )
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise LLMDeadlineExceeded(
+                            f"LLM response exceeded its {budget:g}s deadline"
+                        )
+                    yield delta
+        except BaseException as e:
+            # The caller stopping early (cancelled, or the generator closed)
+            # says nothing about the provider's health
+            if isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                breaker.release()
+                self._count(attempt.provider, "cancelled")
+            elif isinstance(e, LLMDeadlineExceeded) and not penalize_timeout:
+                breaker.release()
+                self._count(attempt.provider, "timeout")
+            else:
+                breaker.record(False)
+                self._count(attempt.provider, _outcome(e))
+            await attempt.close()
+            raise
+        breaker.record(True)
+        self._count(attempt.provider, "success")
+
+    async def _first_token_race(
+        self,
+        messages: Messages,
+        max_tokens: int,
+        deadline_at: float,
+        penalize_timeout: bool = True,
+    ):
+        """Return ``(attempt, first_delta)`` for the attempt that wins."""
+        pending: List[_Attempt] = []
+        launched = 0
+        cursor = 0
+        errors: List[str] = []
+        next_hedge_at: Optional[float] = None
+
+        def launch() -> bool:
+            # Next provider in order whose circuit lets a request through;
+            # with a single provider, hedges and retries go to it again
+            nonlocal launched, cursor, next_hedge_at
+            next_hedge_at = None
+            for _ in range(len(self.providers)):
+                provider = self.providers[cursor % len(self.providers)]
+                cursor += 1
+                if self.breakers[provider.key].allow():
+                    break
+            else:
+                return False
+
+            if launched:
+                self._count(provider, "hedge" if pending else "failover")
+            pending.append(_Attempt(provider, messages, max_tokens))
+            launched += 1
+            if self.hedge and launched < self.max_attempts:
+                next_hedge_at = time.monotonic() + self.hedge_delay_for(provider)
+            return True
+
+        if not launch():
+            raise LLMProviderError("No LLM provider available: all circuits are open")
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline_at:
+                    while pending:
+                        attempt = pending.pop()
+                        breaker = self.breakers[attempt.provider.key]
+                        if penalize_timeout:
+                            breaker.record(False)
+                        else:
+                            breaker.release()
+                        self._count(attempt.provider, "timeout")
+                        await attempt.close()
+                    raise LLMDeadlineExceeded(
+                        "LLM produced no output before its deadline"
+                    )
+
+                wake_at = deadline_at
+                if next_hedge_at is not None:
+                    wake_at = min(wake_at, next_hedge_at)
+                done, _ = await asyncio.wait(
+                    [attempt.first for attempt in pending],
+                    timeout=max(0.0, wake_at - now),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                for attempt in [a for a in pending if a.first in done]:
+                    pending.remove(attempt)
+                    error = attempt.first.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        self._first_token[attempt.provider.key].add(
+                            time.monotonic() - attempt.started
+                        )
+                        first = None if error is not None else attempt.first.result()
+                        return attempt, first
+
+                    self.breakers[attempt.provider.key].record(False)
+                    self._count(attempt.provider, _outcome(error))
+                    errors.append(f"{attempt.provider.key}: {error}")
+                    await attempt.close()
+                    if not pending and launched < self.max_attempts:
+                        launch()
+
+                if (
+                    not done
+                    and next_hedge_at is not None
+                    and time.monotonic() >= next_hedge_at
+                ):
+                    launch()
+
+            raise LLMProviderError("LLM request failed: " + "; ".join(errors))
+        finally:
+            # Whatever is still pending lost the race (or the request was
+            # cancelled); stop it so it doesn't hold a connection
+            for attempt in pending:
+                self.breakers[attempt.provider.key].release()
+                self._count(attempt.provider, "cancelled")
+                await attempt.close()
+
+    def _count(self, provider: LLMProvider, outcome: str) -> None:
+        metrics.llm_requests.inc(
+            provider=provider.name, model=provider.model, outcome=outcome
+        )
+
+    def collect_metrics(self) -> None:
+        for provider in self.providers:
+            metrics.llm_circuit_open.set(
+                1 if self.breakers[provider.key].state == "open" else 0,
+                provider=provider.name,
+                model=provider.model,
+            )
+
+    @classmethod
+    def from_env(cls) -> "ProviderRouter":
+        return cls(providers_from_env())
+
+
+def _outcome(error: BaseException) -> str:
+    return "timeout" if isinstance(error, LLMDeadlineExceeded) else "error"
+
+
+def providers_from_env() -> List[LLMProvider]:
+    """Build providers from ``LLM_PROVIDERS``, primary first.
+
+    Entries are ``provider`` or ``provider:model`` (e.g.
+    ``openai,anthropic:claude-3-5-haiku-latest``). Without it, every provider
+    with an API key is used, OpenAI first; with no keys, the demo stub.
+    """
+    openai_key = os.getenv("OPENAI_API_KEY")
+    anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+    defaults = {
+        "openai": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        "anthropic": os.getenv("ANTHROPIC_MODEL", "claude-3-5-haiku-latest"),
+        "stub": "stub",
+    }
+
+    configured = os.getenv("LLM_PROVIDERS")
+    if configured:
+        entries = [entry.strip() for entry in configured.split(",") if entry.strip()]
+    else:
+        entries = [
+            name
+            for name, key in (("openai", openai_key), ("anthropic", anthropic_key))
+            if key
+        ]
+
+    providers: List[LLMProvider] = []
+    for entry in entries:
+        name, _, model = entry.partition(":")
+        model = model or defaults.get(name, "")
+        if name == "openai" and openai_key:
+            providers.append(OpenAIProvider(model, openai_key))
+        elif name == "anthropic" and anthropic_key:
+            providers.append(AnthropicProvider(model, anthropic_key))
+        elif name == "stub":
+            providers.append(StubProvider(model=model))
+        else:
+            print(f"Skipping LLM provider {entry!r}: unknown or missing API key")
+    return providers or [StubProvider()]
@@ -0,0 +1,306 @@
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Tuple, Callable, Sequence, Mapping
+import math
+import threading
+
+# Seconds; covers fast cache hits through slow LLM completions
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+# Route template and data source of the request being served, so code deep in
+# the call stack can label what it records without threading them through
+_request_labels: ContextVar[Mapping[str, str]] = ContextVar(
+    "metrics_request_labels", default={"route": "", "data_source": ""}
+)
+
+
+def current_labels() -> Mapping[str, str]:
+    return _request_labels.get()
+
+
+def bind_route(route: str):
+    return _request_labels.set({"route": route, "data_source": ""})
+
+
+def unbind(token) -> None:
+    _request_labels.reset(token)
+
+
+def bind_data_source(data_source_id: Optional[str], resolved: bool = True) -> None:
+    """Label what follows with ``data_source_id``.
+
+    Ids straight from a request are bound with ``resolved=False`` (labelled
+    "unknown") until the data source has been looked up, so arbitrary input
+    can't mint new label values.
+    """
+    if not data_source_id:
+        label = "default"
+    else:
+        label = data_source_id if resolved else "unknown"
+    _request_labels.set({**_request_labels.get(), "data_source": label})
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Mapping[str, str]) -> LabelValues:
+        # ``route`` and ``data_source`` default to the current request's
+        context = current_labels()
+        return tuple(
+            str(labels[name]) if name in labels else context.get(name, "")
+            for name in self.labelnames
+        )
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, LabelValues, float, Tuple[str, ...]]]: ...
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for suffix, values, value, extra in self.samples():
+            names = self.labelnames + (("le",) if extra else ())
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(names, values + extra)} "
+                f"{_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("", key, value, ()) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            return [("", key, value, ()) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: (non-cumulative bucket counts + overflow, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += count
+                    samples.append(
+                        ("_bucket", key, cumulative, (_format_value(bound),))
+                    )
+                samples.append(("_sum", key, total[0], ()))
+                samples.append(("_count", key, cumulative, ()))
+        return samples
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered in the Prometheus text format.
+
+    Collectors run right before each scrape, for values that are cheaper to
+    read on demand (such as connection pool state) than to keep updated.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "bagofwords_http_request_duration_seconds",
+    "Time to serve an HTTP request, until the response (or stream) completes.",
+    ("route", "method", "status"),
+)
+stage_duration = registry.histogram(
+    "bagofwords_stage_duration_seconds",
+    "Time spent in each stage of serving a request.",
+    ("route", "data_source", "stage"),
+)
+cache_requests = registry.counter(
+    "bagofwords_cache_requests_total",
+    "Cache lookups by cache and outcome.",
+    ("route", "data_source", "cache", "result"),
+)
+errors = registry.counter(
+    "bagofwords_errors_total",
+    "Failures by the stage they happened in.",
+    ("route", "data_source", "stage"),
+)
+llm_requests = registry.counter(
+    "bagofwords_llm_requests_total",
+    "LLM provider calls by outcome (success, error, timeout, hedge, failover, "
+    "cancelled).",
+    ("provider", "model", "outcome"),
+)
+llm_circuit_open = registry.gauge(
+    "bagofwords_llm_circuit_open",
+    "1 while a provider's circuit breaker is open.",
+    ("provider", "model"),
+)
+queries_in_flight = registry.gauge(
+    "bagofwords_queries_in_flight",
+    "Warehouse queries queued or running.",
+    ("data_source",),
+)
+pool_size = registry.gauge(
+    "bagofwords_pool_size",
+    "Configured size of the warehouse connection pool.",
+    ("data_source",),
+)
+pool_checked_out = registry.gauge(
+    "bagofwords_pool_checked_out",
+    "Warehouse connections currently checked out of the pool.",
+    ("data_source",),
+)
+pool_overflow = registry.gauge(
+    "bagofwords_pool_overflow",
+    "Warehouse connections open beyond the pool size.",
+    ("data_source",),
+)
+
+
+def observe_stages(timings_ms: Mapping[str, float], **labels: str) -> None:
+    """Record a request's ``{stage: milliseconds}`` timings."""
+    for stage, elapsed in timings_ms.items():
+        stage_duration.observe(elapsed / 1000, stage=stage, **labels)
@@ -0,0 +1,12 @@
+import re
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def collapse_whitespace(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_sql(sql: str) -> str:
+    # Formatting-only differences shouldn't make two queries distinct
+    return collapse_whitespace(sql).rstrip(";").strip()
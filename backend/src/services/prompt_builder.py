@@ -0,0 +1,302 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Any, Sequence, Tuple
+import hashlib
+import json
+import threading
+
+from openai.types.chat import ChatCompletionMessageParam
+
+from src.services.schema_cache import fingerprint
+from src.services.schema_retrieval import schema_retriever
+
+STATIC_SYSTEM_PROMPT = """You are an AI data analyst assistant. 
+You help users analyze their data by:
+1. Understanding natural language questions about data
+2. Generating SQL queries when needed
+3. Explaining results clearly
+4. Suggesting visualizations
+
+When generating SQL, wrap it in ```sql``` code blocks.
+
+IMPORTANT: After providing the SQL query, you MUST suggest a visualization by adding a JSON block.
+
+Visualization guidelines - Choose the best chart type for the data:
+
+**Table**: detailed data inspection, mixed data types, small datasets
+**Bar Chart**: category comparisons, rankings, distribution across categories
+**Horizontal Bar**: same as bar but better when category names are long
+**Stacked Bar**: showing composition of categories, part-to-whole relationships
+**Line Chart**: time series data, trends over time, continuous data
+**Area Chart**: similar to line but emphasizes volume/magnitude over time
+**Pie Chart**: proportions and percentages, market share (max 7-8 categories)
+**Donut Chart**: modern alternative to pie chart with better aesthetics
+**Scatter Plot**: correlation between two numeric variables, distribution patterns
+**Combo Chart**: comparing different scales (e.g., revenue bars + growth rate line)
+
+REQUIRED FORMAT - Always include this block after your explanation:
+```visualization
+{
+  "type": "bar",
+  "xKey": "category",
+  "yKeys": ["total_sales"],
+  "title": "Sales by Category"
+}
+```
+
+Valid chart types: "table", "bar", "horizontalBar", "stackedBar", "line", "area", "pie", "donut", "scatter", "combo"
+
+Examples:
+
+Time series:
+```visualization
+{
+  "type": "line",
+  "xKey": "date",
+  "yKeys": ["revenue", "cost"],
+  "title": "Revenue vs Cost Over Time"
+}
+```
+
+Proportions:
+```visualization
+{
+  "type": "pie",
+  "xKey": "category",
+  "yKeys": ["market_share"],
+  "title": "Market Share by Category"
+}
+```
+
+Correlation:
+```visualization
+{
+  "type": "scatter",
+  "xKey": "price",
+  "yKeys": ["sales_volume"],
+  "title": "Price vs Sales Volume"
+}
+```
+
+Stacked comparison:
+```visualization
+{
+  "type": "stackedBar",
+  "xKey": "quarter",
+  "yKeys": ["product_a", "product_b", "product_c"],
+  "title": "Quarterly Sales by Product"
+}
+```
+
+Combo chart:
+```visualization
+{
+  "type": "combo",
+  "xKey": "month",
+  "yKeys": ["revenue", "profit"],
+  "barKeys": ["revenue"],
+  "lineKeys": ["profit"],
+  "title": "Revenue (Bar) vs Profit Margin (Line)"
+}
+```
+
+Be concise but thorough. Always ask for clarification if the question is ambiguous."""
+
+EXAMPLE_MESSAGES: List[ChatCompletionMessageParam] = [
+    {
+        "role": "user",
+        "content": "Show me top products by revenue",
+    },
+    {
+        "role": "assistant",
+        "content": """I'll help you find the top products by revenue.
+
+```sql
+SELECT product_name, SUM(total_amount) AS revenue
+FROM sales
+GROUP BY product_name
+ORDER BY revenue DESC
+LIMIT 10;
+```
+
+```visualization
+{
+  "type": "bar",
+  "xKey": "product_name",
+  "yKeys": ["revenue"],
+  "title": "Top Products by Revenue"
+}
+```""",
+    },
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1 if text else 0
+
+
+@dataclass
+class BuiltPrompt:
+    messages: List[ChatCompletionMessageParam]
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.section_tokens.values())
+
+
+class PromptBuilder:
+    """Assembles chat prompts from pre-rendered, cached sections.
+
+    The static instructions and few-shot example never change, so they go
+    first where OpenAI's automatic prefix caching can reuse them; the rules
+    (stable between edits), the schema slice and any verified examples
+    retrieved for the question follow in a second system message, then any
+    conversation history. Rendered rules are cached per rules version and
+    rendered tables per schema fingerprint, so a prompt is mostly a join of
+    strings that already exist.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._static_tokens = estimate_tokens(STATIC_SYSTEM_PROMPT)
+        self._example_tokens = sum(
+            estimate_tokens(str(message["content"])) for message in EXAMPLE_MESSAGES
+        )
+        self._tables: "OrderedDict[Tuple, Dict[str, str]]" = OrderedDict()
+        self._rules: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(
+        self,
+        message: str,
+        schema_context: Optional[Dict] = None,
+        rules: Optional[List[Dict[str, Any]]] = None,
+        row_estimates: Optional[Dict[str, int]] = None,
+        rules_version: Optional[str] = None,
+        history: Optional[List[ChatCompletionMessageParam]] = None,
+        retrieval_text: Optional[str] = None,
+        examples: Optional[Sequence[Any]] = None,
+    ) -> BuiltPrompt:
+        rules_block = self.rules_block(rules, rules_version)
+        schema_block = self.schema_block(
+            f"{message} {retrieval_text}" if retrieval_text else message,
+            schema_context,
+            row_estimates,
+        )
+        examples_block = self.examples_block(examples)
+
+        messages: List[ChatCompletionMessageParam] = [
+            {"role": "system", "content": STATIC_SYSTEM_PROMPT},
+            *EXAMPLE_MESSAGES,
+        ]
+        context = "".join((rules_block, schema_block, examples_block)).strip()
+        if context:
+            messages.append({"role": "system", "content": context})
+        messages.extend(history or [])
+        messages.append({"role": "user", "content": message})
+
+        return BuiltPrompt(
+            messages=messages,
+            section_tokens={
+                "static": self._static_tokens,
+                "examples": self._example_tokens,
+                "rules": estimate_tokens(rules_block),
+                "schema": estimate_tokens(schema_block),
+                "verified_examples": estimate_tokens(examples_block),
+                "history": sum(
+                    estimate_tokens(str(item["content"])) for item in history or []
+                ),
+                "message": estimate_tokens(message),
+            },
+        )
+
+    def schema_block(
+        self,
+        message: str,
+        schema_context: Optional[Dict],
+        row_estimates: Optional[Dict[str, int]] = None,
+    ) -> str:
+        if not schema_context:
+            return ""
+
+        rendered = self._rendered_tables(schema_context, row_estimates)
+        selected = schema_retriever.select(message, schema_context)
+        return "\n\nAvailable database schema:\n" + "".join(
+            rendered[table] for table in selected
+        )
+
+    def examples_block(self, examples: Optional[Sequence[Any]]) -> str:
+        # Anything with ``question`` and ``sql``, e.g. the example store's
+        if not examples:
+            return ""
+        return (
+            "\n\nVerified queries for similar questions on this data source; "
+            "reuse their tables, joins and filters where they fit:\n"
+            + "".join(
+                f"\nQ: {example.question}\n```sql\n{example.sql}\n```\n"
+                for example in examples
+            )
+        )
+
+    def rules_block(
+        self,
+        rules: Optional[List[Dict[str, Any]]],
+        rules_version: Optional[str] = None,
+    ) -> str:
+        if not rules:
+            return ""
+
+        version = (
+            rules_version
+            or hashlib.sha256(
+                json.dumps(
+                    [(rule["name"], rule["scope"], rule["prompt"]) for rule in rules]
+                ).encode()
+            ).hexdigest()
+        )
+        block = self._rules.get(version)
+        if block is None:
+            block = "\n\nUSER-DEFINED RULES:\n" + "".join(
+                f"\n{rule['name']} ({rule['scope']}):\n{rule['prompt']}\n"
+                for rule in rules
+            )
+            with self._lock:
+                self._rules[version] = block
+                while len(self._rules) > self.max_entries:
+                    self._rules.popitem(last=False)
+        return block
+
+    def _rendered_tables(
+        self, schema_context: Dict, row_estimates: Optional[Dict[str, int]]
+    ) -> Dict[str, str]:
+        key = (fingerprint(schema_context), fingerprint(row_estimates))
+        rendered = self._tables.get(key)
+        if rendered is None:
+            rendered = {
+                table: self._render_table(
+                    table, columns, (row_estimates or {}).get(table)
+                )
+                for table, columns in schema_context.items()
+            }
+            with self._lock:
+                self._tables[key] = rendered
+                while len(self._tables) > self.max_entries:
+                    self._tables.popitem(last=False)
+        return rendered
+
+    def _render_table(
+        self, table: str, columns: List[Dict[str, Any]], row_estimate: Optional[int]
+    ) -> str:
+        size_hint = f" (~{row_estimate} rows)" if row_estimate is not None else ""
+        lines = [f"\nTable: {table}{size_hint}\n"]
+        for col in columns:
+            key_hint = " PRIMARY KEY" if col.get("primary_key") else ""
+            if col.get("foreign_key"):
+                key_hint += f" REFERENCES {col['foreign_key']}"
+            not_null = " NOT NULL" if not col["nullable"] else ""
+            lines.append(f"  - {col['name']} ({col['type']}){not_null}{key_hint}\n")
+        return "".join(lines)
+
+
+prompt_builder = PromptBuilder()
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, TYPE_CHECKING
+import os
+
+from sqlalchemy.exc import ProgrammingError
+
+from src.services.database import QUERY_MAX_ROWS, is_row_query
+
+if TYPE_CHECKING:
+    from src.services.database import DatabaseService
+
+
+class QueryRejected(Exception):
+    """Raised when a query's plan is too expensive to run as written."""
+
+    def __init__(
+        self, reason: str, cost: Optional[float] = None, rows: Optional[float] = None
+    ):
+        super().__init__(reason)
+        self.cost = cost
+        self.rows = rows
+
+
+@dataclass
+class PreflightResult:
+    # "ok", "limited" (row cap lowered to ``max_rows``) or "skipped"
+    status: str
+    max_rows: Optional[int] = None
+    cost: Optional[float] = None
+    rows: Optional[float] = None
+    # Why the row cap was lowered, when it was
+    note: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def max_plan_rows(plan: Dict[str, Any]) -> float:
+    # The largest intermediate result is what blows up on a cartesian join,
+    # even when a LIMIT on top keeps the final estimate small
+    rows = float(plan.get("Plan Rows", 0))
+    for child in plan.get("Plans", []):
+        rows = max(rows, max_plan_rows(child))
+    return rows
+
+
+class QueryPreflight:
+    """Checks generated SQL against the planner's estimates before running it.
+
+    The query is explained exactly as it will execute (with the row cap
+    applied). Plans over ``max_cost`` or producing more than ``max_rows``
+    intermediate rows are retried with the cap lowered to ``auto_limit_rows``;
+    if that brings the cost within budget the query runs with the lower cap
+    (and a ``note`` saying why), otherwise it is rejected with a reason the
+    LLM can act on. Only PostgreSQL plans are inspected; other dialects are
+    passed through.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        max_cost: Optional[float] = None,
+        max_rows: Optional[float] = None,
+        auto_limit_rows: Optional[int] = None,
+        repair: Optional[bool] = None,
+    ):
+        self.enabled = (
+            enabled
+            if enabled is not None
+            else os.getenv("QUERY_PREFLIGHT_ENABLED", "true").lower() == "true"
+        )
+        self.max_cost = (
+            max_cost
+            if max_cost is not None
+            else float(os.getenv("QUERY_PREFLIGHT_MAX_COST", "1000000"))
+        )
+        self.max_rows = (
+            max_rows
+            if max_rows is not None
+            else float(os.getenv("QUERY_PREFLIGHT_MAX_ROWS", "10000000"))
+        )
+        self.auto_limit_rows = (
+            auto_limit_rows
+            if auto_limit_rows is not None
+            else int(os.getenv("QUERY_PREFLIGHT_AUTO_LIMIT_ROWS", "1000"))
+        )
+        self.repair = (
+            repair
+            if repair is not None
+            else os.getenv("QUERY_PREFLIGHT_REPAIR", "true").lower() == "true"
+        )
+
+    async def check(
+        self,
+        db_service: "DatabaseService",
+        sql: str,
+        max_rows: Optional[int] = None,
+    ) -> PreflightResult:
+        if not self.enabled or not is_row_query(sql):
+            return PreflightResult(status="skipped", max_rows=max_rows)
+
+        plan = await self._explain(db_service, sql, max_rows)
+        if plan is None:
+            return PreflightResult(status="skipped", max_rows=max_rows)
+
+        cost = float(plan["Total Cost"])
+        rows = max_plan_rows(plan)
+        if cost <= self.max_cost and rows <= self.max_rows:
+            return PreflightResult(status="ok", max_rows=max_rows, cost=cost, rows=rows)
+
+        reason = self._over_budget(cost, rows)
+        if 0 < self.auto_limit_rows < (max_rows or QUERY_MAX_ROWS):
+            limited_plan = await self._explain(db_service, sql, self.auto_limit_rows)
+            if limited_plan and float(limited_plan["Total Cost"]) <= self.max_cost:
+                return PreflightResult(
+                    status="limited",
+                    max_rows=self.auto_limit_rows,
+                    cost=float(limited_plan["Total Cost"]),
+                    rows=rows,
+                    note=f"Only the first {self.auto_limit_rows:,} rows were "
+                    f"returned because, for the full result, {reason}.",
+                )
+
+        raise QueryRejected(
+            f"Query rejected before execution: {reason}. This usually means a "
+            "missing join condition or filter, or sorting/aggregating a very "
+            "large table.",
+            cost=cost,
+            rows=rows,
+        )
+
+    def _over_budget(self, cost: float, rows: float) -> str:
+        if cost > self.max_cost:
+            return (
+                f"the estimated cost {cost:,.0f} exceeds the limit of "
+                f"{self.max_cost:,.0f}"
+            )
+        return (
+            f"it is estimated to produce {rows:,.0f} intermediate rows, more "
+            f"than the limit of {self.max_rows:,.0f}"
+        )
+
+    async def _explain(
+        self, db_service: "DatabaseService", sql: str, max_rows: Optional[int]
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            return await db_service.explain_async(sql, max_rows)
+        except ProgrammingError as e:
+            # The query can't even be planned; let the LLM see why
+            raise QueryRejected(f"Query failed to plan: {getattr(e, 'orig', e)}")
+
+
+query_preflight = QueryPreflight()
@@ -0,0 +1,322 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, TYPE_CHECKING
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+from src.services import metrics
+from src.services.incremental_refresh import refresh_result
+from src.services.normalization import normalize_sql
+
+if TYPE_CHECKING:
+    from src.services.database import DatabaseService
+
+
+@dataclass
+class CacheEntry:
+    value: Dict[str, Any]
+    expires_at: float
+    created_at: float = field(default_factory=time.time)
+    # Incremental refreshes merged into this value since its last full run
+    merges: int = 0
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.created_at)
+
+    @property
+    def size(self) -> int:
+        # Rough memory weight: one unit per cell in the result
+        columns = max(1, len(self.value.get("columns") or []))
+        return max(1, int(self.value.get("row_count") or 0)) * columns
+
+
+class ResultCacheBackend(ABC):
+    """Storage interface for cached query results.
+
+    Implement this to move the cache out of process (e.g. Redis); the
+    default in-memory backend is used otherwise.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CacheEntry]: ...
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for ``key`` even if it has expired.
+
+        Used as the base of incremental refreshes; backends that don't keep
+        expired entries around can leave this as is.
+        """
+        return None
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry) -> None: ...
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+class InMemoryResultCacheBackend(ResultCacheBackend):
+    """LRU bounded both by entry count and by total cached cells."""
+
+    def __init__(self, max_entries: int = 512, max_cells: int = 5_000_000):
+        self.max_entries = max_entries
+        self.max_cells = max_cells
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._cells = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry.expires_at:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        if entry.size > self.max_cells:
+            return
+
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = entry
+            self._cells += entry.size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._cells > self.max_cells
+            ):
+                self._pop(next(iter(self._entries)))
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._cells = 0
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._cells -= entry.size
+
+
+class ResultCache:
+    """Query result cache with single-flight execution.
+
+    Concurrent requests for the same key share one in-flight execution, which
+    keeps running (and fills the cache) even if the request that started it
+    goes away, as long as someone is still waiting for it. When the last
+    waiter is cancelled the execution is cancelled too, which stops the
+    query in the warehouse.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[ResultCacheBackend] = None,
+        default_ttl: Optional[float] = None,
+    ):
+        self.backend = backend or InMemoryResultCacheBackend(
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512")),
+            max_cells=int(os.getenv("RESULT_CACHE_MAX_CELLS", "5000000")),
+        )
+        self.default_ttl = (
+            default_ttl
+            if default_ttl is not None
+            else float(os.getenv("RESULT_CACHE_DEFAULT_TTL", "60"))
+        )
+        self.hits = 0
+        self.misses = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+
+    def make_key(self, source_key: str, sql: str, **variant: Any) -> str:
+        variant_text = ",".join(f"{k}={variant[k]}" for k in sorted(variant))
+        digest = hashlib.sha256(
+            f"{normalize_sql(sql)}|{variant_text}".encode()
+        ).hexdigest()
+        return f"{source_key}:{digest}"
+
+    def ttl_for(self, refresh_interval: Optional[int]) -> float:
+        return float(refresh_interval) if refresh_interval else self.default_ttl
+
+    async def get_or_compute(
+        self,
+        key: str,
+        ttl: float,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        refresh: bool = False,
+        merges: Optional[Callable[[], int]] = None,
+    ) -> Tuple[Dict[str, Any], str, float]:
+        """Return ``(value, "hit" | "miss", age_seconds)`` for ``key``.
+
+        ``merges``, when given, is read after ``compute`` finishes and stored
+        on the new entry.
+        """
+        if not refresh:
+            entry = self.backend.get(key)
+            if entry is not None:
+                self.hits += 1
+                metrics.cache_requests.inc(cache="result", result="hit")
+                return entry.value, "hit", entry.age
+
+        task = self._inflight.get(key)
+        status = "hit"
+        if task is None:
+            status = "miss"
+            task = asyncio.ensure_future(
+                self._compute_and_store(key, ttl, compute, merges)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        if status == "hit":
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.cache_requests.inc(cache="result", result=status)
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            value = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(key) == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            remaining = self._waiters.get(key, 1) - 1
+            if remaining > 0:
+                self._waiters[key] = remaining
+            else:
+                self._waiters.pop(key, None)
+        return value, status, 0.0
+
+    async def execute_query(
+        self,
+        db_service: "DatabaseService",
+        sql: str,
+        refresh_interval: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        page_token: Optional[str] = None,
+        columnar: bool = False,
+        refresh: bool = False,
+        timeout_ms: Optional[int] = None,
+        watermark_column: Optional[str] = None,
+        late_arrival_window: Optional[float] = None,
+    ) -> Tuple[Dict[str, Any], str, float]:
+        """Run ``sql`` through the cache.
+
+        With a ``watermark_column``, a stale or refreshed entry is brought up
+        to date by querying only rows past its newest watermark (see
+        ``incremental_refresh``) instead of re-running the whole query.
+        """
+        key = self.make_key(
+            db_service.pool_key,
+            sql,
+            max_rows=max_rows,
+            page_token=page_token,
+            columnar=columnar,
+            # A run that timed out under a short limit must not fail a
+            # caller who allowed longer, nor vice versa
+            timeout_ms=timeout_ms,
+        )
+
+        # Taken before the lookup, which drops the entry if it has expired
+        previous = (
+            self.backend.peek(key) if watermark_column and page_token is None else None
+        )
+        merge_count: Optional[Callable[[], int]] = None
+        if previous is not None and watermark_column:
+            merged = [previous.merges]
+
+            async def incremental() -> Dict[str, Any]:
+                value, was_merged = await refresh_result(
+                    db_service,
+                    sql,
+                    previous.value,
+                    watermark_column,
+                    late_arrival_window,
+                    max_rows=max_rows,
+                    columnar=columnar,
+                    timeout_ms=timeout_ms,
+                    merges=previous.merges,
+                )
+                merged[0] = previous.merges + 1 if was_merged else 0
+                return value
+
+            def merge_count() -> int:
+                return merged[0]
+
+            compute: Callable[[], Awaitable[Dict[str, Any]]] = incremental
+        else:
+            compute = partial(
+                db_service.execute_query_async,
+                sql,
+                max_rows=max_rows,
+                page_token=page_token,
+                columnar=columnar,
+                timeout_ms=timeout_ms,
+            )
+        return await self.get_or_compute(
+            key,
+            self.ttl_for(refresh_interval),
+            compute,
+            refresh=refresh,
+            merges=merge_count,
+        )
+
+    async def close(self) -> None:
+        """Cancel in-flight computations, e.g. before the executor shuts down."""
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def invalidate_source(self, source_key: str) -> None:
+        self.backend.delete_prefix(f"{source_key}:")
+
+    async def _compute_and_store(
+        self,
+        key: str,
+        ttl: float,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        merges: Optional[Callable[[], int]] = None,
+    ) -> Dict[str, Any]:
+        value = await compute()
+        if ttl > 0:
+            self.backend.set(
+                key,
+                CacheEntry(
+                    value=value,
+                    expires_at=time.time() + ttl,
+                    merges=merges() if merges else 0,
+                ),
+            )
+        return value
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            task.exception()
+
+
+result_cache = ResultCache()
@@ -0,0 +1,116 @@
+from typing import Optional, Dict, List, Any, Iterable, Tuple
+import asyncio
+import os
+import time
+
+from sqlalchemy import select
+
+# The scopes the rules page offers
+DEFAULT_SCOPES = "global,table,query_type,sql_style,business_logic,chart_preference"
+
+
+class RuleCache:
+    """Active rules held in process so the chat path never queries for them.
+
+    The full set of active rules is loaded once and served until the rules
+    handlers call ``invalidate`` (which bumps ``version``) or ``ttl`` passes;
+    the TTL bounds staleness when several workers share one database but
+    only one of them saw the write, and a reload that finds different rules
+    bumps ``version`` too.
+
+    Chat answers get the rules in ``scopes``: every scope the rules page
+    offers unless ``RULES_CHAT_SCOPES`` narrows them.
+    """
+
+    def __init__(
+        self, ttl: Optional[float] = None, scopes: Optional[Iterable[str]] = None
+    ):
+        self.ttl = ttl if ttl is not None else float(os.getenv("RULES_CACHE_TTL", "60"))
+        self.scopes = frozenset(
+            scopes
+            if scopes is not None
+            else (
+                scope.strip()
+                for scope in os.getenv("RULES_CHAT_SCOPES", DEFAULT_SCOPES).split(",")
+                if scope.strip()
+            )
+        )
+        self.version = 0
+        self._rules: Optional[List[Dict[str, Any]]] = None
+        self._loaded_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def invalidate(self) -> None:
+        self.version += 1
+        self._rules = None
+
+    async def resolve(
+        self,
+        data_source_id: Optional[str] = None,
+        scopes: Optional[Iterable[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """Return the rules that apply and a version string for caching.
+
+        Rules without a data source apply everywhere; the rest only to their
+        own data source. Only rules in ``scopes`` (default ``self.scopes``)
+        are returned.
+        """
+        rules = await self._all()
+        scope_set = frozenset(scopes) if scopes is not None else self.scopes
+        selected = [
+            rule
+            for rule in rules
+            if rule["data_source_id"] in (None, data_source_id)
+            and rule["scope"] in scope_set
+        ]
+        scope_key = ",".join(sorted(scope_set))
+        return selected, f"{self.version}:{data_source_id}:{scope_key}"
+
+    async def _all(self) -> List[Dict[str, Any]]:
+        rules = self._rules
+        if rules is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return rules
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have reloaded while we waited
+            if self._rules is not None and (
+                time.monotonic() - self._loaded_at < self.ttl
+            ):
+                return self._rules
+
+            version = self.version
+            rules = await self._load()
+            if version == self.version:
+                if self._rules is not None and rules != self._rules:
+                    # Changed by a write another worker saw; drop prompts
+                    # rendered from the old rules
+                    self.version += 1
+                self._rules = rules
+                self._loaded_at = time.monotonic()
+            return rules
+
+    async def _load(self) -> List[Dict[str, Any]]:
+        from src.models import SessionLocal
+        from src.models.models import Rule
+
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(Rule)
+                .where(Rule.active.is_(True))
+                .order_by(Rule.created_at, Rule.id)
+            )
+            return [
+                {
+                    "id": rule.id,
+                    "name": rule.name,
+                    "scope": rule.scope,
+                    "prompt": rule.prompt,
+                    "data_source_id": rule.data_source_id,
+                }
+                for rule in result.scalars().all()
+            ]
+
+
+rule_cache = RuleCache()
@@ -0,0 +1,218 @@
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Set
+import asyncio
+import os
+import random
+import time
+
+from sqlalchemy import select
+from src.services import metrics
+from src.services.database import DatabaseService, build_connection_url
+from src.services.result_cache import result_cache
+
+
+@dataclass
+class _RefreshTarget:
+    id: str
+    sql: str
+    refresh_interval: int
+    watermark_column: Optional[str] = None
+    late_arrival_window: Optional[int] = None
+    data_source_id: Optional[str] = None
+
+
+@dataclass
+class _ChartSchedule:
+    next_run: float
+    failures: int = 0
+
+
+class ChartRefreshScheduler:
+    """Keeps saved charts with a ``refresh_interval`` warm in the result cache.
+
+    Each chart is re-executed slightly before its cached result would expire
+    (the interval minus up to ``jitter`` of it, so charts sharing an interval
+    don't fire together). Failures back off exponentially up to
+    ``max_backoff`` seconds, and at most ``per_source_limit`` refreshes run
+    against one data source at a time. Charts whose data source is missing
+    or disconnected (or, without one, when no ``DATABASE_URL`` is set) are
+    skipped until the next interval.
+    """
+
+    def __init__(
+        self,
+        tick_seconds: Optional[float] = None,
+        jitter: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        per_source_limit: Optional[int] = None,
+    ):
+        self.tick_seconds = (
+            tick_seconds
+            if tick_seconds is not None
+            else float(os.getenv("CHART_REFRESH_TICK_SECONDS", "5"))
+        )
+        self.jitter = (
+            jitter
+            if jitter is not None
+            else float(os.getenv("CHART_REFRESH_JITTER", "0.1"))
+        )
+        self.max_backoff = (
+            max_backoff
+            if max_backoff is not None
+            else float(os.getenv("CHART_REFRESH_MAX_BACKOFF", "3600"))
+        )
+        self.per_source_limit = (
+            per_source_limit
+            if per_source_limit is not None
+            else int(os.getenv("CHART_REFRESH_CONCURRENCY_PER_SOURCE", "2"))
+        )
+        self._schedules: Dict[str, _ChartSchedule] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks)
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        # Refresh tasks inherit these labels for whatever they record
+        metrics.bind_route("scheduler")
+        metrics.bind_data_source(None)
+        while True:
+            try:
+                await self._tick()
+            except Exception as e:
+                print(f"Chart refresh tick failed: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def _tick(self) -> None:
+        charts = await self._load_charts()
+        now = time.monotonic()
+
+        chart_ids = {chart.id for chart in charts}
+        for chart_id in list(self._schedules):
+            if chart_id not in chart_ids:
+                del self._schedules[chart_id]
+
+        for chart in charts:
+            chart_id, refresh_interval = chart.id, chart.refresh_interval
+            schedule = self._schedules.get(chart_id)
+            if schedule is None:
+                # Spread the first round so a restart doesn't fire everything at once
+                schedule = _ChartSchedule(
+                    next_run=now + random.uniform(0, self.jitter * refresh_interval)
+                )
+                self._schedules[chart_id] = schedule
+
+            if schedule.next_run <= now and chart_id not in self._running:
+                self._running.add(chart_id)
+                task = asyncio.create_task(self._refresh(chart, schedule))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, chart: _RefreshTarget, schedule: _ChartSchedule) -> None:
+        chart_id, refresh_interval = chart.id, chart.refresh_interval
+        try:
+            db_service = await self._resolve_database(chart.data_source_id)
+            if db_service is None:
+                schedule.next_run = time.monotonic() + refresh_interval
+                return
+
+            async with self._semaphore(db_service.pool_key):
+                # Dashboards request the columnar format, so warm that variant;
+                # charts with a watermark only read what changed since
+                await result_cache.execute_query(
+                    db_service,
+                    chart.sql,
+                    refresh_interval,
+                    columnar=True,
+                    refresh=True,
+                    watermark_column=chart.watermark_column,
+                    late_arrival_window=chart.late_arrival_window,
+                )
+            schedule.failures = 0
+            schedule.next_run = time.monotonic() + refresh_interval * (
+                1 - random.uniform(0, self.jitter)
+            )
+        except Exception as e:
+            schedule.failures += 1
+            backoff = min(refresh_interval * 2**schedule.failures, self.max_backoff)
+            schedule.next_run = time.monotonic() + backoff
+            print(f"Failed to refresh chart {chart_id}: {e}")
+        finally:
+            self._running.discard(chart_id)
+
+    async def _resolve_database(
+        self, data_source_id: Optional[str]
+    ) -> Optional[DatabaseService]:
+        if data_source_id:
+            from src.models import SessionLocal
+            from src.models.models import DataSourceConnection
+
+            async with SessionLocal() as db:
+                data_source = await db.get(DataSourceConnection, data_source_id)
+            if not data_source or str(data_source.status) != "connected":
+                return None
+
+            # Built like the dashboard endpoints do, so the refreshed result
+            # lands under the same cache key
+            return DatabaseService(
+                database_url=build_connection_url(data_source),
+                data_source_id=data_source_id,
+                statement_timeout_ms=data_source.statement_timeout_ms,  # type: ignore[arg-type]
+                read_only=data_source.read_only,  # type: ignore[arg-type]
+            )
+
+        database_url = os.getenv("DATABASE_URL")
+        if database_url:
+            return DatabaseService(database_url=database_url)
+        return None
+
+    def _semaphore(self, key: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_source_limit)
+            self._semaphores[key] = semaphore
+        return semaphore
+
+    async def _load_charts(self) -> List[_RefreshTarget]:
+        from src.models import SessionLocal
+        from src.models.models import SavedChart
+
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(
+                    SavedChart.id,
+                    SavedChart.sql,
+                    SavedChart.refresh_interval,
+                    SavedChart.watermark_column,
+                    SavedChart.late_arrival_window,
+                    SavedChart.data_source_id,
+                ).where(SavedChart.refresh_interval > 0)
+            )
+            return [
+                _RefreshTarget(
+                    id=str(row[0]),
+                    sql=str(row[1]),
+                    refresh_interval=int(row[2]),
+                    watermark_column=row[3],
+                    late_arrival_window=row[4],
+                    data_source_id=row[5],
+                )
+                for row in result.all()
+            ]
+
+
+chart_refresh_scheduler = ChartRefreshScheduler()
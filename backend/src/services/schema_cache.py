@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+import hashlib
+import json
+import os
+import threading
+import time
+
+# {"tables": {table: [column, ...]}, "row_estimates": {table: rows}}
+SchemaSnapshot = Dict[str, Any]
+
+FINGERPRINT_MEMO_SIZE = 64
+
+# Keyed by id(); the value is kept alive alongside its fingerprint so the id
+# cannot be reused while the entry exists
+_fingerprints: "OrderedDict[int, Tuple[Any, str]]" = OrderedDict()
+_fingerprints_lock = threading.Lock()
+
+
+def fingerprint(value: Optional[Dict]) -> Optional[str]:
+    """Content hash of a schema snapshot (or any JSON-like mapping).
+
+    Snapshots handed out by the cache are shared objects that every request
+    would otherwise re-serialize, so each object is hashed only once.
+    """
+    if not value:
+        return None
+
+    with _fingerprints_lock:
+        entry = _fingerprints.get(id(value))
+        if entry is not None and entry[0] is value:
+            _fingerprints.move_to_end(id(value))
+            return entry[1]
+
+    digest = hashlib.sha256(
+        json.dumps(value, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    with _fingerprints_lock:
+        _fingerprints[id(value)] = (value, digest)
+        while len(_fingerprints) > FINGERPRINT_MEMO_SIZE:
+            _fingerprints.popitem(last=False)
+    return digest
+
+
+class SchemaCache:
+    """In-process cache of reflected warehouse schemas keyed by data source.
+
+    Entries expire after ``ttl`` seconds and are dropped explicitly whenever a
+    data source's connection settings change or a refresh is requested.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = (
+            ttl if ttl is not None else float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+        )
+        self._entries: Dict[str, Tuple[float, SchemaSnapshot]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[SchemaSnapshot]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, schema = entry
+        if time.monotonic() >= expires_at:
+            self.invalidate(key)
+            return None
+        return schema
+
+    def set(self, key: str, schema: SchemaSnapshot) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, schema)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+schema_cache = SchemaCache()
@@ -0,0 +1,170 @@
+from collections import Counter, OrderedDict
+from typing import Optional, Dict, List, Any, Tuple
+import math
+import os
+import re
+
+from src.services.schema_cache import fingerprint
+
+Schema = Dict[str, List[Dict[str, Any]]]
+
+_CAMEL_BOUNDARY = re.compile(r"([a-z0-9])([A-Z])")
+_WORD = re.compile(r"[a-z0-9]+")
+
+TABLE_NAME_WEIGHT = 3
+FK_NEIGHBOUR_DECAY = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD.findall(_CAMEL_BOUNDARY.sub(r"\1 \2", text).lower())
+    return [_stem(word) for word in words]
+
+
+def _stem(word: str) -> str:
+    # Cheap plural folding so "orders" matches the "order" table and vice versa
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def estimate_table_tokens(table: str, columns: List[Dict[str, Any]]) -> int:
+    chars = len(table) + 10
+    for col in columns:
+        chars += len(col["name"]) + len(str(col["type"])) + 16
+        if col.get("foreign_key"):
+            chars += len(col["foreign_key"]) + 12
+    return chars // 4 + 1
+
+
+class SchemaIndex:
+    """BM25 index over table and column names of one reflected schema."""
+
+    def __init__(self, schema: Schema, k1: float = 1.2, b: float = 0.75):
+        self.schema = schema
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.neighbours: Dict[str, set] = {table: set() for table in schema}
+        self.token_costs: Dict[str, int] = {}
+
+        for table, columns in schema.items():
+            terms = tokenize(table) * TABLE_NAME_WEIGHT
+            for col in columns:
+                terms.extend(tokenize(col["name"]))
+                foreign_key = col.get("foreign_key")
+                if foreign_key:
+                    target = foreign_key.split(".", 1)[0]
+                    if target in self.neighbours and target != table:
+                        self.neighbours[table].add(target)
+                        self.neighbours[target].add(table)
+
+            for term, count in Counter(terms).items():
+                self.postings.setdefault(term, {})[table] = count
+            self.doc_lengths[table] = len(terms)
+            self.token_costs[table] = estimate_table_tokens(table, columns)
+
+        self.total_tokens = sum(self.token_costs.values())
+        self.avg_doc_length = (
+            sum(self.doc_lengths.values()) / len(self.doc_lengths)
+            if self.doc_lengths
+            else 0.0
+        )
+
+    def rank(self, query: str) -> List[Tuple[str, float]]:
+        scores: Dict[str, float] = {}
+        doc_count = len(self.doc_lengths)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for table, tf in postings.items():
+                norm = (
+                    1 - self.b + self.b * self.doc_lengths[table] / self.avg_doc_length
+                )
+                scores[table] = scores.get(table, 0.0) + idf * (
+                    tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                )
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def select(self, query: str, top_k: int, token_budget: int) -> Schema:
+        ranked = self.rank(query)[:top_k]
+        scores = dict(ranked)
+
+        # Pull in join partners of the hits so the model can write the joins
+        for table, score in ranked:
+            for neighbour in self.neighbours[table]:
+                expanded = score * FK_NEIGHBOUR_DECAY
+                if expanded > scores.get(neighbour, 0.0):
+                    scores[neighbour] = expanded
+
+        if not scores:
+            # Nothing matched lexically; fall back to the schema's own order
+            scores = {table: 0.0 for table in self.schema}
+
+        selected: Schema = {}
+        used = 0
+        for table in sorted(scores, key=lambda t: scores[t], reverse=True):
+            cost = self.token_costs[table]
+            if used + cost > token_budget:
+                continue
+            selected[table] = self.schema[table]
+            used += cost
+
+        return selected
+
+
+class SchemaRetriever:
+    """Chooses the slice of a schema worth sending to the LLM for a message.
+
+    Schemas that already fit the token budget are passed through untouched;
+    larger ones are ranked with a per-schema BM25 index that is built once and
+    reused for as long as the schema's content doesn't change.
+    """
+
+    def __init__(
+        self,
+        top_k: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        max_indexes: int = 32,
+    ):
+        self.top_k = (
+            top_k if top_k is not None else int(os.getenv("SCHEMA_CONTEXT_TOP_K", "8"))
+        )
+        self.token_budget = (
+            token_budget
+            if token_budget is not None
+            else int(os.getenv("SCHEMA_CONTEXT_TOKEN_BUDGET", "3000"))
+        )
+        self.max_indexes = max_indexes
+        # Keyed by the schema's content fingerprint
+        self._indexes: "OrderedDict[Optional[str], SchemaIndex]" = OrderedDict()
+
+    def index_for(self, schema: Schema) -> SchemaIndex:
+        key = fingerprint(schema)
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+            return index
+
+        index = SchemaIndex(schema)
+        self._indexes[key] = index
+        while len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        return index
+
+    def select(self, message: str, schema: Schema) -> Schema:
+        index = self.index_for(schema)
+        if index.total_tokens <= self.token_budget:
+            return schema
+        return index.select(message, self.top_k, self.token_budget)
+
+
+schema_retriever = SchemaRetriever()
@@ -31,16 +31,47 @@ import { ScatterPlotVisualization } from '@/components/visualizations/ScatterPlo
 import { ComboChartVisualization } from '@/components/visualizations/ComboChartVisualization';
 import { ChartConfigPanel } from '@/components/visualizations/ChartConfigPanel';
 import { CodeBlock } from '@/components/visualizations/CodeBlock';
-import type { Message, VisualizationConfig, Dashboard, Rule, DataSourceConnection } from '@/types';
+import { decodeQueryResult } from '@/lib/queryResult';
+import type { Message, VisualizationConfig, Dashboard, DataSourceConnection } from '@/types';
+
+async function readServerSentEvents(
+  body: ReadableStream<Uint8Array>,
+  onEvent: (event: string, data: any) => void
+) {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const chunk = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      let event = 'message';
+      let data = '';
+      for (const line of chunk.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
 
 export function ChatInterface() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [conversationId, setConversationId] = useState<string | null>(null);
   const [editingConfigForMessage, setEditingConfigForMessage] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   
-  const [rules, setRules] = useState<Rule[]>([]);
   const [dashboards, setDashboards] = useState<Dashboard[]>([]);
   const [dataSources, setDataSources] = useState<DataSourceConnection[]>([]);
   const [selectedDataSourceId, setSelectedDataSourceId] = useState<string>('');
@@ -72,18 +103,6 @@ export function ChatInterface() {
       }
     };
 
-    const fetchRules = async () => {
-      try {
-        const response = await fetch('/api/rules');
-        if (response.ok) {
-          const data = await response.json();
-          setRules(data);
-        }
-      } catch (error) {
-        console.error('Failed to fetch rules:', error);
-      }
-    };
-
     const fetchDataSources = async () => {
       try {
         const response = await fetch('/api/data-sources');
@@ -101,10 +120,14 @@ export function ChatInterface() {
     };
 
     fetchDashboards();
-    fetchRules();
     fetchDataSources();
   }, []);
 
+  useEffect(() => {
+    // History about one database would only mislead questions about another
+    setConversationId(null);
+  }, [selectedDataSourceId]);
+
   const handleSendMessage = async () => {
     if (!input.trim()) return;
 
@@ -119,47 +142,79 @@ export function ChatInterface() {
     setInput('');
     setIsLoading(true);
 
+    const assistantId = (Date.now() + 1).toString();
+    const updateAssistant = (update: (message: Message) => Message) => {
+      setMessages((prev) =>
+        prev.map((msg) => (msg.id === assistantId ? update(msg) : msg))
+      );
+    };
+
+    setMessages((prev) => [
+      ...prev,
+      { id: assistantId, role: 'assistant', content: '', timestamp: new Date() },
+    ]);
+
     try {
-      const response = await fetch('/api/chat', {
+      const response = await fetch('/api/chat/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ 
           message: input,
-          rules: rules.filter(r => r.active),
+          conversation_id: conversationId || undefined,
           data_source_id: selectedDataSourceId || undefined
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`API error: ${response.status}`);
       }
 
-      const data = await response.json();
-
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: data.response,
-        timestamp: new Date(),
-        metadata: data.metadata,
-        sql: data.sql,
-        queryResult: data.query_result,
-        visualization: data.visualization,
-      };
-
-      setMessages((prev) => [...prev, assistantMessage]);
+      await readServerSentEvents(response.body, (event, data) => {
+        switch (event) {
+          case 'start':
+            setConversationId(data.conversation_id);
+            break;
+          case 'token':
+            setIsLoading(false);
+            updateAssistant((msg) => ({ ...msg, content: msg.content + data.content }));
+            break;
+          case 'sql':
+            updateAssistant((msg) => ({ ...msg, sql: data.sql }));
+            break;
+          case 'query_result':
+            updateAssistant((msg) => ({
+              ...msg,
+              queryResult: decodeQueryResult(data),
+            }));
+            break;
+          case 'visualization':
+            updateAssistant((msg) => ({ ...msg, visualization: data }));
+            break;
+          case 'preflight':
+            updateAssistant((msg) => ({ ...msg, preflightRejection: data.reason }));
+            break;
+          case 'query_error':
+            updateAssistant((msg) => ({ ...msg, queryError: data.detail }));
+            break;
+          case 'done':
+            updateAssistant((msg) => ({
+              ...msg,
+              content: data.response,
+              metadata: data.metadata,
+            }));
+            break;
+          case 'error':
+            throw new Error(data.detail);
+        }
+      });
     } catch (error) {
       console.error('Failed to send message:', error);
-      
-      const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
+
+      updateAssistant((msg) => ({
+        ...msg,
         content: `Error: ${error instanceof Error ? error.message : 'Failed to send message'}`,
-        timestamp: new Date(),
         metadata: { error: true },
-      };
-      
-      setMessages((prev) => [...prev, errorMessage]);
+      }));
     } finally {
       setIsLoading(false);
     }
@@ -201,6 +256,15 @@ export function ChatInterface() {
     setIsSaving(true);
     setSaveError('');
 
+    // The question this answer was for, kept server-side as a verified
+    // example. Follow-ups ("now by region") only make sense after earlier
+    // turns, so only the conversation's opening question is sent.
+    const answerIndex = messages.findIndex((msg) => msg.id === savingChartMessage.id);
+    const questions = messages
+      .slice(0, answerIndex)
+      .filter((msg) => msg.role === 'user');
+    const question = questions.length === 1 ? questions[0].content : undefined;
+
     try {
       const response = await fetch(
         `/api/dashboards/${selectedDashboardId}/charts`,
@@ -212,7 +276,9 @@ export function ChatInterface() {
             title: chartTitle,
             sql: savingChartMessage.sql,
             visualization: savingChartMessage.visualization,
-            refresh_interval: null
+            refresh_interval: null,
+            question,
+            data_source_id: selectedDataSourceId || undefined
           })
         }
       );
@@ -297,6 +363,18 @@ export function ChatInterface() {
                     <CodeBlock code={message.sql} language="sql" />
                   </div>
                 )}
+
+                {message.preflightRejection && !message.queryError && (
+                  <p className="mr-auto max-w-[80%] text-xs text-muted-foreground">
+                    {message.preflightRejection} The query above was rewritten to avoid this.
+                  </p>
+                )}
+
+                {message.queryError && (
+                  <Card className="mr-auto max-w-[80%] p-3 text-sm bg-destructive/10 text-destructive">
+                    The query could not be run: {message.queryError}
+                  </Card>
+                )}
                 
                 {message.queryResult && message.visualization && (
                   <div className="mr-auto max-w-[80%] space-y-2">
@@ -341,6 +419,7 @@ export function ChatInterface() {
                             columns={columns}
                             rows={data}
                             rowCount={message.queryResult.rowCount}
+                            truncated={message.queryResult.truncated}
                           />
                         );
                       }
@@ -351,6 +430,7 @@ export function ChatInterface() {
                             columns={columns}
                             rows={data}
                             rowCount={message.queryResult.rowCount}
+                            truncated={message.queryResult.truncated}
                           />
                         );
                       }
@@ -445,6 +525,7 @@ export function ChatInterface() {
                               columns={columns}
                               rows={data}
                               rowCount={message.queryResult.rowCount}
+                              truncated={message.queryResult.truncated}
                             />
                           );
                       }
@@ -458,9 +539,16 @@ export function ChatInterface() {
                       columns={message.queryResult.columns}
                       rows={message.queryResult.rows}
                       rowCount={message.queryResult.rowCount}
+                      truncated={message.queryResult.truncated}
                     />
                   </div>
                 )}
+
+                {message.queryResult?.note && (
+                  <p className="mr-auto max-w-[80%] text-xs text-muted-foreground">
+                    {message.queryResult.note}
+                  </p>
+                )}
               </div>
             ))
           )}
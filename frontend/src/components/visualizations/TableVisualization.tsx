@@ -1,12 +1,17 @@
 import { Card } from '@/components/ui/card';
+import { Button } from '@/components/ui/button';
 
 interface TableVisualizationProps {
   columns: string[];
   rows: Record<string, any>[];
   rowCount?: number;
+  truncated?: boolean;
+  onLoadMore?: () => void;
+  // Shown under the table, e.g. why there is nothing more to load
+  note?: string;
 }
 
-export function TableVisualization({ columns, rows, rowCount }: TableVisualizationProps) {
+export function TableVisualization({ columns, rows, rowCount, truncated, onLoadMore, note }: TableVisualizationProps) {
   if (!rows || rows.length === 0) {
     return (
       <Card className="p-4">
@@ -19,6 +24,7 @@ export function TableVisualization({ columns, rows, rowCount }: TableVisualizati
     <Card className="p-4 overflow-auto">
       <div className="mb-2 text-sm text-muted-foreground">
         {rowCount !== undefined && `${rowCount} row${rowCount !== 1 ? 's' : ''}`}
+        {truncated && ' (more rows available)'}
       </div>
       <div className="overflow-x-auto">
         <table className="w-full border-collapse">
@@ -47,6 +53,14 @@ export function TableVisualization({ columns, rows, rowCount }: TableVisualizati
           </tbody>
         </table>
       </div>
+      {truncated && onLoadMore && (
+        <div className="flex justify-center mt-4">
+          <Button variant="outline" size="sm" onClick={onLoadMore}>
+            Load more
+          </Button>
+        </div>
+      )}
+      {note && <p className="mt-2 text-sm text-muted-foreground">{note}</p>}
     </Card>
   );
 }
@@ -0,0 +1,47 @@
+import type { QueryResult } from '@/types';
+
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.bagofwords.columnar+json';
+
+// Accept header asking the API for column arrays instead of one object per row
+export const QUERY_RESULT_ACCEPT = `${COLUMNAR_MEDIA_TYPE}, application/json`;
+
+interface RawQueryResult {
+  format?: 'columnar';
+  columns: string[];
+  rows?: Record<string, any>[];
+  data?: any[][];
+  row_count?: number;
+  truncated?: boolean;
+  next_page_token?: string | null;
+  note?: string | null;
+}
+
+export function decodeQueryResult(raw: RawQueryResult): QueryResult {
+  const rows =
+    raw.format === 'columnar' ? columnarToRows(raw.columns, raw.data ?? []) : raw.rows ?? [];
+
+  return {
+    columns: raw.columns,
+    rows,
+    rowCount: raw.row_count ?? rows.length,
+    truncated: raw.truncated,
+    nextPageToken: raw.next_page_token ?? undefined,
+    note: raw.note ?? undefined,
+  };
+}
+
+// Recharts wants one object per data point, so rebuild rows once on arrival
+function columnarToRows(columns: string[], data: any[][]): Record<string, any>[] {
+  const rowCount = data.length > 0 ? data[0].length : 0;
+  const rows: Record<string, any>[] = new Array(rowCount);
+
+  for (let i = 0; i < rowCount; i++) {
+    const row: Record<string, any> = {};
+    for (let c = 0; c < columns.length; c++) {
+      row[columns[c]] = data[c][i];
+    }
+    rows[i] = row;
+  }
+
+  return rows;
+}
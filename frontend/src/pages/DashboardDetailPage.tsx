@@ -13,6 +13,7 @@ import { HorizontalBarChartVisualization } from '@/components/visualizations/Hor
 import { StackedBarChartVisualization } from '@/components/visualizations/StackedBarChartVisualization';
 import { ScatterPlotVisualization } from '@/components/visualizations/ScatterPlotVisualization';
 import { ComboChartVisualization } from '@/components/visualizations/ComboChartVisualization';
+import { decodeQueryResult, QUERY_RESULT_ACCEPT } from '@/lib/queryResult';
 import type { Dashboard, SavedChart, QueryResult } from '@/types';
 
 export function DashboardDetailPage() {
@@ -50,18 +51,72 @@ export function DashboardDetailPage() {
   }, [id]);
 
   const executeAllCharts = async (charts: SavedChart[]) => {
-    for (const chart of charts) {
-      await executeChart(chart.id);
+    if (!id) return;
+    setLoadingCharts(new Set(charts.map((chart) => chart.id)));
+
+    const finishChart = (chartId: string) => {
+      setLoadingCharts(prev => {
+        const newSet = new Set(prev);
+        newSet.delete(chartId);
+        return newSet;
+      });
+    };
+
+    try {
+      const response = await fetch(`/api/dashboards/${id}/execute`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Accept: QUERY_RESULT_ACCEPT }
+      });
+
+      if (!response.ok || !response.body) {
+        throw new Error('Failed to execute dashboard queries');
+      }
+
+      // One JSON line per chart, in the order the queries finish
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
+
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const data = JSON.parse(line);
+
+          if (data.error) {
+            console.error(`Failed to execute chart ${data.chart_id}:`, data.error);
+          } else {
+            setChartData(prev => ({
+              ...prev,
+              [data.chart_id]: decodeQueryResult(data.query_result)
+            }));
+          }
+          finishChart(data.chart_id);
+        }
+      }
+    } catch (err) {
+      console.error('Failed to execute dashboard charts:', err);
+    } finally {
+      setLoadingCharts(new Set());
     }
   };
 
-  const executeChart = async (chartId: string) => {
+  const executeChart = async (chartId: string, pageToken?: string) => {
     setLoadingCharts(prev => new Set(prev).add(chartId));
     
     try {
-      const response = await fetch(`/api/charts/${chartId}/execute`, {
+      const url = pageToken
+        ? `/api/charts/${chartId}/execute?page_token=${encodeURIComponent(pageToken)}`
+        : `/api/charts/${chartId}/execute`;
+      const response = await fetch(url, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' }
+        headers: { 'Content-Type': 'application/json', Accept: QUERY_RESULT_ACCEPT }
       });
       
       if (!response.ok) {
@@ -69,16 +124,16 @@ export function DashboardDetailPage() {
       }
       
       const data = await response.json();
-      const queryResult = data.query_result;
+      const queryResult = decodeQueryResult(data.query_result);
       
-      setChartData(prev => ({
-        ...prev,
-        [chartId]: {
-          columns: queryResult.columns,
-          rows: queryResult.rows,
-          rowCount: queryResult.row_count || queryResult.rowCount
-        }
-      }));
+      setChartData(prev => {
+        const previousRows = pageToken && prev[chartId] ? prev[chartId].rows : [];
+        const rows = [...previousRows, ...queryResult.rows];
+        return {
+          ...prev,
+          [chartId]: { ...queryResult, rows, rowCount: rows.length }
+        };
+      });
     } catch (err) {
       console.error(`Failed to execute chart ${chartId}:`, err);
     } finally {
@@ -94,6 +149,14 @@ export function DashboardDetailPage() {
     const viz = chart.visualization;
     const queryResult = chartData[chart.id];
     const isLoading = loadingCharts.has(chart.id);
+    // Only ordered results come with a page token; without one a second
+    // request would just return the first page again
+    const nextPageToken = queryResult?.nextPageToken;
+    const loadMore = nextPageToken ? () => executeChart(chart.id, nextPageToken) : undefined;
+    const pagingNote =
+      queryResult?.truncated && !nextPageToken
+        ? `Only the first ${queryResult.rowCount} rows are shown. Add an ORDER BY to the chart's query to page through the rest.`
+        : undefined;
 
     if (isLoading) {
       return (
@@ -128,6 +191,9 @@ export function DashboardDetailPage() {
           columns={queryResult.columns}
           rows={queryResult.rows}
           rowCount={queryResult.rowCount}
+          truncated={queryResult.truncated}
+          onLoadMore={loadMore}
+          note={pagingNote}
         />
       );
     }
@@ -138,6 +204,9 @@ export function DashboardDetailPage() {
           columns={queryResult.columns}
           rows={queryResult.rows}
           rowCount={queryResult.rowCount}
+          truncated={queryResult.truncated}
+          onLoadMore={loadMore}
+          note={pagingNote}
         />
       );
     }
@@ -235,6 +304,9 @@ export function DashboardDetailPage() {
               columns={queryResult.columns}
               rows={queryResult.rows}
               rowCount={queryResult.rowCount}
+              truncated={queryResult.truncated}
+              onLoadMore={loadMore}
+              note={pagingNote}
             />
           );
         }
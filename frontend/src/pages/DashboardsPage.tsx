@@ -9,12 +9,21 @@ interface Dashboard {
   id: string;
   name: string;
   description: string | null;
-  layout: Record<string, any> | null;
-  charts: any[];
+  chart_count: number;
   created_at: string;
   updated_at: string;
 }
 
+// Create/update return the full dashboard; the list only keeps the summary
+const toSummary = (dashboard: Dashboard & { charts?: any[] }): Dashboard => ({
+  id: dashboard.id,
+  name: dashboard.name,
+  description: dashboard.description,
+  chart_count: dashboard.charts ? dashboard.charts.length : dashboard.chart_count,
+  created_at: dashboard.created_at,
+  updated_at: dashboard.updated_at,
+});
+
 export function DashboardsPage() {
   const navigate = useNavigate();
   const [dashboards, setDashboards] = useState<Dashboard[]>([]);
@@ -72,7 +81,7 @@ export function DashboardsPage() {
       if (!response.ok) throw new Error('Failed to create dashboard');
 
       const created = await response.json();
-      setDashboards(prev => [...prev, created]);
+      setDashboards(prev => [...prev, toSummary(created)]);
       setIsDialogOpen(false);
       setNewDashboard({ name: '', description: '' });
     } catch (err) {
@@ -111,7 +120,7 @@ export function DashboardsPage() {
       if (!response.ok) throw new Error('Failed to update dashboard');
 
       const updated = await response.json();
-      setDashboards(prev => prev.map(d => d.id === updated.id ? updated : d));
+      setDashboards(prev => prev.map(d => d.id === updated.id ? toSummary(updated) : d));
       setIsEditDialogOpen(false);
       setEditingDashboard(null);
       setEditForm({ name: '', description: '' });
@@ -221,7 +230,7 @@ export function DashboardsPage() {
                   {dashboard.description || 'No description'}
                 </p>
                 <div className="flex items-center gap-4 text-xs" style={{ color: '#999999', fontFamily: 'IBM Plex Mono' }}>
-                  <span>{dashboard.charts.length} Charts</span>
+                  <span>{dashboard.chart_count} Charts</span>
                   <span>•</span>
                   <span>Updated {formatTimeAgo(dashboard.updated_at)}</span>
                 </div>
@@ -3,6 +3,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogDescription, Di
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Textarea } from '@/components/ui/textarea';
+import type { DataSourceConnection } from '@/types';
 
 interface Rule {
   id: string;
@@ -11,6 +12,8 @@ interface Rule {
   scope: string;
   prompt: string;
   active: boolean;
+  // Rules without a data source apply to every one
+  data_source_id: string | null;
   created_at: string;
   updated_at: string;
 }
@@ -32,7 +35,8 @@ export function RulesPage() {
     name: '',
     description: '',
     scope: 'global',
-    prompt: ''
+    prompt: '',
+    data_source_id: null as string | null
   });
   const [isCreating, setIsCreating] = useState(false);
   const [editingRule, setEditingRule] = useState<Rule | null>(null);
@@ -41,12 +45,24 @@ export function RulesPage() {
     name: '',
     description: '',
     scope: 'global',
-    prompt: ''
+    prompt: '',
+    data_source_id: null as string | null
   });
   const [isUpdating, setIsUpdating] = useState(false);
   const [deletingRule, setDeletingRule] = useState<Rule | null>(null);
   const [isDeleteDialogOpen, setIsDeleteDialogOpen] = useState(false);
   const [isDeleting, setIsDeleting] = useState(false);
+  const [dataSources, setDataSources] = useState<DataSourceConnection[]>([]);
+
+  useEffect(() => {
+    fetch('/api/data-sources')
+      .then(res => res.json())
+      .then(setDataSources)
+      .catch(err => console.error('Failed to fetch data sources:', err));
+  }, []);
+
+  const dataSourceName = (id: string | null) =>
+    id ? dataSources.find(ds => ds.id === id)?.name ?? 'Unknown data source' : 'All data sources';
 
   useEffect(() => {
     fetch('/api/rules')
@@ -97,7 +113,8 @@ export function RulesPage() {
         name: '',
         description: '',
         scope: 'global',
-        prompt: ''
+        prompt: '',
+        data_source_id: null
       });
     } catch (err) {
       console.error('Failed to create rule:', err);
@@ -113,7 +130,8 @@ export function RulesPage() {
       name: rule.name,
       description: rule.description,
       scope: rule.scope,
-      prompt: rule.prompt
+      prompt: rule.prompt,
+      data_source_id: rule.data_source_id
     });
     setIsEditDialogOpen(true);
   };
@@ -139,7 +157,8 @@ export function RulesPage() {
         name: '',
         description: '',
         scope: 'global',
-        prompt: ''
+        prompt: '',
+        data_source_id: null
       });
     } catch (err) {
       console.error('Failed to update rule:', err);
@@ -256,6 +275,9 @@ export function RulesPage() {
                   </div>
                   <div className="flex-1 text-sm" style={{ color: '#5E5E5E', fontFamily: 'Sora' }}>
                     {rule.description}
+                    <div className="text-xs mt-1" style={{ color: '#999999', fontFamily: 'IBM Plex Mono' }}>
+                      {dataSourceName(rule.data_source_id)}
+                    </div>
                   </div>
                   <div className="w-[180px]">
                     <span 
@@ -340,6 +362,22 @@ export function RulesPage() {
                 <option value="chart_preference">Chart Preference</option>
               </select>
             </div>
+            <div>
+              <label className="block text-sm font-medium mb-2" style={{ fontFamily: 'Sora' }}>
+                Data Source
+              </label>
+              <select
+                value={newRule.data_source_id ?? ''}
+                onChange={(e) => setNewRule(prev => ({ ...prev, data_source_id: e.target.value || null }))}
+                className="w-full px-3 py-2 border border-[#E5E5E5] rounded"
+                style={{ fontFamily: 'Sora' }}
+              >
+                <option value="">All data sources</option>
+                {dataSources.map(ds => (
+                  <option key={ds.id} value={ds.id}>{ds.name}</option>
+                ))}
+              </select>
+            </div>
             <div>
               <label className="block text-sm font-medium mb-2" style={{ fontFamily: 'Sora' }}>
                 Prompt *
@@ -362,7 +400,8 @@ export function RulesPage() {
                   name: '',
                   description: '',
                   scope: 'global',
-                  prompt: ''
+                  prompt: '',
+                  data_source_id: null
                 });
               }}
             >
@@ -427,6 +466,22 @@ export function RulesPage() {
                 <option value="chart_preference">Chart Preference</option>
               </select>
             </div>
+            <div>
+              <label className="block text-sm font-medium mb-2" style={{ fontFamily: 'Sora' }}>
+                Data Source
+              </label>
+              <select
+                value={editForm.data_source_id ?? ''}
+                onChange={(e) => setEditForm(prev => ({ ...prev, data_source_id: e.target.value || null }))}
+                className="w-full px-3 py-2 border border-[#E5E5E5] rounded"
+                style={{ fontFamily: 'Sora' }}
+              >
+                <option value="">All data sources</option>
+                {dataSources.map(ds => (
+                  <option key={ds.id} value={ds.id}>{ds.name}</option>
+                ))}
+              </select>
+            </div>
             <div>
               <label className="block text-sm font-medium mb-2" style={{ fontFamily: 'Sora' }}>
                 Prompt *
@@ -450,7 +505,8 @@ export function RulesPage() {
                   name: '',
                   description: '',
                   scope: 'global',
-                  prompt: ''
+                  prompt: '',
+                  data_source_id: null
                 });
               }}
             >
@@ -7,12 +7,19 @@ export interface Message {
   sql?: string;
   queryResult?: QueryResult;
   visualization?: VisualizationConfig;
+  // Why the SQL was refused by the preflight check, even if a rewrite ran
+  preflightRejection?: string;
+  queryError?: string;
 }
 
 export interface QueryResult {
   columns: string[];
   rows: Record<string, any>[];
   rowCount: number;
+  truncated?: boolean;
+  nextPageToken?: string;
+  // Why the rows stop short, when it isn't just the page size
+  note?: string;
 }
 
 export interface VisualizationConfig {